@@ -24,14 +24,13 @@ def _ensure_backend_import() -> None:
         sys.path.insert(0, path)
 
 
-def run_and_record(
+def evaluate_evidence(
     *,
     seed: int,
     run_id: str,
     module: str,
     action: str,
     payload: dict[str, Any],
-    conn,
     base_dir=None,
 ) -> EvidenceOutcome:
     _ensure_backend_import()
@@ -60,6 +59,22 @@ def run_and_record(
     except EvidenceError as exc:
         raise GatewayError(str(exc)) from exc
 
+    return EvidenceOutcome(
+        state_hash=evidence.state_hash,
+        receipt_hashes=evidence.receipt_hashes,
+        replay_ok=evidence.replay_ok,
+    )
+
+
+def record_evidence(
+    conn,
+    *,
+    seed: int,
+    run_id: str,
+    module: str,
+    action: str,
+    outcome: EvidenceOutcome,
+) -> None:
     insert_evidence_run(
         conn,
         EvidenceRun(
@@ -67,9 +82,9 @@ def run_and_record(
             module=module,
             action=action,
             seed=seed,
-            state_hash=evidence.state_hash,
-            receipt_hashes=evidence.receipt_hashes,
-            replay_ok=evidence.replay_ok,
+            state_hash=outcome.state_hash,
+            receipt_hashes=outcome.receipt_hashes,
+            replay_ok=outcome.replay_ok,
         ),
     )
     insert_receipt(
@@ -78,15 +93,31 @@ def run_and_record(
             receipt_id=receipt_id(run_id),
             module=module,
             action=action,
-            state_hash=evidence.state_hash,
-            receipt_hashes=evidence.receipt_hashes,
-            replay_ok=evidence.replay_ok,
+            state_hash=outcome.state_hash,
+            receipt_hashes=outcome.receipt_hashes,
+            replay_ok=outcome.replay_ok,
             run_id=run_id,
         ),
     )
 
-    return EvidenceOutcome(
-        state_hash=evidence.state_hash,
-        receipt_hashes=evidence.receipt_hashes,
-        replay_ok=evidence.replay_ok,
+
+def run_and_record(
+    *,
+    seed: int,
+    run_id: str,
+    module: str,
+    action: str,
+    payload: dict[str, Any],
+    conn,
+    base_dir=None,
+) -> EvidenceOutcome:
+    outcome = evaluate_evidence(
+        seed=seed,
+        run_id=run_id,
+        module=module,
+        action=action,
+        payload=payload,
+        base_dir=base_dir,
     )
+    record_evidence(conn, seed=seed, run_id=run_id, module=module, action=action, outcome=outcome)
+    return outcome
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import functools
 import os
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterable
 
 from nyx_backend_gateway import compliance
 from nyx_backend_gateway.airdrop import (
@@ -24,7 +27,7 @@ from nyx_backend_gateway.env import (
     get_faucet_max_claims_per_24h,
 )
 from nyx_backend_gateway.errors import GatewayApiError, GatewayError
-from nyx_backend_gateway.evidence_adapter import run_and_record
+from nyx_backend_gateway.evidence_adapter import evaluate_evidence, record_evidence
 from nyx_backend_gateway.exchange import ExchangeError, cancel_order, place_order
 from nyx_backend_gateway.fees import route_fee
 from nyx_backend_gateway.identifiers import deterministic_id, order_id
@@ -40,6 +43,9 @@ from nyx_backend_gateway.marketplace import (
 from nyx_backend_gateway.marketplace import (
     search_listings as marketplace_search,
 )
+from nyx_backend_gateway.marketplace import (
+    search_listings_columnar as marketplace_search_columnar,
+)
 from nyx_backend_gateway.models import GatewayResult
 from nyx_backend_gateway.storage import (
     EntertainmentEvent,
@@ -55,7 +61,9 @@ from nyx_backend_gateway.storage import (
     insert_entertainment_item,
     insert_faucet_claim,
     insert_fee_ledger,
+    list_listings_columnar,
     load_by_id,
+    transaction,
 )
 from nyx_backend_gateway.validation import (
     validate_cancel,
@@ -163,6 +171,265 @@ def list_web2_allowlist() -> list[dict[str, object]]:
     return web2_list_allowlist()
 
 
+def _validate_place_order_run(
+    payload: dict[str, Any], caller_wallet_address: str | None, caller_account_id: str | None
+) -> dict[str, Any]:
+    payload = validate_place_order(payload)
+    if caller_wallet_address and payload.get("owner_address") != caller_wallet_address:
+        raise GatewayError("owner_address mismatch")
+    return payload
+
+
+def _validate_cancel_run(
+    payload: dict[str, Any], caller_wallet_address: str | None, caller_account_id: str | None
+) -> dict[str, Any]:
+    # TODO: Verify order ownership in DB
+    return validate_cancel(payload)
+
+
+def _validate_chat_run(
+    payload: dict[str, Any], caller_wallet_address: str | None, caller_account_id: str | None
+) -> dict[str, Any]:
+    return validate_chat_payload(payload)
+
+
+def _validate_purchase_run(
+    payload: dict[str, Any], caller_wallet_address: str | None, caller_account_id: str | None
+) -> dict[str, Any]:
+    if not caller_account_id:
+        raise GatewayError("auth required")
+    payload = validate_purchase_payload(payload)
+    if caller_wallet_address and payload.get("buyer_id") != caller_wallet_address:
+        raise GatewayError("buyer_id mismatch")
+    return payload
+
+
+def _validate_listing_run(
+    payload: dict[str, Any], caller_wallet_address: str | None, caller_account_id: str | None
+) -> dict[str, Any]:
+    if not caller_account_id:
+        raise GatewayError("auth required")
+    payload = validate_listing_payload(payload)
+    if caller_wallet_address and payload.get("publisher_id") != caller_wallet_address:
+        raise GatewayError("publisher_id mismatch")
+    return payload
+
+
+def _validate_entertainment_run(
+    payload: dict[str, Any], caller_wallet_address: str | None, caller_account_id: str | None
+) -> dict[str, Any]:
+    return validate_entertainment_payload(payload)
+
+
+def _handle_place_order(
+    conn,
+    run_id: str,
+    payload: dict[str, Any],
+    caller_wallet_address: str | None,
+    caller_account_id: str | None,
+    fee_record: FeeLedger | None,
+) -> None:
+    if fee_record is not None and caller_wallet_address:
+        nyxt_balance = get_wallet_balance(conn, caller_wallet_address, "NYXT")
+        required = int(fee_record.total_paid)
+        if payload.get("asset_in") == "NYXT":
+            required += int(payload.get("amount", 0) or 0)
+        if nyxt_balance < required:
+            raise GatewayError("insufficient NYXT balance for amount + fee")
+    order = Order(
+        order_id=order_id(run_id),
+        owner_address=payload["owner_address"],
+        side=payload["side"],
+        amount=payload["amount"],
+        price=payload["price"],
+        asset_in=payload["asset_in"],
+        asset_out=payload["asset_out"],
+        run_id=run_id,
+    )
+    try:
+        place_order(conn, order)
+    except ExchangeError as exc:
+        raise GatewayError(str(exc)) from exc
+    _charge_exchange_fee(conn, run_id, caller_wallet_address, fee_record)
+
+
+def _handle_cancel_order(
+    conn,
+    run_id: str,
+    payload: dict[str, Any],
+    caller_wallet_address: str | None,
+    caller_account_id: str | None,
+    fee_record: FeeLedger | None,
+) -> None:
+    try:
+        if caller_wallet_address:
+            record = load_by_id(conn, "orders", "order_id", payload["order_id"])
+            if record is None:
+                raise GatewayError("order_id not found")
+            if str(record.get("owner_address")) != caller_wallet_address:
+                raise GatewayError("order_id ownership mismatch")
+            if str(record.get("status") or "open") != "open":
+                raise GatewayError("order not cancellable")
+        cancel_order(conn, payload["order_id"])
+    except ExchangeError as exc:
+        raise GatewayError(str(exc)) from exc
+    _charge_exchange_fee(conn, run_id, caller_wallet_address, fee_record)
+
+
+def _charge_fee(conn, run_id: str, caller_wallet_address: str, fee_record: FeeLedger) -> None:
+    apply_wallet_transfer(
+        conn,
+        transfer_id=deterministic_id("fee", run_id),
+        from_address=caller_wallet_address,
+        to_address=fee_record.fee_address,
+        asset_id="NYXT",
+        amount=0,
+        fee_total=fee_record.total_paid,
+        treasury_address=fee_record.fee_address,
+        run_id=run_id,
+    )
+
+
+def _charge_exchange_fee(conn, run_id: str, caller_wallet_address: str | None, fee_record: FeeLedger | None) -> None:
+    if fee_record is None:
+        return
+    if not caller_wallet_address:
+        raise GatewayError("auth required")
+    _charge_fee(conn, run_id, caller_wallet_address, fee_record)
+
+
+def _handle_chat_message(
+    conn,
+    run_id: str,
+    payload: dict[str, Any],
+    caller_wallet_address: str | None,
+    caller_account_id: str | None,
+    fee_record: FeeLedger | None,
+) -> None:
+    if not caller_account_id:
+        raise GatewayError("auth required")
+    if fee_record is not None:
+        if not caller_wallet_address:
+            raise GatewayError("auth required")
+        nyxt_balance = get_wallet_balance(conn, caller_wallet_address, "NYXT")
+        if nyxt_balance < int(fee_record.total_paid):
+            raise GatewayError("insufficient NYXT balance for fee")
+        _charge_fee(conn, run_id, caller_wallet_address, fee_record)
+        insert_fee_ledger(conn, fee_record)
+    chat_record_message_event(conn, run_id, payload, caller_account_id)
+
+
+def _handle_listing_publish(
+    conn,
+    run_id: str,
+    payload: dict[str, Any],
+    caller_wallet_address: str | None,
+    caller_account_id: str | None,
+    fee_record: FeeLedger | None,
+) -> None:
+    marketplace_publish_listing(conn, run_id, payload, caller_wallet_address)
+
+
+def _handle_purchase_listing(
+    conn,
+    run_id: str,
+    payload: dict[str, Any],
+    caller_wallet_address: str | None,
+    caller_account_id: str | None,
+    fee_record: FeeLedger | None,
+) -> None:
+    marketplace_purchase_listing(conn, run_id, payload, caller_wallet_address)
+
+
+def _handle_entertainment_step(
+    conn,
+    run_id: str,
+    payload: dict[str, Any],
+    caller_wallet_address: str | None,
+    caller_account_id: str | None,
+    fee_record: FeeLedger | None,
+) -> None:
+    _ensure_entertainment_items(conn)
+    item_record = load_by_id(conn, "entertainment_items", "item_id", payload["item_id"])
+    if item_record is None:
+        raise GatewayError("item_id not found")
+    insert_entertainment_event(
+        conn,
+        EntertainmentEvent(
+            event_id=deterministic_id("ent-event", run_id),
+            item_id=payload["item_id"],
+            mode=payload["mode"],
+            step=payload["step"],
+            run_id=run_id,
+        ),
+    )
+
+
+def _handle_dapp_sign_request(
+    conn,
+    run_id: str,
+    payload: dict[str, Any],
+    caller_wallet_address: str | None,
+    caller_account_id: str | None,
+    fee_record: FeeLedger | None,
+) -> None:
+    conn.execute(
+        "INSERT INTO message_events (message_id, channel, body, run_id) VALUES (?, ?, ?, ?)",
+        (deterministic_id("dapp-sig", run_id), payload["dapp_url"], f"Signed: {payload['method']}", run_id),
+    )
+
+
+_RunValidator = Callable[[dict[str, Any], str | None, str | None], dict[str, Any]]
+_RunHandler = Callable[[Any, str, dict[str, Any], str | None, str | None, FeeLedger | None], None]
+
+_UNSUPPORTED_RUN_ACTIONS = frozenset({("marketplace", "order_intent")})
+
+_RUN_VALIDATORS: dict[tuple[str, str], _RunValidator] = {
+    ("exchange", "place_order"): _validate_place_order_run,
+    ("exchange", "cancel_order"): _validate_cancel_run,
+    ("chat", "message_event"): _validate_chat_run,
+    ("marketplace", "purchase_listing"): _validate_purchase_run,
+    ("marketplace", "listing_publish"): _validate_listing_run,
+    ("entertainment", "state_step"): _validate_entertainment_run,
+}
+
+_CLEARANCE_RUN_ACTIONS = frozenset(
+    {
+        ("exchange", "place_order"),
+        ("exchange", "cancel_order"),
+        ("exchange", "route_swap"),
+        ("chat", "message_event"),
+        ("marketplace", "listing_publish"),
+        ("marketplace", "purchase_listing"),
+        ("dapp", "sign_request"),
+        ("entertainment", "state_step"),
+    }
+)
+
+# Exchange fees are written to the ledger up front; chat fees only once the transfer succeeds.
+_LEDGER_FEE_RUN_ACTIONS = frozenset(
+    {
+        ("exchange", "route_swap"),
+        ("exchange", "place_order"),
+        ("exchange", "cancel_order"),
+    }
+)
+_DEFERRED_FEE_RUN_ACTIONS = frozenset({("chat", "message_event")})
+
+# Listing reads are cached below; these actions change what they return.
+_LISTING_MUTATION_RUN_ACTIONS = frozenset({("marketplace", "listing_publish"), ("marketplace", "purchase_listing")})
+
+_RUN_HANDLERS: dict[tuple[str, str], _RunHandler] = {
+    ("exchange", "place_order"): _handle_place_order,
+    ("exchange", "cancel_order"): _handle_cancel_order,
+    ("chat", "message_event"): _handle_chat_message,
+    ("marketplace", "listing_publish"): _handle_listing_publish,
+    ("marketplace", "purchase_listing"): _handle_purchase_listing,
+    ("entertainment", "state_step"): _handle_entertainment_step,
+    ("dapp", "sign_request"): _handle_dapp_sign_request,
+}
+
+
 def execute_run(
     *,
     seed: int,
@@ -178,44 +445,16 @@ def execute_run(
     if payload is None:
         payload = {}
 
-    if module == "marketplace" and action == "order_intent":
+    key = (module, action)
+    if key in _UNSUPPORTED_RUN_ACTIONS:
         raise GatewayError("action not supported")
 
     # Verify ownership for state-mutating actions
-    if module == "exchange" and action == "place_order":
-        payload = validate_place_order(payload)
-        if caller_wallet_address and payload.get("owner_address") != caller_wallet_address:
-            raise GatewayError("owner_address mismatch")
-    if module == "exchange" and action == "cancel_order":
-        payload = validate_cancel(payload)
-        # TODO: Verify order ownership in DB
-    if module == "chat" and action == "message_event":
-        payload = validate_chat_payload(payload)
-    if module == "marketplace" and action == "purchase_listing":
-        if not caller_account_id:
-            raise GatewayError("auth required")
-        payload = validate_purchase_payload(payload)
-        if caller_wallet_address and payload.get("buyer_id") != caller_wallet_address:
-            raise GatewayError("buyer_id mismatch")
-    if module == "marketplace" and action == "listing_publish":
-        if not caller_account_id:
-            raise GatewayError("auth required")
-        payload = validate_listing_payload(payload)
-        if caller_wallet_address and payload.get("publisher_id") != caller_wallet_address:
-            raise GatewayError("publisher_id mismatch")
-    if module == "entertainment" and action == "state_step":
-        payload = validate_entertainment_payload(payload)
+    validator = _RUN_VALIDATORS.get(key)
+    if validator is not None:
+        payload = validator(payload, caller_wallet_address, caller_account_id)
 
-    if (module, action) in {
-        ("exchange", "place_order"),
-        ("exchange", "cancel_order"),
-        ("exchange", "route_swap"),
-        ("chat", "message_event"),
-        ("marketplace", "listing_publish"),
-        ("marketplace", "purchase_listing"),
-        ("dapp", "sign_request"),
-        ("entertainment", "state_step"),
-    }:
+    if key in _CLEARANCE_RUN_ACTIONS:
         compliance.require_clearance(
             account_id=caller_account_id,
             wallet_address=caller_wallet_address,
@@ -225,122 +464,32 @@ def execute_run(
             metadata={"payload": payload},
         )
 
+    # Evidence generation touches no tables, so it runs before the write lock is taken.
+    outcome = evaluate_evidence(
+        seed=seed,
+        run_id=run_id,
+        module=module,
+        action=action,
+        payload=payload,
+        base_dir=run_root or _run_root(),
+    )
     conn = create_connection(db_path or _db_path())
-    run_root = run_root or _run_root()
     try:
-        outcome = run_and_record(
-            seed=seed,
-            run_id=run_id,
-            module=module,
-            action=action,
-            payload=payload,
-            conn=conn,
-            base_dir=run_root,
-        )
+        with transaction(conn):
+            record_evidence(conn, seed=seed, run_id=run_id, module=module, action=action, outcome=outcome)
 
-        fee_record: FeeLedger | None = None
-        if module == "exchange" and action in {"route_swap", "place_order", "cancel_order"}:
-            fee_record = route_fee(module, action, payload, run_id)
-            insert_fee_ledger(conn, fee_record)
-        if module == "chat" and action == "message_event":
-            fee_record = route_fee(module, action, payload, run_id)
-
-        if module == "exchange" and action == "place_order":
-            if fee_record is not None and caller_wallet_address:
-                nyxt_balance = get_wallet_balance(conn, caller_wallet_address, "NYXT")
-                required = int(fee_record.total_paid)
-                if payload.get("asset_in") == "NYXT":
-                    required += int(payload.get("amount", 0) or 0)
-                if nyxt_balance < required:
-                    raise GatewayError("insufficient NYXT balance for amount + fee")
-            order = Order(
-                order_id=order_id(run_id),
-                owner_address=payload["owner_address"],
-                side=payload["side"],
-                amount=payload["amount"],
-                price=payload["price"],
-                asset_in=payload["asset_in"],
-                asset_out=payload["asset_out"],
-                run_id=run_id,
-            )
-            try:
-                place_order(conn, order)
-            except ExchangeError as exc:
-                raise GatewayError(str(exc)) from exc
-        if module == "exchange" and action == "cancel_order":
-            try:
-                if caller_wallet_address:
-                    record = load_by_id(conn, "orders", "order_id", payload["order_id"])
-                    if record is None:
-                        raise GatewayError("order_id not found")
-                    if str(record.get("owner_address")) != caller_wallet_address:
-                        raise GatewayError("order_id ownership mismatch")
-                    if str(record.get("status") or "open") != "open":
-                        raise GatewayError("order not cancellable")
-                cancel_order(conn, payload["order_id"])
-            except ExchangeError as exc:
-                raise GatewayError(str(exc)) from exc
-        if fee_record is not None and module == "exchange" and action in {"place_order", "cancel_order"}:
-            if not caller_wallet_address:
-                raise GatewayError("auth required")
-            apply_wallet_transfer(
-                conn,
-                transfer_id=deterministic_id("fee", run_id),
-                from_address=caller_wallet_address,
-                to_address=fee_record.fee_address,
-                asset_id="NYXT",
-                amount=0,
-                fee_total=fee_record.total_paid,
-                treasury_address=fee_record.fee_address,
-                run_id=run_id,
-            )
-
-        if module == "chat" and action == "message_event":
-            if not caller_account_id:
-                raise GatewayError("auth required")
-            if fee_record is not None:
-                if not caller_wallet_address:
-                    raise GatewayError("auth required")
-                nyxt_balance = get_wallet_balance(conn, caller_wallet_address, "NYXT")
-                if nyxt_balance < int(fee_record.total_paid):
-                    raise GatewayError("insufficient NYXT balance for fee")
-                apply_wallet_transfer(
-                    conn,
-                    transfer_id=deterministic_id("fee", run_id),
-                    from_address=caller_wallet_address,
-                    to_address=fee_record.fee_address,
-                    asset_id="NYXT",
-                    amount=0,
-                    fee_total=fee_record.total_paid,
-                    treasury_address=fee_record.fee_address,
-                    run_id=run_id,
-                )
+            fee_record: FeeLedger | None = None
+            if key in _LEDGER_FEE_RUN_ACTIONS:
+                fee_record = route_fee(module, action, payload, run_id)
                 insert_fee_ledger(conn, fee_record)
-            chat_record_message_event(conn, run_id, payload, caller_account_id)
-        if module == "marketplace" and action == "listing_publish":
-            marketplace_publish_listing(conn, run_id, payload, caller_wallet_address)
-        if module == "marketplace" and action == "purchase_listing":
-            marketplace_purchase_listing(conn, run_id, payload, caller_wallet_address)
-        if module == "entertainment" and action == "state_step":
-            _ensure_entertainment_items(conn)
-            item_record = load_by_id(conn, "entertainment_items", "item_id", payload["item_id"])
-            if item_record is None:
-                raise GatewayError("item_id not found")
-            insert_entertainment_event(
-                conn,
-                EntertainmentEvent(
-                    event_id=deterministic_id("ent-event", run_id),
-                    item_id=payload["item_id"],
-                    mode=payload["mode"],
-                    step=payload["step"],
-                    run_id=run_id,
-                ),
-            )
-        if module == "dapp" and action == "sign_request":
-            conn.execute(
-                "INSERT INTO message_events (message_id, channel, body, run_id) VALUES (?, ?, ?, ?)",
-                (deterministic_id("dapp-sig", run_id), payload["dapp_url"], f"Signed: {payload['method']}", run_id),
-            )
+            elif key in _DEFERRED_FEE_RUN_ACTIONS:
+                fee_record = route_fee(module, action, payload, run_id)
+
+            handler = _RUN_HANDLERS.get(key)
+            if handler is not None:
+                handler(conn, run_id, payload, caller_wallet_address, caller_account_id, fee_record)
+        if key in _LISTING_MUTATION_RUN_ACTIONS:
+            _invalidate_listing_caches()
 
         return GatewayResult(
             run_id=run_id,
@@ -376,50 +525,54 @@ def execute_wallet_transfer(
     )
     fee_record = route_fee("wallet", "transfer", validated, run_id)
     conn = create_connection(db_path or _db_path())
-
-    from_balance = get_wallet_balance(conn, validated["from_address"], asset_id)
-    nyxt_balance = get_wallet_balance(conn, validated["from_address"], "NYXT")
-
-    if asset_id == "NYXT":
-        if nyxt_balance < (validated["amount"] + fee_record.total_paid):
-            raise GatewayError("insufficient balance for amount + fee")
-    else:
-        if from_balance < validated["amount"]:
-            raise GatewayError(f"insufficient {asset_id} balance")
-        if nyxt_balance < fee_record.total_paid:
-            raise GatewayError("insufficient NYXT balance for fee")
-
-    outcome = run_and_record(
-        seed=seed,
-        run_id=run_id,
-        module="wallet",
-        action="transfer",
-        payload=validated,
-        conn=conn,
-        base_dir=run_root or _run_root(),
-    )
-    balances = apply_wallet_transfer(
-        conn,
-        transfer_id=deterministic_id("wallet", run_id),
-        from_address=validated["from_address"],
-        to_address=validated["to_address"],
-        asset_id=asset_id,
-        amount=validated["amount"],
-        fee_total=fee_record.total_paid,
-        treasury_address=fee_record.fee_address,
-        run_id=run_id,
-    )
-    insert_fee_ledger(conn, fee_record)
-    return (
-        GatewayResult(
+    try:
+        from_balance = get_wallet_balance(conn, validated["from_address"], asset_id)
+        nyxt_balance = get_wallet_balance(conn, validated["from_address"], "NYXT")
+
+        if asset_id == "NYXT":
+            if nyxt_balance < (validated["amount"] + fee_record.total_paid):
+                raise GatewayError("insufficient balance for amount + fee")
+        else:
+            if from_balance < validated["amount"]:
+                raise GatewayError(f"insufficient {asset_id} balance")
+            if nyxt_balance < fee_record.total_paid:
+                raise GatewayError("insufficient NYXT balance for fee")
+
+        # apply_wallet_transfer re-checks balances under the write lock.
+        outcome = evaluate_evidence(
+            seed=seed,
             run_id=run_id,
-            state_hash=outcome.state_hash,
-            receipt_hashes=outcome.receipt_hashes,
-            replay_ok=outcome.replay_ok,
-        ),
-        balances,
-        fee_record,
-    )
+            module="wallet",
+            action="transfer",
+            payload=validated,
+            base_dir=run_root or _run_root(),
+        )
+        with transaction(conn):
+            record_evidence(conn, seed=seed, run_id=run_id, module="wallet", action="transfer", outcome=outcome)
+            balances = apply_wallet_transfer(
+                conn,
+                transfer_id=deterministic_id("wallet", run_id),
+                from_address=validated["from_address"],
+                to_address=validated["to_address"],
+                asset_id=asset_id,
+                amount=validated["amount"],
+                fee_total=fee_record.total_paid,
+                treasury_address=fee_record.fee_address,
+                run_id=run_id,
+            )
+            insert_fee_ledger(conn, fee_record)
+        return (
+            GatewayResult(
+                run_id=run_id,
+                state_hash=outcome.state_hash,
+                receipt_hashes=outcome.receipt_hashes,
+                replay_ok=outcome.replay_ok,
+            ),
+            balances,
+            fee_record,
+        )
+    finally:
+        conn.close()
 
 
 def execute_wallet_faucet(
@@ -448,40 +601,159 @@ def execute_wallet_faucet(
         metadata={"asset_id": asset_id, "amount": amount},
     )
     fee_record = route_fee("wallet", "faucet", validated, run_id)
-    conn = create_connection(db_path or _db_path())
-    outcome = run_and_record(
+    outcome = evaluate_evidence(
         seed=seed,
         run_id=run_id,
         module="wallet",
         action="faucet",
         payload=validated,
-        conn=conn,
         base_dir=run_root or _run_root(),
     )
+    conn = create_connection(db_path or _db_path())
+    try:
+        with transaction(conn):
+            record_evidence(conn, seed=seed, run_id=run_id, module="wallet", action="faucet", outcome=outcome)
+            result = apply_wallet_faucet_with_fee(
+                conn,
+                address=address,
+                amount=amount,
+                fee_total=fee_record.total_paid,
+                treasury_address=fee_record.fee_address,
+                run_id=run_id,
+                asset_id=asset_id,
+            )
+            insert_fee_ledger(conn, fee_record)
 
-    result = apply_wallet_faucet_with_fee(
-        conn,
-        address=address,
-        amount=amount,
-        fee_total=fee_record.total_paid,
-        treasury_address=fee_record.fee_address,
-        run_id=run_id,
-        asset_id=asset_id,
+        return (
+            GatewayResult(
+                run_id=run_id,
+                state_hash=outcome.state_hash,
+                receipt_hashes=outcome.receipt_hashes,
+                replay_ok=outcome.replay_ok,
+            ),
+            result,
+            fee_record,
+        )
+    finally:
+        conn.close()
+
+
+_DAY_SECONDS = 86400
+_FAUCET_USAGE_TTL_SECONDS = 2.0
+_FAUCET_USAGE_CACHE_MAX = 4096
+_FAUCET_USAGE_CACHE: dict[tuple[str, str, str], tuple[float, int, int, int, int]] = {}
+_FAUCET_USAGE_LOCK = threading.Lock()
+# Bumped on every invalidation so totals read before a claim committed are not stored after it.
+_faucet_usage_generation = 0
+
+
+def _load_faucet_usage(conn, account_id: str, ip: str, window_start: int) -> tuple[int, int, int, int]:
+    row = conn.execute(
+        "SELECT "
+        "(SELECT COALESCE(MAX(created_at), 0) FROM faucet_claims WHERE account_id = ?) AS last_at, "
+        "(SELECT COALESCE(SUM(amount), 0) FROM faucet_claims WHERE account_id = ? AND created_at >= ?) AS total_amount, "
+        "(SELECT COUNT(*) FROM faucet_claims WHERE account_id = ? AND created_at >= ?) AS claim_count, "
+        "(SELECT COUNT(*) FROM faucet_claims WHERE ip = ? AND created_at >= ?) AS ip_claim_count",
+        (account_id, account_id, window_start, account_id, window_start, ip, window_start),
+    ).fetchone()
+    return (
+        int(row["total_amount"]),
+        int(row["claim_count"]),
+        int(row["ip_claim_count"]),
+        int(row["last_at"]),
     )
-    insert_fee_ledger(conn, fee_record)
 
+
+# Rejected faucet attempts never write, so a short-lived cached aggregate stays exact
+# until the next successful claim, which invalidates it.
+def _faucet_usage(conn, cache_key: tuple[str, str, str], window_start: int) -> tuple[int, int, int, int]:
+    now = time.monotonic()
+    with _FAUCET_USAGE_LOCK:
+        generation = _faucet_usage_generation
+        cached = _FAUCET_USAGE_CACHE.get(cache_key)
+    if cached is not None and now < cached[0]:
+        return cached[1], cached[2], cached[3], cached[4]
+
+    _, account_id, ip = cache_key
+    usage = _load_faucet_usage(conn, account_id, ip, window_start)
+    with _FAUCET_USAGE_LOCK:
+        if generation != _faucet_usage_generation:
+            return usage
+        if len(_FAUCET_USAGE_CACHE) >= _FAUCET_USAGE_CACHE_MAX:
+            for key in [key for key, entry in _FAUCET_USAGE_CACHE.items() if entry[0] <= now]:
+                del _FAUCET_USAGE_CACHE[key]
+            if len(_FAUCET_USAGE_CACHE) >= _FAUCET_USAGE_CACHE_MAX:
+                _FAUCET_USAGE_CACHE.clear()
+        _FAUCET_USAGE_CACHE[cache_key] = (now + _FAUCET_USAGE_TTL_SECONDS, *usage)
+    return usage
+
+
+def _invalidate_faucet_usage(db_key: str, account_id: str, ip: str) -> None:
+    global _faucet_usage_generation
+    # A claim changes the account's aggregates and the ip count seen by every account on that ip.
+    with _FAUCET_USAGE_LOCK:
+        _faucet_usage_generation += 1
+        for key in [key for key in _FAUCET_USAGE_CACHE if key[0] == db_key and (key[1] == account_id or key[2] == ip)]:
+            del _FAUCET_USAGE_CACHE[key]
+
+
+def _check_faucet_usage(
+    usage: tuple[int, int, int, int], limits: tuple[int, int, int, int], *, now: int, requested_amount: int
+) -> None:
+    total_amount, claim_count, ip_claim_count, last_at = usage
+    cooldown, max_amount, max_claims, ip_max_claims = limits
+    if last_at and cooldown:
+        retry_after = cooldown - (now - last_at)
+        if retry_after > 0:
+            raise GatewayApiError(
+                "FAUCET_COOLDOWN",
+                "faucet cooldown active",
+                http_status=429,
+                details={"retry_after_seconds": retry_after},
+            )
+
+    if max_claims and claim_count >= max_claims:
+        raise GatewayApiError(
+            "FAUCET_DAILY_CLAIMS_EXCEEDED",
+            "daily faucet claim limit exceeded",
+            http_status=429,
+            details={"max_claims_per_24h": max_claims},
+        )
+
+    if max_amount and (total_amount + requested_amount) > max_amount:
+        raise GatewayApiError(
+            "FAUCET_DAILY_AMOUNT_EXCEEDED",
+            "daily faucet amount limit exceeded",
+            http_status=429,
+            details={
+                "max_amount_per_24h": max_amount,
+                "already_claimed_amount_24h": total_amount,
+            },
+        )
+
+    if ip_max_claims and ip_claim_count >= ip_max_claims:
+        raise GatewayApiError(
+            "FAUCET_IP_LIMIT_EXCEEDED",
+            "ip faucet claim limit exceeded",
+            http_status=429,
+            details={"ip_max_claims_per_24h": ip_max_claims},
+        )
+
+
+@functools.cache
+def _faucet_limits() -> tuple[int, int, int, int]:
     return (
-        GatewayResult(
-            run_id=run_id,
-            state_hash=outcome.state_hash,
-            receipt_hashes=outcome.receipt_hashes,
-            replay_ok=outcome.replay_ok,
-        ),
-        result,
-        fee_record,
+        get_faucet_cooldown_seconds(),
+        get_faucet_max_amount_per_24h(),
+        get_faucet_max_claims_per_24h(),
+        get_faucet_ip_max_claims_per_24h(),
     )
 
 
+def _refresh_faucet_env() -> None:
+    _faucet_limits.cache_clear()
+
+
 def execute_wallet_faucet_v1(
     *,
     seed: int,
@@ -504,11 +776,8 @@ def execute_wallet_faucet_v1(
 
     ip = (client_ip or "unknown").strip() or "unknown"
     now = int(time.time())
-    window_start = now - 24 * 60 * 60
-    cooldown = get_faucet_cooldown_seconds()
-    max_amount = get_faucet_max_amount_per_24h()
-    max_claims = get_faucet_max_claims_per_24h()
-    ip_max_claims = get_faucet_ip_max_claims_per_24h()
+    window_start = now - _DAY_SECONDS
+    limits = _faucet_limits()
 
     compliance.require_clearance(
         account_id=account_id,
@@ -519,99 +788,57 @@ def execute_wallet_faucet_v1(
         metadata={"asset_id": validated.get("asset_id", "NYXT"), "amount": validated.get("amount")},
     )
 
-    conn = create_connection(db_path or _db_path())
+    resolved_db_path = db_path or _db_path()
+    conn = create_connection(resolved_db_path)
     try:
-        last_row = conn.execute(
-            "SELECT created_at FROM faucet_claims WHERE account_id = ? ORDER BY created_at DESC LIMIT 1",
-            (account_id,),
-        ).fetchone()
-        if last_row is not None and cooldown:
-            last_at = int(last_row["created_at"])
-            retry_after = cooldown - (now - last_at)
-            if retry_after > 0:
-                raise GatewayApiError(
-                    "FAUCET_COOLDOWN",
-                    "faucet cooldown active",
-                    http_status=429,
-                    details={"retry_after_seconds": retry_after},
-                )
-
-        row = conn.execute(
-            "SELECT COALESCE(SUM(amount), 0) AS total_amount, COUNT(*) AS claim_count "
-            "FROM faucet_claims WHERE account_id = ? AND created_at >= ?",
-            (account_id, window_start),
-        ).fetchone()
-        total_amount = int(row["total_amount"]) if row is not None else 0
-        claim_count = int(row["claim_count"]) if row is not None else 0
-
-        if max_claims and claim_count >= max_claims:
-            raise GatewayApiError(
-                "FAUCET_DAILY_CLAIMS_EXCEEDED",
-                "daily faucet claim limit exceeded",
-                http_status=429,
-                details={"max_claims_per_24h": max_claims},
-            )
-
+        cache_key = (str(resolved_db_path), account_id, ip)
         requested_amount = int(validated["amount"])
-        if max_amount and (total_amount + requested_amount) > max_amount:
-            raise GatewayApiError(
-                "FAUCET_DAILY_AMOUNT_EXCEEDED",
-                "daily faucet amount limit exceeded",
-                http_status=429,
-                details={
-                    "max_amount_per_24h": max_amount,
-                    "already_claimed_amount_24h": total_amount,
-                },
-            )
-
-        ip_row = conn.execute(
-            "SELECT COUNT(*) AS claim_count FROM faucet_claims WHERE ip = ? AND created_at >= ?",
-            (ip, window_start),
-        ).fetchone()
-        ip_claim_count = int(ip_row["claim_count"]) if ip_row is not None else 0
-        if ip_max_claims and ip_claim_count >= ip_max_claims:
-            raise GatewayApiError(
-                "FAUCET_IP_LIMIT_EXCEEDED",
-                "ip faucet claim limit exceeded",
-                http_status=429,
-                details={"ip_max_claims_per_24h": ip_max_claims},
-            )
+        _check_faucet_usage(
+            _faucet_usage(conn, cache_key, window_start), limits, now=now, requested_amount=requested_amount
+        )
 
         fee_record = route_fee("wallet", "faucet", validated, run_id)
-        outcome = run_and_record(
+        outcome = evaluate_evidence(
             seed=seed,
             run_id=run_id,
             module="wallet",
             action="faucet",
             payload=validated,
-            conn=conn,
             base_dir=run_root or _run_root(),
         )
-
-        faucet_result = apply_wallet_faucet_with_fee(
-            conn,
-            address=validated["address"],
-            amount=requested_amount,
-            fee_total=fee_record.total_paid,
-            treasury_address=fee_record.fee_address,
-            run_id=run_id,
-            asset_id=validated["asset_id"],
-        )
-        insert_fee_ledger(conn, fee_record)
-        insert_faucet_claim(
-            conn,
-            FaucetClaim(
-                claim_id=deterministic_id("faucet-claim", run_id),
-                account_id=account_id,
+        with transaction(conn):
+            # The cached totals may predate a concurrent claim; re-check against the database under the write lock.
+            _check_faucet_usage(
+                _load_faucet_usage(conn, account_id, ip, window_start),
+                limits,
+                now=now,
+                requested_amount=requested_amount,
+            )
+            record_evidence(conn, seed=seed, run_id=run_id, module="wallet", action="faucet", outcome=outcome)
+            faucet_result = apply_wallet_faucet_with_fee(
+                conn,
                 address=validated["address"],
-                asset_id=validated["asset_id"],
                 amount=requested_amount,
-                ip=ip,
-                created_at=now,
+                fee_total=fee_record.total_paid,
+                treasury_address=fee_record.fee_address,
                 run_id=run_id,
-            ),
-        )
-        conn.commit()
+                asset_id=validated["asset_id"],
+            )
+            insert_fee_ledger(conn, fee_record)
+            insert_faucet_claim(
+                conn,
+                FaucetClaim(
+                    claim_id=deterministic_id("faucet-claim", run_id),
+                    account_id=account_id,
+                    address=validated["address"],
+                    asset_id=validated["asset_id"],
+                    amount=requested_amount,
+                    ip=ip,
+                    created_at=now,
+                    run_id=run_id,
+                ),
+            )
+        _invalidate_faucet_usage(str(resolved_db_path), account_id, ip)
         return (
             GatewayResult(
                 run_id=run_id,
@@ -690,9 +917,83 @@ def fetch_web2_guard_requests(
     )
 
 
-def marketplace_list_active_listings(conn, limit: int = 100, offset: int = 0) -> list[dict[str, object]]:
-    return marketplace_list_active(conn, limit=limit, offset=offset)
+_SEARCH_CACHE_TTL_SECONDS = 10.0
+_SEARCH_CACHE_MAX = 512
+_SEARCH_CACHE: OrderedDict[tuple[str, str, int, int], tuple[float, list[dict[str, object]]]] = OrderedDict()
+_SEARCH_CACHE_LOCK = threading.Lock()
+# One sorted window of active listings serves every page that fits inside it.
+_LISTINGS_WINDOW_SIZE = 1000
+_LISTINGS_PAGE_CACHE_TTL_SECONDS = 30.0
+_LISTINGS_PAGE_CACHE: dict[str, tuple[float, list[dict[str, object]]]] = {}
+# Bumped on every invalidation so a read that raced a listing write is not stored.
+_listing_cache_generation = 0
+
 
+def _invalidate_listing_caches() -> None:
+    global _listing_cache_generation
+    with _SEARCH_CACHE_LOCK:
+        _listing_cache_generation += 1
+        _SEARCH_CACHE.clear()
+        _LISTINGS_PAGE_CACHE.clear()
 
-def marketplace_search_listings(conn, q: str, limit: int = 100, offset: int = 0) -> list[dict[str, object]]:
-    return marketplace_search(conn, q=q, limit=limit, offset=offset)
+
+def marketplace_list_active_listings(
+    conn, limit: int = 100, offset: int = 0, fields: Iterable[str] | None = None
+) -> list[dict[str, object]]:
+    if fields is not None:
+        return marketplace_list_active(conn, limit=limit, offset=offset, fields=fields)
+    db_path = getattr(conn, "db_path", None)
+    if (
+        db_path is None
+        or type(limit) is not int
+        or type(offset) is not int
+        or limit < 1
+        or offset < 0
+        or offset + limit > _LISTINGS_WINDOW_SIZE
+    ):
+        return marketplace_list_active(conn, limit=limit, offset=offset)
+    key = str(db_path)
+    now = time.monotonic()
+    with _SEARCH_CACHE_LOCK:
+        generation = _listing_cache_generation
+        cached = _LISTINGS_PAGE_CACHE.get(key)
+    if cached is None or now >= cached[0]:
+        rows = marketplace_list_active(conn, limit=_LISTINGS_WINDOW_SIZE, offset=0)
+        cached = (now + _LISTINGS_PAGE_CACHE_TTL_SECONDS, rows)
+        with _SEARCH_CACHE_LOCK:
+            if generation == _listing_cache_generation:
+                _LISTINGS_PAGE_CACHE[key] = cached
+    return [dict(row) for row in cached[1][offset : offset + limit]]
+
+
+def marketplace_search_listings(
+    conn, q: str, limit: int = 100, offset: int = 0, fields: Iterable[str] | None = None
+) -> list[dict[str, object]]:
+    db_path = getattr(conn, "db_path", None)
+    if db_path is None or fields is not None:
+        return marketplace_search(conn, q=q, limit=limit, offset=offset, fields=fields)
+    key = (str(db_path), q, limit, offset)
+    now = time.monotonic()
+    with _SEARCH_CACHE_LOCK:
+        generation = _listing_cache_generation
+        cached = _SEARCH_CACHE.get(key)
+        if cached is not None:
+            if now < cached[0]:
+                _SEARCH_CACHE.move_to_end(key)
+                return [dict(row) for row in cached[1]]
+            del _SEARCH_CACHE[key]
+    rows = marketplace_search(conn, q=q, limit=limit, offset=offset)
+    with _SEARCH_CACHE_LOCK:
+        if generation == _listing_cache_generation:
+            _SEARCH_CACHE[key] = (now + _SEARCH_CACHE_TTL_SECONDS, [dict(row) for row in rows])
+            while len(_SEARCH_CACHE) > _SEARCH_CACHE_MAX:
+                _SEARCH_CACHE.popitem(last=False)
+    return rows
+
+
+def marketplace_list_active_listings_columnar(conn, limit: int = 100, offset: int = 0) -> dict[str, list]:
+    return list_listings_columnar(conn, limit=limit, offset=offset)
+
+
+def marketplace_search_listings_columnar(conn, q: str, limit: int = 100, offset: int = 0) -> dict[str, list]:
+    return marketplace_search_columnar(conn, q=q, limit=limit, offset=offset)
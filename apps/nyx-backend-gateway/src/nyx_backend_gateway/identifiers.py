@@ -2,10 +2,32 @@ from __future__ import annotations
 
 import hashlib
 
+# Prefixes come from a small fixed set in code; keep a hasher already fed with "prefix:" for each.
+_PREFIX_HASHERS: dict[str, hashlib._Hash] = {}
+_WALLET_PREFIX = b"wallet:"
+
+
+def _prefix_hasher(prefix: str) -> hashlib._Hash:
+    hasher = _PREFIX_HASHERS.get(prefix)
+    if hasher is None:
+        hasher = _PREFIX_HASHERS.setdefault(prefix, hashlib.sha256(f"{prefix}:".encode("utf-8")))
+    return hasher
+
 
 def deterministic_id(prefix: str, run_id: str) -> str:
-    digest = hashlib.sha256(f"{prefix}:{run_id}".encode("utf-8")).hexdigest()
-    return f"{prefix}-{digest[:16]}"
+    digest = _prefix_hasher(prefix).copy()
+    digest.update(run_id.encode("utf-8"))
+    return f"{prefix}-{digest.hexdigest()[:16]}"
+
+
+def deterministic_ids(run_id: str, prefixes: tuple[str, ...]) -> dict[str, str]:
+    run_bytes = run_id.encode("utf-8")
+    ids: dict[str, str] = {}
+    for prefix in prefixes:
+        digest = _prefix_hasher(prefix).copy()
+        digest.update(run_bytes)
+        ids[prefix] = f"{prefix}-{digest.hexdigest()[:16]}"
+    return ids
 
 
 def order_id(run_id: str) -> str:
@@ -17,5 +39,6 @@ def receipt_id(run_id: str) -> str:
 
 
 def wallet_address(account_id: str) -> str:
-    digest = hashlib.sha256(f"wallet:{account_id}".encode("utf-8")).hexdigest()
-    return f"wallet-{digest[:16]}"
+    digest = hashlib.sha256(_WALLET_PREFIX)
+    digest.update(account_id.encode("utf-8"))
+    return f"wallet-{digest.hexdigest()[:16]}"
@@ -1,25 +1,37 @@
 from __future__ import annotations
 
+import http.client
 import json
 import re
+import select
 import socket
+import threading
+import time
+from collections import OrderedDict
 from typing import Any
 from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
+from urllib.parse import SplitResult, urljoin, urlsplit
+from urllib.request import Request, getproxies, proxy_bypass, urlopen
 
+import nyx_backend_gateway.metrics as metrics
 from nyx_backend_gateway.env import get_0x_api_key, get_jupiter_api_key, get_magic_eden_api_key
 from nyx_backend_gateway.gateway import GatewayApiError
 
 _DEFAULT_TIMEOUT_SECONDS = 10
 _MAX_UPSTREAM_BYTES = 250_000
-
-_SAFE_TEXT = re.compile(r"^[A-Za-z0-9:/_.-]{1,256}$")
-_SAFE_HEX_OR_WORD = re.compile(r"^[A-Za-z0-9_-]{1,256}$")
-_SAFE_SOL_MINT = re.compile(r"^[1-9A-HJ-NP-Za-km-z]{32,64}$")
-_SAFE_EVM_ADDRESS = re.compile(r"^0x[a-fA-F0-9]{40}$")
-_SAFE_ME_SYMBOL = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
-_SAFE_ME_PATTERN = re.compile(r"^[A-Za-z0-9 _.-]{1,64}$")
+_MAX_IDLE_PER_HOST = 8
+# Redirects are followed the way urllib's HTTPRedirectHandler does, with the same limit.
+_REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+_MAX_REDIRECTS = 10
+_RETRYABLE_METHODS = frozenset({"GET", "HEAD"})
+
+_SAFE_TEXT = re.compile(r"[A-Za-z0-9:/_.-]{1,256}")
+_SAFE_HEX_OR_WORD = re.compile(r"[A-Za-z0-9_-]{1,256}")
+_SAFE_EVM_ADDRESS = re.compile(r"0x[a-fA-F0-9]{40}")
+_SAFE_ME_SYMBOL = re.compile(r"[A-Za-z0-9_-]{1,64}")
+_SAFE_ME_PATTERN = re.compile(r"[A-Za-z0-9 _.-]{1,64}")
+_EVM_ZERO_HIGH_DIGITS = "0" * 36
+_SOL_MINT_STRIP = str.maketrans("", "", "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz")
 _MAGIC_EDEN_EVM_CHAINS = {
     "ethereum",
     "polygon",
@@ -33,6 +45,148 @@ _MAGIC_EDEN_EVM_CHAINS = {
     "berachain",
     "monad",
 }
+_0X_API_BASE = "https://api.0x.org"
+_0X_NETWORK_CHAIN_IDS = {
+    "ethereum": 1,
+    "mainnet": 1,
+    "polygon": 137,
+    "optimism": 10,
+    "arbitrum": 42161,
+    "base": 8453,
+    "bsc": 56,
+    "avalanche": 43114,
+}
+_0X_NETWORK_BASE_URLS = {network: _0X_API_BASE for network in _0X_NETWORK_CHAIN_IDS}
+_0X_CHAIN_BASE_URLS = {chain_id: _0X_API_BASE for chain_id in _0X_NETWORK_CHAIN_IDS.values()}
+_0X_SUPPORTED_NETWORKS = tuple(sorted(_0X_NETWORK_BASE_URLS))
+_0X_SUPPORTED_CHAINS = tuple(sorted(_0X_CHAIN_BASE_URLS))
+
+_POOL: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+_POOL_LOCK = threading.Lock()
+# Magic Eden read endpoints are polled by the UI; a short TTL collapses duplicate upstream calls.
+_RESPONSE_CACHE_TTL_SECONDS = 15.0
+_RESPONSE_CACHE_MAX = 1024
+_RESPONSE_CACHE: OrderedDict[tuple[str, tuple[tuple[str, str], ...]], tuple[float, dict[str, Any]]] = OrderedDict()
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+
+def _connection_dropped(conn: http.client.HTTPConnection) -> bool:
+    # An idle keep-alive socket only becomes readable when the upstream has closed it.
+    if conn.sock is None:
+        return True
+    try:
+        return bool(select.select([conn.sock], [], [], 0)[0])
+    except (OSError, ValueError):
+        return True
+
+
+def _pool_acquire(scheme: str, netloc: str) -> tuple[http.client.HTTPConnection, bool]:
+    with _POOL_LOCK:
+        idle = _POOL.get((scheme, netloc))
+        while idle:
+            conn = idle.pop()
+            if not _connection_dropped(conn):
+                return conn, True
+            conn.close()
+    if scheme == "https":
+        return http.client.HTTPSConnection(netloc, timeout=_DEFAULT_TIMEOUT_SECONDS), False
+    if scheme == "http":
+        return http.client.HTTPConnection(netloc, timeout=_DEFAULT_TIMEOUT_SECONDS), False
+    raise GatewayApiError("UPSTREAM_UNAVAILABLE", "upstream unavailable", http_status=502)
+
+
+def _pool_release(scheme: str, netloc: str, conn: http.client.HTTPConnection) -> None:
+    with _POOL_LOCK:
+        idle = _POOL.setdefault((scheme, netloc), [])
+        if len(idle) < _MAX_IDLE_PER_HOST:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+def _upstream_request(method: str, url: str, headers: dict[str, str], data: bytes | None = None) -> tuple[int, bytes]:
+    for _ in range(_MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        proxies = getproxies()
+        if parts.scheme in proxies and not proxy_bypass(parts.netloc):
+            return _proxied_request(method, url, headers, data)
+        status, location, body = _pooled_request(method, parts, headers, data)
+        if status not in _REDIRECT_STATUSES or not location:
+            return status, body
+        if method not in _RETRYABLE_METHODS and not (method == "POST" and status in (301, 302, 303)):
+            return status, body
+        target = urljoin(url, location)
+        if urlsplit(target).scheme not in ("http", "https"):
+            return status, body
+        url, method, data = target, "GET", None
+        headers = {
+            key: value for key, value in headers.items() if key.lower() not in ("content-length", "content-type")
+        }
+    return status, body
+
+
+def _proxied_request(method: str, url: str, headers: dict[str, str], data: bytes | None) -> tuple[int, bytes]:
+    # Proxy tunnelling and authentication are left to urllib; these requests are not pooled.
+    req = Request(url, data=data, headers=headers, method=method)
+    try:
+        with urlopen(req, timeout=_DEFAULT_TIMEOUT_SECONDS) as resp:
+            return resp.status, _read_limited(resp, _MAX_UPSTREAM_BYTES)
+    except HTTPError as exc:
+        try:
+            body = _read_limited(exc, _MAX_UPSTREAM_BYTES)
+        except Exception:
+            body = b""
+        return exc.code, body
+    except URLError as exc:
+        if isinstance(exc.reason, socket.timeout):
+            raise GatewayApiError("UPSTREAM_TIMEOUT", "upstream timeout", http_status=504) from exc
+        raise GatewayApiError("UPSTREAM_UNAVAILABLE", "upstream unavailable", http_status=502) from exc
+    except socket.timeout as exc:
+        raise GatewayApiError("UPSTREAM_TIMEOUT", "upstream timeout", http_status=504) from exc
+    except (http.client.HTTPException, OSError) as exc:
+        raise GatewayApiError("UPSTREAM_UNAVAILABLE", "upstream unavailable", http_status=502) from exc
+
+
+def _pooled_request(
+    method: str, parts: SplitResult, headers: dict[str, str], data: bytes | None
+) -> tuple[int, str | None, bytes]:
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    headers = {"host": parts.netloc, **headers}
+    attempts = 2
+    while True:
+        attempts -= 1
+        conn, reused = _pool_acquire(parts.scheme, parts.netloc)
+        try:
+            conn.request(method, path, body=data, headers=headers)
+            resp = conn.getresponse()
+        except socket.timeout as exc:
+            conn.close()
+            raise GatewayApiError("UPSTREAM_TIMEOUT", "upstream timeout", http_status=504) from exc
+        except (http.client.HTTPException, OSError) as exc:
+            conn.close()
+            # The upstream may drop an idle socket just as it is reused. Only requests that are safe to repeat are
+            # retried, since a POST may already have been processed.
+            if reused and attempts > 0 and method in _RETRYABLE_METHODS:
+                continue
+            raise GatewayApiError("UPSTREAM_UNAVAILABLE", "upstream unavailable", http_status=502) from exc
+        try:
+            body = _read_limited(resp, _MAX_UPSTREAM_BYTES)
+        except GatewayApiError:
+            conn.close()
+            raise
+        except socket.timeout as exc:
+            conn.close()
+            raise GatewayApiError("UPSTREAM_TIMEOUT", "upstream timeout", http_status=504) from exc
+        except (http.client.HTTPException, OSError) as exc:
+            conn.close()
+            raise GatewayApiError("UPSTREAM_UNAVAILABLE", "upstream unavailable", http_status=502) from exc
+        if resp.isclosed() and not resp.will_close:
+            _pool_release(parts.scheme, parts.netloc, conn)
+        else:
+            conn.close()
+        return resp.status, resp.getheader("Location"), body
 
 
 def _read_limited(resp, limit: int) -> bytes:
@@ -58,31 +212,17 @@ def _safe_snippet(raw: bytes) -> str:
     return text
 
 
-def _http_get_json(url: str, headers: dict[str, str]) -> dict[str, Any]:
-    req = Request(url, headers=headers, method="GET")
-    try:
-        with urlopen(req, timeout=_DEFAULT_TIMEOUT_SECONDS) as resp:
-            status = getattr(resp, "status", 200)
-            body = _read_limited(resp, _MAX_UPSTREAM_BYTES)
-    except HTTPError as exc:
-        body = b""
-        try:
-            body = _read_limited(exc, _MAX_UPSTREAM_BYTES)
-        except Exception:
-            body = b""
+def _http_json(
+    method: str, url: str, headers: dict[str, str], data: bytes | None = None, *, require_object: bool = False
+) -> dict[str, Any]:
+    status, body = _upstream_request(method, url, headers, data)
+    if status >= 300:
         raise GatewayApiError(
             "UPSTREAM_HTTP_ERROR",
-            f"upstream http error {exc.code}",
+            f"upstream http error {status}",
             http_status=502,
-            details={"status": int(exc.code), "body": _safe_snippet(body)},
-        ) from exc
-    except URLError as exc:
-        reason = getattr(exc, "reason", None)
-        if isinstance(reason, socket.timeout):
-            raise GatewayApiError("UPSTREAM_TIMEOUT", "upstream timeout", http_status=504) from exc
-        raise GatewayApiError("UPSTREAM_UNAVAILABLE", "upstream unavailable", http_status=502) from exc
-    except socket.timeout as exc:
-        raise GatewayApiError("UPSTREAM_TIMEOUT", "upstream timeout", http_status=504) from exc
+            details={"status": int(status), "body": _safe_snippet(body)},
+        )
 
     try:
         parsed = json.loads(body.decode("utf-8"))
@@ -93,7 +233,7 @@ def _http_get_json(url: str, headers: dict[str, str]) -> dict[str, Any]:
             http_status=502,
             details={"status": int(status), "body": _safe_snippet(body)},
         ) from exc
-    if not isinstance(parsed, dict):
+    if require_object and not isinstance(parsed, dict):
         raise GatewayApiError(
             "UPSTREAM_BAD_JSON",
             "upstream returned non-object json",
@@ -103,82 +243,47 @@ def _http_get_json(url: str, headers: dict[str, str]) -> dict[str, Any]:
     return {"status": int(status), "data": parsed}
 
 
-def _http_get_json_any(url: str, headers: dict[str, str]) -> dict[str, Any]:
-    req = Request(url, headers=headers, method="GET")
-    try:
-        with urlopen(req, timeout=_DEFAULT_TIMEOUT_SECONDS) as resp:
-            status = getattr(resp, "status", 200)
-            body = _read_limited(resp, _MAX_UPSTREAM_BYTES)
-    except HTTPError as exc:
-        body = b""
-        try:
-            body = _read_limited(exc, _MAX_UPSTREAM_BYTES)
-        except Exception:
-            body = b""
-        raise GatewayApiError(
-            "UPSTREAM_HTTP_ERROR",
-            f"upstream http error {exc.code}",
-            http_status=502,
-            details={"status": int(exc.code), "body": _safe_snippet(body)},
-        ) from exc
-    except URLError as exc:
-        reason = getattr(exc, "reason", None)
-        if isinstance(reason, socket.timeout):
-            raise GatewayApiError("UPSTREAM_TIMEOUT", "upstream timeout", http_status=504) from exc
-        raise GatewayApiError("UPSTREAM_UNAVAILABLE", "upstream unavailable", http_status=502) from exc
-    except socket.timeout as exc:
-        raise GatewayApiError("UPSTREAM_TIMEOUT", "upstream timeout", http_status=504) from exc
+def _http_get_json(url: str, headers: dict[str, str]) -> dict[str, Any]:
+    return _http_json("GET", url, headers, require_object=True)
 
-    try:
-        parsed = json.loads(body.decode("utf-8"))
-    except Exception as exc:
-        raise GatewayApiError(
-            "UPSTREAM_BAD_JSON",
-            "upstream returned invalid json",
-            http_status=502,
-            details={"status": int(status), "body": _safe_snippet(body)},
-        ) from exc
-    return {"status": int(status), "data": parsed}
+
+def _http_get_json_any(url: str, headers: dict[str, str]) -> dict[str, Any]:
+    return _http_json("GET", url, headers)
+
+
+def _http_get_json_cached(url: str, headers: dict[str, str]) -> dict[str, Any]:
+    key = (url, tuple(sorted(headers.items())))
+    now = time.monotonic()
+    with _RESPONSE_CACHE_LOCK:
+        cached = _RESPONSE_CACHE.get(key)
+        if cached is not None:
+            if now < cached[0]:
+                _RESPONSE_CACHE.move_to_end(key)
+                metrics.record_upstream_cache(True)
+                return dict(cached[1])
+            del _RESPONSE_CACHE[key]
+    metrics.record_upstream_cache(False)
+    result = _http_get_json_any(url, headers)
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE[key] = (now + _RESPONSE_CACHE_TTL_SECONDS, result)
+        while len(_RESPONSE_CACHE) > _RESPONSE_CACHE_MAX:
+            _RESPONSE_CACHE.popitem(last=False)
+    return dict(result)
 
 
 def _http_post_json_any(url: str, headers: dict[str, str], payload: dict[str, Any]) -> dict[str, Any]:
     body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
-    headers = {**headers, "content-type": "application/json"}
-    req = Request(url, headers=headers, method="POST", data=body)
-    try:
-        with urlopen(req, timeout=_DEFAULT_TIMEOUT_SECONDS) as resp:
-            status = getattr(resp, "status", 200)
-            resp_body = _read_limited(resp, _MAX_UPSTREAM_BYTES)
-    except HTTPError as exc:
-        resp_body = b""
-        try:
-            resp_body = _read_limited(exc, _MAX_UPSTREAM_BYTES)
-        except Exception:
-            resp_body = b""
-        raise GatewayApiError(
-            "UPSTREAM_HTTP_ERROR",
-            f"upstream http error {exc.code}",
-            http_status=502,
-            details={"status": int(exc.code), "body": _safe_snippet(resp_body)},
-        ) from exc
-    except URLError as exc:
-        reason = getattr(exc, "reason", None)
-        if isinstance(reason, socket.timeout):
-            raise GatewayApiError("UPSTREAM_TIMEOUT", "upstream timeout", http_status=504) from exc
-        raise GatewayApiError("UPSTREAM_UNAVAILABLE", "upstream unavailable", http_status=502) from exc
-    except socket.timeout as exc:
-        raise GatewayApiError("UPSTREAM_TIMEOUT", "upstream timeout", http_status=504) from exc
+    return _http_json("POST", url, {**headers, "content-type": "application/json"}, body)
 
-    try:
-        parsed = json.loads(resp_body.decode("utf-8"))
-    except Exception as exc:
-        raise GatewayApiError(
-            "UPSTREAM_BAD_JSON",
-            "upstream returned invalid json",
-            http_status=502,
-            details={"status": int(status), "body": _safe_snippet(resp_body)},
-        ) from exc
-    return {"status": int(status), "data": parsed}
+
+def _safe_query(params: dict[str, str]) -> str:
+    # Every value reaching here has passed an allowlist of URL-unreserved characters, so no quoting is needed.
+    return "&".join(f"{key}={value}" for key, value in params.items())
+
+
+def _bps_to_fraction(bps: int) -> str:
+    whole, frac = divmod(bps, 10_000)
+    return f"{whole}.{frac:04d}".rstrip("0").rstrip(".")
 
 
 def _require_nonempty_str(value: str, *, name: str, pattern: re.Pattern[str] | None = None) -> str:
@@ -192,6 +297,34 @@ def _require_nonempty_str(value: str, *, name: str, pattern: re.Pattern[str] | N
     return raw
 
 
+def _is_sol_mint(value: str) -> bool:
+    return 32 <= len(value) <= 64 and not value.translate(_SOL_MINT_STRIP)
+
+
+def _is_evm_address(value: str) -> bool:
+    if len(value) != 42 or not value.startswith("0x"):
+        return False
+    try:
+        # fromhex skips whitespace, so also require all 40 characters to have decoded.
+        return len(bytes.fromhex(value[2:])) == 20
+    except ValueError:
+        return False
+
+
+def _require_evm_address(value: str, *, name: str) -> str:
+    raw = _require_nonempty_str(value, name=name)
+    if not _is_evm_address(raw):
+        raise GatewayApiError("PARAM_INVALID", f"{name} invalid", http_status=400, details={"param": name})
+    return raw
+
+
+def _require_sol_mint(value: str, *, name: str) -> str:
+    raw = _require_nonempty_str(value, name=name)
+    if not _is_sol_mint(raw):
+        raise GatewayApiError("PARAM_INVALID", f"{name} invalid", http_status=400, details={"param": name})
+    return raw
+
+
 def _optional_int(
     value: str | None, *, name: str, min_value: int | None = None, max_value: int | None = None
 ) -> int | None:
@@ -241,47 +374,26 @@ def _split_csv(value: str | None, *, name: str, max_items: int = 50) -> list[str
 
 def _0x_base_url(network: str | None, chain_id: int | None) -> str:
     if network:
-        network = network.strip().lower()
-    network_map = {
-        "ethereum": "https://api.0x.org",
-        "mainnet": "https://api.0x.org",
-        "polygon": "https://api.0x.org",
-        "optimism": "https://api.0x.org",
-        "arbitrum": "https://api.0x.org",
-        "base": "https://api.0x.org",
-        "bsc": "https://api.0x.org",
-        "avalanche": "https://api.0x.org",
-    }
-    chain_map = {
-        1: "https://api.0x.org",
-        10: "https://api.0x.org",
-        56: "https://api.0x.org",
-        137: "https://api.0x.org",
-        42161: "https://api.0x.org",
-        8453: "https://api.0x.org",
-        43114: "https://api.0x.org",
-    }
-    if network:
-        base = network_map.get(network)
+        base = _0X_NETWORK_BASE_URLS.get(network.strip().lower())
         if not base:
             raise GatewayApiError(
                 "PARAM_INVALID",
                 "network not supported",
                 http_status=400,
-                details={"param": "network", "supported": sorted(network_map.keys())},
+                details={"param": "network", "supported": list(_0X_SUPPORTED_NETWORKS)},
             )
         return base
     if chain_id is not None:
-        base = chain_map.get(chain_id)
+        base = _0X_CHAIN_BASE_URLS.get(chain_id)
         if not base:
             raise GatewayApiError(
                 "PARAM_INVALID",
                 "chain_id not supported",
                 http_status=400,
-                details={"param": "chain_id", "supported": sorted(chain_map.keys())},
+                details={"param": "chain_id", "supported": list(_0X_SUPPORTED_CHAINS)},
             )
         return base
-    return "https://api.0x.org"
+    return _0X_API_BASE
 
 
 def quote_0x(
@@ -302,17 +414,7 @@ def quote_0x(
     # 0x v2 (permit2) requires chainId + token addresses + taker address.
     if network:
         net = network.strip().lower()
-        default_chain_map = {
-            "ethereum": 1,
-            "mainnet": 1,
-            "polygon": 137,
-            "optimism": 10,
-            "arbitrum": 42161,
-            "base": 8453,
-            "bsc": 56,
-            "avalanche": 43114,
-        }
-        inferred = default_chain_map.get(net)
+        inferred = _0X_NETWORK_CHAIN_IDS.get(net)
         if chain_id is None and inferred is not None:
             chain_id = inferred
         if chain_id is not None and inferred is not None and chain_id != inferred:
@@ -325,8 +427,8 @@ def quote_0x(
     if chain_id is None:
         chain_id = 1
 
-    sell_token = _require_nonempty_str(sell_token, name="sell_token", pattern=_SAFE_EVM_ADDRESS)
-    buy_token = _require_nonempty_str(buy_token, name="buy_token", pattern=_SAFE_EVM_ADDRESS)
+    sell_token = _require_evm_address(sell_token, name="sell_token")
+    buy_token = _require_evm_address(buy_token, name="buy_token")
 
     sell_amount = (sell_amount or "").strip() or None
     buy_amount = (buy_amount or "").strip() or None
@@ -344,11 +446,11 @@ def quote_0x(
             http_status=400,
             details={"param": "sell_amount|buy_amount"},
         )
-    if sell_amount is not None and not sell_amount.isdigit():
+    if sell_amount is not None and not (sell_amount.isascii() and sell_amount.isdigit()):
         raise GatewayApiError(
             "PARAM_INVALID", "sell_amount must be integer string", http_status=400, details={"param": "sell_amount"}
         )
-    if buy_amount is not None and not buy_amount.isdigit():
+    if buy_amount is not None and not (buy_amount.isascii() and buy_amount.isdigit()):
         raise GatewayApiError(
             "PARAM_INVALID", "buy_amount must be integer string", http_status=400, details={"param": "buy_amount"}
         )
@@ -358,11 +460,12 @@ def quote_0x(
         raise GatewayApiError(
             "PARAM_REQUIRED", "taker_address required for 0x v2", http_status=400, details={"param": "taker_address"}
         )
-    if not _SAFE_EVM_ADDRESS.fullmatch(taker_address):
+    if not _is_evm_address(taker_address):
         raise GatewayApiError(
             "PARAM_INVALID", "taker_address invalid", http_status=400, details={"param": "taker_address"}
         )
-    if int(taker_address, 16) <= 0xFFFF:
+    # 0x + 40 hex digits: the value is <= 0xffff exactly when the leading 36 digits are all zero.
+    if taker_address[2:38] == _EVM_ZERO_HIGH_DIGITS:
         raise GatewayApiError(
             "PARAM_INVALID",
             "taker_address too low (must be > 0x000000000000000000000000000000000000ffff)",
@@ -385,10 +488,10 @@ def quote_0x(
             raise GatewayApiError(
                 "PARAM_INVALID", "slippage_bps out of bounds", http_status=400, details={"param": "slippage_bps"}
             )
-        params["slippagePercentage"] = f"{slippage_bps / 10_000:.6f}".rstrip("0").rstrip(".")
+        params["slippagePercentage"] = _bps_to_fraction(slippage_bps)
 
     base = _0x_base_url(network, chain_id)
-    url = f"{base}/swap/permit2/quote?{urlencode(params)}"
+    url = f"{base}/swap/permit2/quote?{_safe_query(params)}"
     result = _http_get_json(
         url,
         headers={
@@ -413,8 +516,8 @@ def quote_jupiter(
     if not api_key:
         raise GatewayApiError("INTEGRATION_DISABLED", "jupiter integration disabled (missing api key)", http_status=503)
 
-    input_mint = _require_nonempty_str(input_mint, name="input_mint", pattern=_SAFE_SOL_MINT)
-    output_mint = _require_nonempty_str(output_mint, name="output_mint", pattern=_SAFE_SOL_MINT)
+    input_mint = _require_sol_mint(input_mint, name="input_mint")
+    output_mint = _require_sol_mint(output_mint, name="output_mint")
     amount = _require_nonempty_str(amount, name="amount", pattern=_SAFE_HEX_OR_WORD)
     if not amount.isdigit():
         raise GatewayApiError(
@@ -435,7 +538,7 @@ def quote_jupiter(
         if swap_mode:
             params["swapMode"] = swap_mode
 
-    url = f"https://api.jup.ag/swap/v1/quote?{urlencode(params)}"
+    url = f"https://api.jup.ag/swap/v1/quote?{_safe_query(params)}"
     result = _http_get_json(
         url,
         headers={
@@ -466,8 +569,8 @@ def magic_eden_solana_collections(*, limit: int | None, offset: int | None) -> d
         params["offset"] = str(_optional_int(str(offset), name="offset", min_value=0, max_value=1_000_000))
     url = "https://api-mainnet.magiceden.dev/v2/collections"
     if params:
-        url = f"{url}?{urlencode(params)}"
-    result = _http_get_json_any(url, headers=_magic_eden_headers())
+        url = f"{url}?{_safe_query(params)}"
+    result = _http_get_json_cached(url, headers=_magic_eden_headers())
     return {"provider": "magic_eden", "network": "solana", "endpoint": "collections", **result}
 
 
@@ -480,8 +583,8 @@ def magic_eden_solana_collection_listings(*, symbol: str, limit: int | None, off
         params["offset"] = str(_optional_int(str(offset), name="offset", min_value=0, max_value=1_000_000))
     url = f"https://api-mainnet.magiceden.dev/v2/collections/{symbol}/listings"
     if params:
-        url = f"{url}?{urlencode(params)}"
-    result = _http_get_json_any(url, headers=_magic_eden_headers())
+        url = f"{url}?{_safe_query(params)}"
+    result = _http_get_json_cached(url, headers=_magic_eden_headers())
     return {
         "provider": "magic_eden",
         "network": "solana",
@@ -492,9 +595,9 @@ def magic_eden_solana_collection_listings(*, symbol: str, limit: int | None, off
 
 
 def magic_eden_solana_token(*, mint: str) -> dict[str, Any]:
-    mint = _require_nonempty_str(mint, name="mint", pattern=_SAFE_SOL_MINT)
+    mint = _require_sol_mint(mint, name="mint")
     url = f"https://api-mainnet.magiceden.dev/v2/tokens/{mint}"
-    result = _http_get_json_any(url, headers=_magic_eden_headers())
+    result = _http_get_json_cached(url, headers=_magic_eden_headers())
     return {"provider": "magic_eden", "network": "solana", "endpoint": "token", "mint": mint, **result}
 
 
@@ -531,7 +634,7 @@ def magic_eden_evm_collections(
             _require_nonempty_str(slug, name="collection_slug", pattern=_SAFE_ME_SYMBOL)
     if ids:
         for cid in ids:
-            _require_nonempty_str(cid, name="collection_id", pattern=_SAFE_EVM_ADDRESS)
+            _require_evm_address(cid, name="collection_id")
     payload: dict[str, Any] = {"chain": chain}
     if slugs:
         payload["collectionSlugs"] = slugs
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-from typing import cast
+from typing import Iterable, cast
 
 from nyx_backend_gateway.errors import GatewayError
 from nyx_backend_gateway.fees import route_fee
-from nyx_backend_gateway.identifiers import deterministic_id
+from nyx_backend_gateway.identifiers import deterministic_ids
 from nyx_backend_gateway.storage import (
+    LISTING_COLUMNS,
     Listing,
     Purchase,
     apply_wallet_transfer,
@@ -14,19 +15,35 @@ from nyx_backend_gateway.storage import (
     insert_listing,
     insert_purchase,
     list_listings,
+    list_listings_columnar,
+    listing_select_columns,
     load_by_id,
+    transaction,
 )
 from nyx_backend_gateway.validation import validate_listing_payload, validate_purchase_payload
 
+_LIKE_WILDCARDS = frozenset("%_")
+# Fixed SQL texts so each shape hits the connection's prepared statement cache.
+_SQL_SEARCH_ACTIVE_LIKE = (
+    "SELECT {columns} FROM listings WHERE status = 'active' AND (sku LIKE ? OR title LIKE ?) "
+    "ORDER BY listing_id ASC LIMIT ? OFFSET ?"
+)
+_SQL_SEARCH_ACTIVE_FTS = (
+    "SELECT {columns} FROM listings WHERE rowid IN "
+    "(SELECT rowid FROM listings_fts WHERE listings_fts MATCH ?) "
+    "AND status = 'active' AND (sku LIKE ? OR title LIKE ?) "
+    "ORDER BY listing_id ASC LIMIT ? OFFSET ?"
+)
+_SQL_MARK_LISTING_SOLD = "UPDATE listings SET status = 'sold' WHERE listing_id = ?"
 
-def list_active_listings(conn, limit: int = 100, offset: int = 0) -> list[dict[str, object]]:
-    return list_listings(conn, limit=limit, offset=offset)
 
+def list_active_listings(
+    conn, limit: int = 100, offset: int = 0, fields: Iterable[str] | None = None
+) -> list[dict[str, object]]:
+    return list_listings(conn, limit=limit, offset=offset, fields=fields)
 
-def search_listings(conn, q: str, limit: int = 100, offset: int = 0) -> list[dict[str, object]]:
-    query = (q or "").strip()
-    if not query:
-        return list_listings(conn, limit=limit, offset=offset)
+
+def _search_active(conn, query: str, limit: int, offset: int, columns: str) -> list:
     if len(query) > 64:
         raise GatewayError("q too long")
     lim = int(limit)
@@ -36,12 +53,30 @@ def search_listings(conn, q: str, limit: int = 100, offset: int = 0) -> list[dic
     if off < 0:
         raise GatewayError("offset out of bounds")
     pattern = f"%{query}%"
-    rows = conn.execute(
-        "SELECT * FROM listings WHERE status = 'active' AND (sku LIKE ? OR title LIKE ?) "
-        "ORDER BY listing_id ASC LIMIT ? OFFSET ?",
-        (pattern, pattern, lim, off),
-    ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    if getattr(conn, "listings_fts", False) and len(query) >= 3 and not _LIKE_WILDCARDS.intersection(query):
+        # The trigram index narrows candidates; the LIKE re-check keeps results identical to the scan below.
+        match = '"' + query.replace('"', '""') + '"'
+        sql = _SQL_SEARCH_ACTIVE_FTS.format(columns=columns)
+        return conn.execute(sql, (match, pattern, pattern, lim, off)).fetchall()
+    return conn.execute(_SQL_SEARCH_ACTIVE_LIKE.format(columns=columns), (pattern, pattern, lim, off)).fetchall()
+
+
+def search_listings(
+    conn, q: str, limit: int = 100, offset: int = 0, fields: Iterable[str] | None = None
+) -> list[dict[str, object]]:
+    query = (q or "").strip()
+    if not query:
+        return list_listings(conn, limit=limit, offset=offset, fields=fields)
+    rows = _search_active(conn, query, limit, offset, listing_select_columns(fields))
+    return [dict(row) for row in rows]
+
+
+def search_listings_columnar(conn, q: str, limit: int = 100, offset: int = 0) -> dict[str, list]:
+    query = (q or "").strip()
+    if not query:
+        return list_listings_columnar(conn, limit=limit, offset=offset)
+    rows = _search_active(conn, query, limit, offset, listing_select_columns())
+    return {"columns": list(LISTING_COLUMNS), "rows": [list(row) for row in rows]}
 
 
 def publish_listing(conn, run_id: str, payload: dict[str, object], caller_wallet_address: str | None) -> None:
@@ -49,6 +84,7 @@ def publish_listing(conn, run_id: str, payload: dict[str, object], caller_wallet
     if caller_wallet_address and validated.get("publisher_id") != caller_wallet_address:
         raise GatewayError("publisher_id mismatch")
     fee_record = route_fee("marketplace", "listing_publish", validated, run_id)
+    ids = deterministic_ids(run_id, ("listing", "fee"))
     if caller_wallet_address:
         nyxt_balance = get_wallet_balance(conn, caller_wallet_address, "NYXT")
         if nyxt_balance < int(fee_record.total_paid):
@@ -56,7 +92,7 @@ def publish_listing(conn, run_id: str, payload: dict[str, object], caller_wallet
     insert_listing(
         conn,
         Listing(
-            listing_id=deterministic_id("listing", run_id),
+            listing_id=ids["listing"],
             publisher_id=validated["publisher_id"],
             sku=validated["sku"],
             title=validated["title"],
@@ -68,7 +104,7 @@ def publish_listing(conn, run_id: str, payload: dict[str, object], caller_wallet
     if caller_wallet_address:
         apply_wallet_transfer(
             conn,
-            transfer_id=deterministic_id("fee", run_id),
+            transfer_id=ids["fee"],
             from_address=caller_wallet_address,
             to_address=fee_record.fee_address,
             asset_id="NYXT",
@@ -84,42 +120,44 @@ def purchase_listing(conn, run_id: str, payload: dict[str, object], caller_walle
     validated = validate_purchase_payload(payload)
     if caller_wallet_address and validated.get("buyer_id") != caller_wallet_address:
         raise GatewayError("buyer_id mismatch")
-    listing_record = load_by_id(conn, "listings", "listing_id", validated["listing_id"])
-    if listing_record is None:
-        raise GatewayError("listing_id not found")
-    if str(listing_record.get("status") or "active") != "active":
-        raise GatewayError("listing not available")
-
-    total_price = int(cast(int, listing_record["price"])) * int(cast(int, validated["qty"]))
-    fee_record = route_fee("marketplace", "purchase_listing", validated, run_id)
-    if caller_wallet_address:
-        nyxt_balance = get_wallet_balance(conn, caller_wallet_address, "NYXT")
-        required = total_price + int(fee_record.total_paid)
-        if nyxt_balance < required:
-            raise GatewayError("insufficient NYXT balance for amount + fee")
+    # One write transaction from the availability check to the fee ledger, so a purchase is never half-applied.
+    with transaction(conn):
+        listing_record = load_by_id(conn, "listings", "listing_id", validated["listing_id"])
+        if listing_record is None:
+            raise GatewayError("listing_id not found")
+        if str(listing_record.get("status") or "active") != "active":
+            raise GatewayError("listing not available")
 
-    apply_wallet_transfer(
-        conn,
-        transfer_id=deterministic_id("purchase-xfer", run_id),
-        from_address=validated["buyer_id"],
-        to_address=str(listing_record["publisher_id"]),
-        asset_id="NYXT",
-        amount=total_price,
-        fee_total=int(fee_record.total_paid),
-        treasury_address=fee_record.fee_address,
-        run_id=run_id,
-    )
+        total_price = int(cast(int, listing_record["price"])) * int(cast(int, validated["qty"]))
+        fee_record = route_fee("marketplace", "purchase_listing", validated, run_id)
+        ids = deterministic_ids(run_id, ("purchase-xfer", "purchase"))
+        if caller_wallet_address:
+            nyxt_balance = get_wallet_balance(conn, caller_wallet_address, "NYXT")
+            required = total_price + int(fee_record.total_paid)
+            if nyxt_balance < required:
+                raise GatewayError("insufficient NYXT balance for amount + fee")
 
-    insert_purchase(
-        conn,
-        Purchase(
-            purchase_id=deterministic_id("purchase", run_id),
-            listing_id=validated["listing_id"],
-            buyer_id=validated["buyer_id"],
-            qty=validated["qty"],
+        apply_wallet_transfer(
+            conn,
+            transfer_id=ids["purchase-xfer"],
+            from_address=validated["buyer_id"],
+            to_address=str(listing_record["publisher_id"]),
+            asset_id="NYXT",
+            amount=total_price,
+            fee_total=int(fee_record.total_paid),
+            treasury_address=fee_record.fee_address,
             run_id=run_id,
-        ),
-    )
-    conn.execute("UPDATE listings SET status = 'sold' WHERE listing_id = ?", (validated["listing_id"],))
-    conn.commit()
-    insert_fee_ledger(conn, fee_record)
+        )
+
+        insert_purchase(
+            conn,
+            Purchase(
+                purchase_id=ids["purchase"],
+                listing_id=validated["listing_id"],
+                buyer_id=validated["buyer_id"],
+                qty=validated["qty"],
+                run_id=run_id,
+            ),
+        )
+        conn.execute(_SQL_MARK_LISTING_SOLD, (validated["listing_id"],))
+        insert_fee_ledger(conn, fee_record)
@@ -1,13 +1,30 @@
 from __future__ import annotations
 
+import functools
+import itertools
+import os
 import threading
 import time
+from bisect import bisect_left
 from dataclasses import dataclass
 from typing import Iterable
 
+_SHARD_COUNT = max(1, min(os.cpu_count() or 1, 16))
+_SHARD_SEQUENCE = itertools.count()
+_SHARD_LOCAL = threading.local()
+_LABEL_ESCAPES = str.maketrans({"\\": "\\\\", "\n": " ", '"': '\\"'})
+
+
+def _shard_index() -> int:
+    try:
+        return _SHARD_LOCAL.index
+    except AttributeError:
+        _SHARD_LOCAL.index = next(_SHARD_SEQUENCE) % _SHARD_COUNT
+        return _SHARD_LOCAL.index
+
 
 def _sanitize_label(value: str) -> str:
-    return value.replace("\\", "\\\\").replace("\n", " ").replace('"', '\\"')
+    return value.translate(_LABEL_ESCAPES)
 
 
 def _format_labels(labels: dict[str, str]) -> str:
@@ -17,43 +34,84 @@ def _format_labels(labels: dict[str, str]) -> str:
     return "{" + ",".join(parts) + "}"
 
 
+def _label_tuple(labelnames: tuple[str, ...], labels: dict[str, str]) -> tuple[str, ...]:
+    # Same key count and every name present means the key sets are equal; no sets need to be built.
+    if len(labels) == len(labelnames):
+        try:
+            return tuple([labels[name] for name in labelnames])
+        except KeyError:
+            pass
+    raise ValueError(f"labels must include {labelnames}")
+
+
+def _sorted_label_tuples(metric: Counter | Histogram) -> list[tuple[str, ...]]:
+    # Series are only ever added, so a length change is enough to detect a stale order.
+    keys = metric._sorted_keys
+    if len(keys) != len(metric._rendered):
+        keys = sorted(list(metric._rendered))
+        metric._sorted_keys = keys
+    return keys
+
+
 class Counter:
     def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> None:
         self.name = name
         self.help = help_text
         self.labelnames = tuple(labelnames)
-        self._lock = threading.Lock()
-        self._values: dict[tuple[str, ...], float] = {}
+        self._shards: list[tuple[threading.Lock, dict[tuple[str, ...], float]]] = [
+            (threading.Lock(), {}) for _ in range(_SHARD_COUNT)
+        ]
+        self._rendered: dict[tuple[str, ...], str] = {}
+        self._sorted_keys: list[tuple[str, ...]] = []
 
     def labels(self, **labels: str) -> "CounterChild":
         return CounterChild(self, labels)
 
     def inc(self, amount: float = 1.0, labels: dict[str, str] | None = None) -> None:
-        label_tuple = self._label_tuple(labels or {})
-        with self._lock:
-            self._values[label_tuple] = self._values.get(label_tuple, 0.0) + float(amount)
+        self._inc(self._label_tuple(labels or {}), amount)
+
+    def _inc(self, label_tuple: tuple[str, ...], amount: float) -> None:
+        if label_tuple not in self._rendered:
+            self._rendered[label_tuple] = self.name + _format_labels(dict(zip(self.labelnames, label_tuple)))
+        lock, values = self._shards[_shard_index()]
+        with lock:
+            values[label_tuple] = values.get(label_tuple, 0.0) + float(amount)
+
+    def _merged(self) -> dict[tuple[str, ...], float]:
+        merged: dict[tuple[str, ...], float] = {}
+        for lock, values in self._shards:
+            with lock:
+                for label_tuple, value in values.items():
+                    merged[label_tuple] = merged.get(label_tuple, 0.0) + value
+        return merged
 
     def _label_tuple(self, labels: dict[str, str]) -> tuple[str, ...]:
-        if set(labels.keys()) != set(self.labelnames):
-            raise ValueError(f"labels must include {self.labelnames}")
-        return tuple(labels[name] for name in self.labelnames)
+        return _label_tuple(self.labelnames, labels)
 
     def render(self) -> str:
-        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
-        with self._lock:
-            for label_tuple, value in sorted(self._values.items()):
-                label_map = dict(zip(self.labelnames, label_tuple))
-                lines.append(f"{self.name}{_format_labels(label_map)} {value}")
+        lines: list[str] = []
+        self.render_into(lines)
         return "\n".join(lines)
 
+    def render_into(self, lines: list[str]) -> None:
+        append = lines.append
+        append(f"# HELP {self.name} {self.help}")
+        append(f"# TYPE {self.name} counter")
+        merged = self._merged()
+        rendered = self._rendered
+        for label_tuple in _sorted_label_tuples(self):
+            value = merged.get(label_tuple)
+            if value is not None:
+                append(f"{rendered[label_tuple]} {value}")
+
 
 class CounterChild:
     def __init__(self, metric: Counter, labels: dict[str, str]) -> None:
         self._metric = metric
-        self._labels = labels
+        self._label_tuple = metric._label_tuple(labels)
 
     def inc(self, amount: float = 1.0) -> None:
-        self._metric.inc(amount, self._labels)
+        self._metric._inc(self._label_tuple, amount)
 
 
 @dataclass
@@ -75,57 +133,93 @@ class Histogram:
         self.help = help_text
         self.labelnames = tuple(labelnames)
         self.buckets = sorted(set(buckets or [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10]))
-        self._lock = threading.Lock()
-        self._values: dict[tuple[str, ...], HistogramValue] = {}
+        self._bucket_bounds = tuple(self.buckets)
+        self._shards: list[tuple[threading.Lock, dict[tuple[str, ...], HistogramValue]]] = [
+            (threading.Lock(), {}) for _ in range(_SHARD_COUNT)
+        ]
+        self._rendered: dict[tuple[str, ...], tuple[str, str, tuple[str, ...]]] = {}
+        self._sorted_keys: list[tuple[str, ...]] = []
 
     def labels(self, **labels: str) -> "HistogramChild":
         return HistogramChild(self, labels)
 
     def observe(self, value: float, labels: dict[str, str] | None = None) -> None:
-        label_tuple = self._label_tuple(labels or {})
-        with self._lock:
-            record = self._values.get(label_tuple)
+        self._observe(self._label_tuple(labels or {}), value)
+
+    def _observe(self, label_tuple: tuple[str, ...], value: float) -> None:
+        if label_tuple not in self._rendered:
+            self._rendered[label_tuple] = self._render_labels(label_tuple)
+        lock, values = self._shards[_shard_index()]
+        with lock:
+            record = values.get(label_tuple)
             if record is None:
                 record = HistogramValue(buckets=[0 for _ in self.buckets], count=0, total=0.0)
-                self._values[label_tuple] = record
+                values[label_tuple] = record
             record.count += 1
             record.total += float(value)
-            for idx, bucket in enumerate(self.buckets):
-                if value <= bucket:
-                    record.buckets[idx] += 1
+            # Buckets hold exclusive counts; render() accumulates them into the cumulative le series.
+            idx = bisect_left(self._bucket_bounds, value)
+            if idx < len(record.buckets):
+                record.buckets[idx] += 1
         return None
 
     def _label_tuple(self, labels: dict[str, str]) -> tuple[str, ...]:
-        if set(labels.keys()) != set(self.labelnames):
-            raise ValueError(f"labels must include {self.labelnames}")
-        return tuple(labels[name] for name in self.labelnames)
+        return _label_tuple(self.labelnames, labels)
+
+    def _merged(self) -> dict[tuple[str, ...], HistogramValue]:
+        merged: dict[tuple[str, ...], HistogramValue] = {}
+        for lock, values in self._shards:
+            with lock:
+                for label_tuple, record in values.items():
+                    target = merged.get(label_tuple)
+                    if target is None:
+                        merged[label_tuple] = HistogramValue(list(record.buckets), record.count, record.total)
+                        continue
+                    target.buckets = [a + b for a, b in zip(target.buckets, record.buckets)]
+                    target.count += record.count
+                    target.total += record.total
+        return merged
+
+    def _render_labels(self, label_tuple: tuple[str, ...]) -> tuple[str, str, tuple[str, ...]]:
+        # Full series names up to the value, so render_into only appends " <value>".
+        name = self.name
+        label_map = dict(zip(self.labelnames, label_tuple))
+        labels = _format_labels(label_map)
+        bucket_series = tuple(
+            f"{name}_bucket{_format_labels({**label_map, 'le': str(bucket)})}" for bucket in [*self.buckets, "+Inf"]
+        )
+        return f"{name}_sum{labels}", f"{name}_count{labels}", bucket_series
 
     def render(self) -> str:
-        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
-        with self._lock:
-            for label_tuple, record in sorted(self._values.items()):
-                label_map = dict(zip(self.labelnames, label_tuple))
-                cumulative = 0
-                for bucket, count in zip(self.buckets, record.buckets):
-                    cumulative += count
-                    bucket_labels = dict(label_map)
-                    bucket_labels["le"] = str(bucket)
-                    lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
-                bucket_labels = dict(label_map)
-                bucket_labels["le"] = "+Inf"
-                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {record.count}")
-                lines.append(f"{self.name}_sum{_format_labels(label_map)} {record.total}")
-                lines.append(f"{self.name}_count{_format_labels(label_map)} {record.count}")
+        lines: list[str] = []
+        self.render_into(lines)
         return "\n".join(lines)
 
+    def render_into(self, lines: list[str]) -> None:
+        append = lines.append
+        append(f"# HELP {self.name} {self.help}")
+        append(f"# TYPE {self.name} histogram")
+        merged = self._merged()
+        rendered = self._rendered
+        for label_tuple in _sorted_label_tuples(self):
+            record = merged.get(label_tuple)
+            if record is None:
+                continue
+            sum_series, count_series, bucket_series = rendered[label_tuple]
+            for series, cumulative in zip(bucket_series, itertools.accumulate(record.buckets)):
+                append(f"{series} {cumulative}")
+            append(f"{bucket_series[-1]} {record.count}")
+            append(f"{sum_series} {record.total}")
+            append(f"{count_series} {record.count}")
+
 
 class HistogramChild:
     def __init__(self, metric: Histogram, labels: dict[str, str]) -> None:
         self._metric = metric
-        self._labels = labels
+        self._label_tuple = metric._label_tuple(labels)
 
     def observe(self, value: float) -> None:
-        self._metric.observe(value, self._labels)
+        self._metric._observe(self._label_tuple, value)
 
 
 REQUEST_COUNT = Counter(
@@ -158,35 +252,54 @@ EVIDENCE_SECONDS = Histogram(
     "Evidence adapter duration in seconds.",
     ("module", "action"),
 )
+UPSTREAM_CACHE_TOTAL = Counter(
+    "nyx_gateway_upstream_cache_total",
+    "Upstream response cache lookups by result.",
+    ("result",),
+)
 
 
+# The hot recorders pass label tuples in labelnames order straight to _inc/_observe, skipping child objects.
 def record_request(method: str, path: str, status: int, duration_seconds: float) -> None:
-    REQUEST_COUNT.labels(method=method, path=path, status=str(status)).inc()
-    REQUEST_LATENCY.labels(method=method, path=path).observe(duration_seconds)
+    status_text = str(status)
+    REQUEST_COUNT._inc((method, path, status_text), 1.0)
+    REQUEST_LATENCY._observe((method, path), duration_seconds)
     if status >= 400:
-        REQUEST_ERRORS.labels(method=method, path=path, code=str(status)).inc()
+        REQUEST_ERRORS._inc((method, path, status_text), 1.0)
+
+
+@functools.lru_cache(maxsize=1024)
+def _sql_operation(sql: str) -> tuple[str]:
+    return ((sql.strip().split(" ", 1)[0] or "OTHER").upper(),)
 
 
 def record_db_query(sql: str, duration_seconds: float) -> None:
-    operation = (sql.strip().split(" ", 1)[0] or "OTHER").upper()
-    DB_QUERY_TOTAL.labels(operation=operation).inc()
-    DB_QUERY_SECONDS.labels(operation=operation).observe(duration_seconds)
+    operation = _sql_operation(sql)
+    DB_QUERY_TOTAL._inc(operation, 1.0)
+    DB_QUERY_SECONDS._observe(operation, duration_seconds)
 
 
 def record_evidence_duration(module: str, action: str, duration_seconds: float) -> None:
-    EVIDENCE_SECONDS.labels(module=module, action=action).observe(duration_seconds)
+    EVIDENCE_SECONDS._observe((module, action), duration_seconds)
+
+
+def record_upstream_cache(hit: bool) -> None:
+    UPSTREAM_CACHE_TOTAL._inc(("hit",) if hit else ("miss",), 1.0)
 
 
 def render_metrics() -> str:
-    parts = [
-        REQUEST_COUNT.render(),
-        REQUEST_LATENCY.render(),
-        REQUEST_ERRORS.render(),
-        DB_QUERY_TOTAL.render(),
-        DB_QUERY_SECONDS.render(),
-        EVIDENCE_SECONDS.render(),
-    ]
-    return "\n".join(part for part in parts if part)
+    lines: list[str] = []
+    for metric in (
+        REQUEST_COUNT,
+        REQUEST_LATENCY,
+        REQUEST_ERRORS,
+        DB_QUERY_TOTAL,
+        DB_QUERY_SECONDS,
+        EVIDENCE_SECONDS,
+        UPSTREAM_CACHE_TOTAL,
+    ):
+        metric.render_into(lines)
+    return "\n".join(lines)
 
 
 def monotonic_seconds() -> float:
@@ -2,13 +2,269 @@ from __future__ import annotations
 
 import sqlite3
 
-SCHEMA_VERSION = 1
+# Stored in PRAGMA user_version; bump it with every schema change or existing databases will skip the change.
+SCHEMA_VERSION = 5
 
+# Columns added after their table first shipped; older databases get them through ALTER TABLE.
+_ADDED_COLUMNS: dict[str, tuple[tuple[str, str], ...]] = {
+    "orders": (("owner_address", "TEXT NOT NULL DEFAULT '0x0'"), ("status", "TEXT NOT NULL DEFAULT 'open'")),
+    "messages": (("sender_account_id", "TEXT NOT NULL DEFAULT ''"),),
+    "portal_accounts": (("bio", "TEXT"), ("wallet_address", "TEXT")),
+    "listings": (
+        ("publisher_id", "TEXT NOT NULL DEFAULT 'unknown'"),
+        ("status", "TEXT NOT NULL DEFAULT 'active'"),
+    ),
+    "purchases": (("buyer_id", "TEXT NOT NULL DEFAULT 'unknown'"),),
+    "wallet_transfers": (("asset_id", "TEXT NOT NULL DEFAULT 'NYXT'"),),
+}
 
-def apply_migrations(conn: sqlite3.Connection) -> None:
+
+# Every table at its current shape; older databases are brought up to it by the back-fills in _migrate.
+_TABLES_SCRIPT = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS evidence_runs (
+    run_id TEXT PRIMARY KEY,
+    module TEXT NOT NULL,
+    action TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    state_hash TEXT NOT NULL,
+    receipt_hashes TEXT NOT NULL,
+    replay_ok INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    owner_address TEXT NOT NULL DEFAULT '0x0',
+    side TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    price INTEGER NOT NULL,
+    asset_in TEXT NOT NULL,
+    asset_out TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'open'
+);
+CREATE TABLE IF NOT EXISTS trades (
+    trade_id TEXT PRIMARY KEY,
+    order_id TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    price INTEGER NOT NULL,
+    run_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    message_id TEXT PRIMARY KEY,
+    channel TEXT NOT NULL,
+    sender_account_id TEXT NOT NULL DEFAULT '',
+    body TEXT NOT NULL,
+    run_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS portal_accounts (
+    account_id TEXT PRIMARY KEY,
+    handle TEXT UNIQUE NOT NULL,
+    public_key TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    bio TEXT,
+    wallet_address TEXT
+);
+CREATE TABLE IF NOT EXISTS portal_challenges (
+    account_id TEXT NOT NULL,
+    nonce TEXT NOT NULL,
+    expires_at INTEGER NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (account_id, nonce)
+);
+CREATE TABLE IF NOT EXISTS portal_sessions (
+    token TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    expires_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS e2ee_identities (
+    account_id TEXT PRIMARY KEY,
+    public_jwk TEXT NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_rooms (
+    room_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    is_public INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_messages (
+    message_id TEXT PRIMARY KEY,
+    room_id TEXT NOT NULL,
+    sender_account_id TEXT NOT NULL,
+    body TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    prev_digest TEXT NOT NULL,
+    msg_digest TEXT NOT NULL,
+    chain_head TEXT NOT NULL,
+    created_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_room_state (
+    room_id TEXT PRIMARY KEY,
+    last_seq INTEGER NOT NULL,
+    last_chain_head TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id TEXT PRIMARY KEY,
+    publisher_id TEXT NOT NULL DEFAULT 'unknown',
+    sku TEXT NOT NULL,
+    title TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active',
+    run_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS purchases (
+    purchase_id TEXT PRIMARY KEY,
+    listing_id TEXT NOT NULL,
+    buyer_id TEXT NOT NULL DEFAULT 'unknown',
+    qty INTEGER NOT NULL,
+    run_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS receipts (
+    receipt_id TEXT PRIMARY KEY,
+    module TEXT NOT NULL,
+    action TEXT NOT NULL,
+    state_hash TEXT NOT NULL,
+    receipt_hashes TEXT NOT NULL,
+    replay_ok INTEGER NOT NULL,
+    run_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fee_ledger (
+    fee_id TEXT PRIMARY KEY,
+    module TEXT NOT NULL,
+    action TEXT NOT NULL,
+    protocol_fee_total INTEGER NOT NULL,
+    platform_fee_amount INTEGER NOT NULL,
+    total_paid INTEGER NOT NULL,
+    fee_address TEXT NOT NULL,
+    run_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS wallet_accounts (
+    address TEXT NOT NULL,
+    asset_id TEXT NOT NULL DEFAULT 'NYXT',
+    balance INTEGER NOT NULL,
+    PRIMARY KEY (address, asset_id)
+);
+CREATE TABLE IF NOT EXISTS wallet_transfers (
+    transfer_id TEXT PRIMARY KEY,
+    from_address TEXT NOT NULL,
+    to_address TEXT NOT NULL,
+    asset_id TEXT NOT NULL DEFAULT 'NYXT',
+    amount INTEGER NOT NULL,
+    fee_total INTEGER NOT NULL,
+    treasury_address TEXT NOT NULL,
+    run_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS faucet_claims (
+    claim_id TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    address TEXT NOT NULL,
+    asset_id TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    ip TEXT NOT NULL DEFAULT 'unknown',
+    created_at INTEGER NOT NULL,
+    run_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS airdrop_claims (
+    claim_id TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    reward INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    run_id TEXT NOT NULL,
+    UNIQUE (account_id, task_id)
+);
+CREATE TABLE IF NOT EXISTS entertainment_items (
+    item_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    category TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entertainment_events (
+    event_id TEXT PRIMARY KEY,
+    item_id TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    step INTEGER NOT NULL,
+    run_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS web2_guard_requests (
+    request_id TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    method TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    response_hash TEXT NOT NULL,
+    response_status INTEGER NOT NULL,
+    response_size INTEGER NOT NULL,
+    response_truncated INTEGER NOT NULL,
+    body_size INTEGER NOT NULL,
+    header_names TEXT NOT NULL,
+    sealed_request TEXT,
+    created_at INTEGER NOT NULL
+);
+"""
+
+# One read for everything a new connection needs to know about an up-to-date database.
+_SCHEMA_PROBE = (
+    "SELECT user_version, EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'listings_fts') "
+    "FROM pragma_user_version"
+)
+
+
+def apply_migrations(conn: sqlite3.Connection) -> bool:
+    # Returns whether the listings_fts search index is available.
     cursor = conn.cursor()
     cursor.execute("PRAGMA foreign_keys = ON")
-    cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    # Portal reads (activity unions, chat history) hit the same btrees repeatedly; map the file and keep ~20 MB
+    # of pages per connection instead of going through pread for every page.
+    cursor.execute("PRAGMA mmap_size = 268435456")
+    cursor.execute("PRAGMA cache_size = -20000")
+    cursor.execute(_SCHEMA_PROBE)
+    version, listings_fts = cursor.fetchone()
+    if version >= SCHEMA_VERSION:
+        return bool(listings_fts)
+    # journal_mode is persistent and cannot change inside a transaction, so it is only set on the migration path.
+    cursor.execute("PRAGMA journal_mode = WAL")
+    try:
+        # executescript commits any pending transaction before it runs, so the script opens the migration
+        # transaction itself; everything after it still runs under the same write lock.
+        cursor.executescript("BEGIN IMMEDIATE;" + _TABLES_SCRIPT)
+        # Another connection may have migrated while this one waited for the write lock.
+        if not _schema_current(cursor):
+            _migrate(cursor)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    cursor.execute(_SCHEMA_PROBE)
+    return bool(cursor.fetchone()[1])
+
+
+def _schema_current(cursor: sqlite3.Cursor) -> bool:
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0] >= SCHEMA_VERSION
+
+
+def _existing_columns(cursor: sqlite3.Cursor) -> dict[str, set[str]]:
+    cursor.execute(
+        "SELECT m.name, c.name FROM sqlite_master AS m, pragma_table_info(m.name) AS c WHERE m.type = 'table'"
+    )
+    columns: dict[str, set[str]] = {}
+    for table, column in cursor.fetchall():
+        columns.setdefault(table, set()).add(column)
+    return columns
+
+
+def _missing(columns: dict[str, set[str]], table: str, column: str) -> bool:
+    # The snapshot is taken after _TABLES_SCRIPT, so only tables that predate it can be missing columns.
+    return table in columns and column not in columns[table]
+
+
+def _migrate(cursor: sqlite3.Cursor) -> None:
+    columns = _existing_columns(cursor)
     cursor.execute("SELECT value FROM meta WHERE key = 'schema_version'")
     row = cursor.fetchone()
     if row is None:
@@ -16,271 +272,73 @@ def apply_migrations(conn: sqlite3.Connection) -> None:
             "INSERT INTO meta (key, value) VALUES ('schema_version', ?)",
             (str(SCHEMA_VERSION),),
         )
+    # SQLite takes the bare chain_head from the MAX(seq) row of each group.
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS evidence_runs (
-            run_id TEXT PRIMARY KEY,
-            module TEXT NOT NULL,
-            action TEXT NOT NULL,
-            seed INTEGER NOT NULL,
-            state_hash TEXT NOT NULL,
-            receipt_hashes TEXT NOT NULL,
-            replay_ok INTEGER NOT NULL
-        )
-        """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS orders (
-            order_id TEXT PRIMARY KEY,
-            owner_address TEXT NOT NULL DEFAULT '0x0',
-            side TEXT NOT NULL,
-            amount INTEGER NOT NULL,
-            price INTEGER NOT NULL,
-            asset_in TEXT NOT NULL,
-            asset_out TEXT NOT NULL,
-            run_id TEXT NOT NULL
-        )
-        """)
-    # Simple migration for owner_address
-    cursor.execute("PRAGMA table_info(orders)")
-    order_columns = [row[1] for row in cursor.fetchall()]
-    if "owner_address" not in order_columns:
-        cursor.execute("ALTER TABLE orders ADD COLUMN owner_address TEXT NOT NULL DEFAULT '0x0'")
-    if "status" not in order_columns:
-        cursor.execute("ALTER TABLE orders ADD COLUMN status TEXT NOT NULL DEFAULT 'open'")
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS trades (
-            trade_id TEXT PRIMARY KEY,
-            order_id TEXT NOT NULL,
-            amount INTEGER NOT NULL,
-            price INTEGER NOT NULL,
-            run_id TEXT NOT NULL
-        )
-        """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS messages (
-            message_id TEXT PRIMARY KEY,
-            channel TEXT NOT NULL,
-            sender_account_id TEXT NOT NULL DEFAULT '',
-            body TEXT NOT NULL,
-            run_id TEXT NOT NULL
-        )
-        """)
-    cursor.execute("PRAGMA table_info(messages)")
-    msg_columns = [row[1] for row in cursor.fetchall()]
-    if "sender_account_id" not in msg_columns:
-        cursor.execute("ALTER TABLE messages ADD COLUMN sender_account_id TEXT NOT NULL DEFAULT ''")
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS portal_accounts (
-            account_id TEXT PRIMARY KEY,
-            handle TEXT UNIQUE NOT NULL,
-            public_key TEXT NOT NULL,
-            created_at INTEGER NOT NULL,
-            status TEXT NOT NULL,
-            bio TEXT
-        )
-        """)
-    # Check if bio column exists, if not add it (simple migration for existing db)
-    cursor.execute("PRAGMA table_info(portal_accounts)")
-    columns = [row[1] for row in cursor.fetchall()]
-    if "bio" not in columns:
-        cursor.execute("ALTER TABLE portal_accounts ADD COLUMN bio TEXT")
-    if "wallet_address" not in columns:
-        cursor.execute("ALTER TABLE portal_accounts ADD COLUMN wallet_address TEXT")
-    cursor.execute(
-        "CREATE UNIQUE INDEX IF NOT EXISTS idx_portal_accounts_wallet_address ON portal_accounts(wallet_address)"
-    )
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS portal_challenges (
-            account_id TEXT NOT NULL,
-            nonce TEXT NOT NULL,
-            expires_at INTEGER NOT NULL,
-            used INTEGER NOT NULL,
-            PRIMARY KEY (account_id, nonce)
-        )
-        """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS portal_sessions (
-            token TEXT PRIMARY KEY,
-            account_id TEXT NOT NULL,
-            expires_at INTEGER NOT NULL
-        )
-        """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS e2ee_identities (
-            account_id TEXT PRIMARY KEY,
-            public_jwk TEXT NOT NULL,
-            updated_at INTEGER NOT NULL
-        )
+        INSERT OR IGNORE INTO chat_room_state (room_id, last_seq, last_chain_head)
+        SELECT room_id, MAX(seq), chain_head FROM chat_messages GROUP BY room_id
         """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS chat_rooms (
-            room_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            created_at INTEGER NOT NULL,
-            is_public INTEGER NOT NULL
-        )
-        """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS chat_messages (
-            message_id TEXT PRIMARY KEY,
-            room_id TEXT NOT NULL,
-            sender_account_id TEXT NOT NULL,
-            body TEXT NOT NULL,
-            seq INTEGER NOT NULL,
-            prev_digest TEXT NOT NULL,
-            msg_digest TEXT NOT NULL,
-            chain_head TEXT NOT NULL,
-            created_at INTEGER NOT NULL
-        )
-        """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS listings (
-            listing_id TEXT PRIMARY KEY,
-            publisher_id TEXT NOT NULL DEFAULT 'unknown',
-            sku TEXT NOT NULL,
-            title TEXT NOT NULL,
-            price INTEGER NOT NULL,
-            status TEXT NOT NULL DEFAULT 'active',
-            run_id TEXT NOT NULL
-        )
-        """)
-    # Simple migration for listings
-    cursor.execute("PRAGMA table_info(listings)")
-    listing_columns = [row[1] for row in cursor.fetchall()]
-    if "publisher_id" not in listing_columns:
-        cursor.execute("ALTER TABLE listings ADD COLUMN publisher_id TEXT NOT NULL DEFAULT 'unknown'")
-    if "status" not in listing_columns:
-        cursor.execute("ALTER TABLE listings ADD COLUMN status TEXT NOT NULL DEFAULT 'active'")
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS purchases (
-            purchase_id TEXT PRIMARY KEY,
-            listing_id TEXT NOT NULL,
-            buyer_id TEXT NOT NULL DEFAULT 'unknown',
-            qty INTEGER NOT NULL,
-            run_id TEXT NOT NULL
-        )
-        """)
-    # Simple migration for purchases
-    cursor.execute("PRAGMA table_info(purchases)")
-    purchase_columns = [row[1] for row in cursor.fetchall()]
-    if "buyer_id" not in purchase_columns:
-        cursor.execute("ALTER TABLE purchases ADD COLUMN buyer_id TEXT NOT NULL DEFAULT 'unknown'")
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS receipts (
-            receipt_id TEXT PRIMARY KEY,
-            module TEXT NOT NULL,
-            action TEXT NOT NULL,
-            state_hash TEXT NOT NULL,
-            receipt_hashes TEXT NOT NULL,
-            replay_ok INTEGER NOT NULL,
-            run_id TEXT NOT NULL
-        )
-        """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS fee_ledger (
-            fee_id TEXT PRIMARY KEY,
-            module TEXT NOT NULL,
-            action TEXT NOT NULL,
-            protocol_fee_total INTEGER NOT NULL,
-            platform_fee_amount INTEGER NOT NULL,
-            total_paid INTEGER NOT NULL,
-            fee_address TEXT NOT NULL,
-            run_id TEXT NOT NULL
-        )
-        """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS wallet_accounts (
-            address TEXT NOT NULL,
-            asset_id TEXT NOT NULL DEFAULT 'NYXT',
-            balance INTEGER NOT NULL,
-            PRIMARY KEY (address, asset_id)
-        )
-        """)
-    # Migration for asset_id
-    cursor.execute("PRAGMA table_info(wallet_accounts)")
-    wallet_columns = [row[1] for row in cursor.fetchall()]
-    if "asset_id" not in wallet_columns:
+    # Migration for asset_id. This has to be a rebuild rather than ADD COLUMN: legacy tables are keyed on address
+    # alone, and _ensure_wallet_account's INSERT OR IGNORE would silently drop every second asset per address.
+    # It only ever runs once per legacy database, inside the migration transaction.
+    if _missing(columns, "wallet_accounts", "asset_id"):
         # Move existing balances to NYXT
         cursor.execute(
-            "CREATE TABLE wallet_accounts_new (address TEXT NOT NULL, asset_id TEXT NOT NULL DEFAULT 'NYXT', balance INTEGER NOT NULL, PRIMARY KEY (address, asset_id))"
+            "CREATE TABLE wallet_accounts_new (address TEXT NOT NULL, asset_id TEXT NOT NULL DEFAULT 'NYXT', "
+            "balance INTEGER NOT NULL, PRIMARY KEY (address, asset_id))"
         )
         cursor.execute(
             "INSERT INTO wallet_accounts_new (address, balance) SELECT address, balance FROM wallet_accounts"
         )
         cursor.execute("DROP TABLE wallet_accounts")
         cursor.execute("ALTER TABLE wallet_accounts_new RENAME TO wallet_accounts")
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS wallet_transfers (
-            transfer_id TEXT PRIMARY KEY,
-            from_address TEXT NOT NULL,
-            to_address TEXT NOT NULL,
-            asset_id TEXT NOT NULL DEFAULT 'NYXT',
-            amount INTEGER NOT NULL,
-            fee_total INTEGER NOT NULL,
-            treasury_address TEXT NOT NULL,
-            run_id TEXT NOT NULL
-        )
-        """)
-    # Migration for asset_id in wallet_transfers
-    cursor.execute("PRAGMA table_info(wallet_transfers)")
-    transfer_columns = [row[1] for row in cursor.fetchall()]
-    if "asset_id" not in transfer_columns:
-        cursor.execute("ALTER TABLE wallet_transfers ADD COLUMN asset_id TEXT NOT NULL DEFAULT 'NYXT'")
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS faucet_claims (
-            claim_id TEXT PRIMARY KEY,
-            account_id TEXT NOT NULL,
-            address TEXT NOT NULL,
-            asset_id TEXT NOT NULL,
-            amount INTEGER NOT NULL,
-            ip TEXT NOT NULL DEFAULT 'unknown',
-            created_at INTEGER NOT NULL,
-            run_id TEXT NOT NULL
-        )
-        """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS airdrop_claims (
-            claim_id TEXT PRIMARY KEY,
-            account_id TEXT NOT NULL,
-            task_id TEXT NOT NULL,
-            reward INTEGER NOT NULL,
-            created_at INTEGER NOT NULL,
-            run_id TEXT NOT NULL,
-            UNIQUE (account_id, task_id)
+    for table, added in _ADDED_COLUMNS.items():
+        for column, definition in added:
+            if _missing(columns, table, column):
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_portal_accounts_wallet_address ON portal_accounts(wallet_address)"
+    )
+    _ensure_listings_fts(cursor)
+    # Account activity collects run_ids through the per-table filters below, then resolves receipts and fees.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipts_run_id ON receipts(run_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fee_ledger_run_id ON fee_ledger(run_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_wallet_transfers_from_address ON wallet_transfers(from_address)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_wallet_transfers_to_address ON wallet_transfers(to_address)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_owner_address ON orders(owner_address)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender_account_id ON messages(sender_account_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_publisher_id ON listings(publisher_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_purchases_buyer_id ON purchases(buyer_id)")
+    # Chat head lookups and history pages walk a room in seq order.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_room_seq ON chat_messages(room_id, seq)")
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _ensure_listings_fts(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'listings_fts'")
+    if cursor.fetchone() is not None:
+        return
+    # Trigram FTS5 needs SQLite >= 3.34 built with FTS5; search falls back to LIKE scans without it.
+    try:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE listings_fts USING fts5("
+            "sku, title, content='listings', content_rowid='rowid', tokenize='trigram')"
         )
-        """)
+    except sqlite3.OperationalError:
+        return
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS entertainment_items (
-            item_id TEXT PRIMARY KEY,
-            title TEXT NOT NULL,
-            summary TEXT NOT NULL,
-            category TEXT NOT NULL
-        )
+        CREATE TRIGGER IF NOT EXISTS listings_fts_insert AFTER INSERT ON listings BEGIN
+            INSERT INTO listings_fts (rowid, sku, title) VALUES (new.rowid, new.sku, new.title);
+        END
         """)
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS entertainment_events (
-            event_id TEXT PRIMARY KEY,
-            item_id TEXT NOT NULL,
-            mode TEXT NOT NULL,
-            step INTEGER NOT NULL,
-            run_id TEXT NOT NULL
-        )
+        CREATE TRIGGER IF NOT EXISTS listings_fts_delete AFTER DELETE ON listings BEGIN
+            INSERT INTO listings_fts (listings_fts, rowid, sku, title) VALUES ('delete', old.rowid, old.sku, old.title);
+        END
         """)
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS web2_guard_requests (
-            request_id TEXT PRIMARY KEY,
-            account_id TEXT NOT NULL,
-            run_id TEXT NOT NULL,
-            url TEXT NOT NULL,
-            method TEXT NOT NULL,
-            request_hash TEXT NOT NULL,
-            response_hash TEXT NOT NULL,
-            response_status INTEGER NOT NULL,
-            response_size INTEGER NOT NULL,
-            response_truncated INTEGER NOT NULL,
-            body_size INTEGER NOT NULL,
-            header_names TEXT NOT NULL,
-            sealed_request TEXT,
-            created_at INTEGER NOT NULL
-        )
+        CREATE TRIGGER IF NOT EXISTS listings_fts_update AFTER UPDATE OF sku, title ON listings BEGIN
+            INSERT INTO listings_fts (listings_fts, rowid, sku, title) VALUES ('delete', old.rowid, old.sku, old.title);
+            INSERT INTO listings_fts (rowid, sku, title) VALUES (new.rowid, new.sku, new.title);
+        END
         """)
-    conn.commit()
+    cursor.execute("INSERT INTO listings_fts (listings_fts) VALUES ('rebuild')")
@@ -1,19 +1,25 @@
 from __future__ import annotations
 
+import functools
 from pathlib import Path
 
 
+# resolve() stats every path component; the results only depend on this file's location.
+@functools.cache
 def repo_root() -> Path:
     return Path(__file__).resolve().parents[5]
 
 
+@functools.cache
 def backend_src() -> Path:
     return repo_root() / "apps" / "nyx-backend" / "src"
 
 
+@functools.cache
 def run_root() -> Path:
     return repo_root() / "apps" / "nyx-backend-gateway" / "runs"
 
 
+@functools.cache
 def db_path() -> Path:
     return repo_root() / "apps" / "nyx-backend-gateway" / "data" / "nyx_gateway.db"
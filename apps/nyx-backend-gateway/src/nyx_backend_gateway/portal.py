@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import base64
+import functools
 import hashlib
 import hmac
 import json
 import os
+import re
 import time
-from typing import Any
+from typing import Any, Iterable
 
 from nyx_backend_gateway import auth
 from nyx_backend_gateway.env import (
@@ -23,6 +25,7 @@ from nyx_backend_gateway.storage import (
     PortalSession,
     consume_portal_challenge,
     insert_chat_message,
+    insert_chat_messages,
     insert_chat_room,
     insert_portal_account,
     insert_portal_challenge,
@@ -31,6 +34,8 @@ from nyx_backend_gateway.storage import (
     load_portal_account,
     load_portal_account_by_handle,
     load_portal_session,
+    reserve_chat_seq,
+    transaction,
 )
 
 
@@ -38,8 +43,44 @@ class PortalError(ValueError):
     pass
 
 
-def _canonical_json(value: dict[str, Any]) -> str:
-    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+# Fixed-prefix SHA-256 states; callers copy() them instead of hashing the prefix on every call.
+_ACCOUNT_ID_HASHER = hashlib.sha256(b"portal:acct:")
+_NONCE_HASHER = hashlib.sha256(b"nonce:")
+_HANDLE_CHARS = re.compile(r"[a-z0-9_-]+")
+
+_SQL_ACCOUNT_ACTIVITY = """
+SELECT
+  r.receipt_id,
+  r.module,
+  r.action,
+  r.state_hash,
+  r.receipt_hashes,
+  r.replay_ok,
+  r.run_id,
+  f.total_paid AS fee_total,
+  f.protocol_fee_total AS protocol_fee_total,
+  f.platform_fee_amount AS platform_fee_amount,
+  f.fee_address AS treasury_address
+FROM receipts r
+LEFT JOIN fee_ledger f ON f.run_id = r.run_id
+WHERE r.run_id IN (
+    SELECT run_id FROM wallet_transfers WHERE from_address = ? OR to_address = ?
+    UNION
+    SELECT run_id FROM orders WHERE owner_address = ?
+    UNION
+    SELECT run_id FROM messages WHERE sender_account_id = ?
+    UNION
+    SELECT run_id FROM listings WHERE publisher_id = ?
+    UNION
+    SELECT run_id FROM purchases WHERE buyer_id = ?
+)
+ORDER BY r.receipt_id DESC
+LIMIT ? OFFSET ?
+"""
+
+
+def _canonical_json(value: dict[str, Any]) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
 
 
 def _sha256_hex(data: bytes) -> str:
@@ -47,8 +88,9 @@ def _sha256_hex(data: bytes) -> str:
 
 
 def _derive_account_id(handle: str, pubkey: str) -> str:
-    digest = _sha256_hex(f"portal:acct:{handle}:{pubkey}".encode("utf-8"))
-    return f"acct-{digest[:16]}"
+    hasher = _ACCOUNT_ID_HASHER.copy()
+    hasher.update(f"{handle}:{pubkey}".encode("utf-8"))
+    return f"acct-{hasher.hexdigest()[:16]}"
 
 
 def _validate_handle(handle: object) -> str:
@@ -56,21 +98,27 @@ def _validate_handle(handle: object) -> str:
         raise PortalError("handle required")
     if len(handle) < 3 or len(handle) > 24:
         raise PortalError("handle length invalid")
-    if not all(ch.islower() or ch.isdigit() or ch in {"_", "-"} for ch in handle):
+    if _HANDLE_CHARS.fullmatch(handle) is None:
         raise PortalError("handle invalid")
     return handle
 
 
+# Shared by account creation and sign-in, so a new account's first login skips the base64 decode.
+@functools.lru_cache(maxsize=1024)
+def _decoded_pubkey(pubkey: str) -> bytes | None:
+    try:
+        return base64.b64decode(pubkey, validate=True)
+    except Exception:
+        return None
+
+
 def _validate_pubkey(pubkey: object) -> str:
     if not isinstance(pubkey, str) or not pubkey or isinstance(pubkey, bool):
         raise PortalError("pubkey required")
     if len(pubkey) > 256:
         raise PortalError("pubkey too long")
-    try:
-        raw = base64.b64decode(pubkey.encode("utf-8"), validate=True)
-    except Exception as exc:
-        raise PortalError("pubkey invalid") from exc
-    if len(raw) < 16:
+    raw = _decoded_pubkey(pubkey)
+    if raw is None or len(raw) < 16:
         raise PortalError("pubkey invalid")
     return pubkey
 
@@ -107,7 +155,9 @@ def issue_challenge(conn, account_id: str) -> PortalChallenge:
     secret = get_portal_session_secret()
     issued_at = int(time.time())
     entropy = os.urandom(16).hex()
-    nonce = _sha256_hex(f"nonce:{account_id}:{issued_at}:{secret}:{entropy}".encode("utf-8"))
+    hasher = _NONCE_HASHER.copy()
+    hasher.update(f"{account_id}:{issued_at}:{secret}:{entropy}".encode("utf-8"))
+    nonce = hasher.hexdigest()
     ttl = get_portal_challenge_ttl_seconds()
     challenge = PortalChallenge(
         account_id=account.account_id,
@@ -120,15 +170,14 @@ def issue_challenge(conn, account_id: str) -> PortalChallenge:
 
 
 def _verify_signature(pubkey: str, nonce: str, signature_b64: str) -> bool:
-    try:
-        key = base64.b64decode(pubkey.encode("utf-8"), validate=True)
-    except Exception:
+    key = _decoded_pubkey(pubkey)
+    if key is None:
         return False
     try:
-        provided = base64.b64decode(signature_b64.encode("utf-8"), validate=True)
+        provided = base64.b64decode(signature_b64, validate=True)
     except Exception:
         return False
-    expected = hmac.new(key, nonce.encode("utf-8"), hashlib.sha256).digest()
+    expected = hmac.digest(key, nonce.encode("utf-8"), "sha256")
     return hmac.compare_digest(expected, provided)
 
 
@@ -225,7 +274,7 @@ def list_rooms(conn, limit: int = 50, offset: int = 0) -> list[dict[str, object]
         "SELECT room_id, name, created_at, is_public FROM chat_rooms ORDER BY created_at ASC, room_id ASC LIMIT ? OFFSET ?",
         (lim, off),
     ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return [dict(row) for row in rows]
 
 
 def search_rooms(conn, query: str, limit: int = 50) -> list[dict[str, object]]:
@@ -236,12 +285,14 @@ def search_rooms(conn, query: str, limit: int = 50) -> list[dict[str, object]]:
         "SELECT room_id, name, created_at, is_public FROM chat_rooms WHERE name LIKE ? ORDER BY created_at ASC LIMIT ?",
         (f"%{query}%", lim),
     ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return [dict(row) for row in rows]
 
 
-def post_message(conn, room_id: str, sender_account_id: str, body: str) -> tuple[dict[str, object], dict[str, object]]:
+def _validate_message_body(body: object) -> str:
     if not isinstance(body, str) or not body or len(body) > 512:
         raise PortalError("message invalid")
+    if body[:1] != "{" or body[-1:] != "}":
+        raise PortalError("message must be e2ee json")
     try:
         parsed = json.loads(body)
     except json.JSONDecodeError as exc:
@@ -252,27 +303,25 @@ def post_message(conn, room_id: str, sender_account_id: str, body: str) -> tuple
         raise PortalError("message missing ciphertext")
     if not isinstance(parsed.get("iv"), str) or not parsed.get("iv"):
         raise PortalError("message missing iv")
-    last = conn.execute(
-        "SELECT seq, chain_head FROM chat_messages WHERE room_id = ? ORDER BY seq DESC LIMIT 1",
-        (room_id,),
-    ).fetchone()
-    if last:
-        prev_digest = str(last["chain_head"])
-        seq = int(last["seq"]) + 1
-    else:
-        prev_digest = "0" * 64
-        seq = 1
-    message_id = f"msg-{_sha256_hex(f'{room_id}:{seq}'.encode('utf-8'))[:12]}"
-    message_fields = {
+    return body
+
+
+def _chain_message(
+    room_id: str, sender_account_id: str, body: str, seq: int, prev_digest: str, created_at: int
+) -> tuple[ChatMessage, dict[str, object], dict[str, object]]:
+    message_id = f"msg-{_sha256_hex(b'%b:%d' % (room_id.encode('utf-8'), seq))[:12]}"
+    message_fields: dict[str, object] = {
         "message_id": message_id,
         "room_id": room_id,
         "sender_account_id": sender_account_id,
         "body": body,
         "seq": seq,
     }
-    msg_digest = _sha256_hex(_canonical_json(message_fields).encode("utf-8"))
-    chain_head = _sha256_hex(f"{prev_digest}{msg_digest}".encode("utf-8"))
-    created_at = int(time.time())
+    msg_digest = _sha256_hex(_canonical_json(message_fields))
+    # Both digests are ASCII hex; feeding them separately skips building the concatenated string.
+    chain_hasher = hashlib.sha256(prev_digest.encode("ascii"))
+    chain_hasher.update(msg_digest.encode("ascii"))
+    chain_head = chain_hasher.hexdigest()
     record = ChatMessage(
         message_id=message_id,
         room_id=room_id,
@@ -284,15 +333,53 @@ def post_message(conn, room_id: str, sender_account_id: str, body: str) -> tuple
         chain_head=chain_head,
         created_at=created_at,
     )
-    insert_chat_message(conn, record)
     receipt: dict[str, object] = {
         "prev_digest": prev_digest,
         "msg_digest": msg_digest,
         "chain_head": chain_head,
     }
+    return record, message_fields, receipt
+
+
+def post_message(conn, room_id: str, sender_account_id: str, body: str) -> tuple[dict[str, object], dict[str, object]]:
+    _validate_message_body(body)
+    with transaction(conn):
+        # Reserving the seq takes the write lock, so concurrent posts to a room chain one after another.
+        seq, prev_digest = reserve_chat_seq(conn, room_id)
+        record, message_fields, receipt = _chain_message(
+            room_id, sender_account_id, body, seq, prev_digest, int(time.time())
+        )
+        insert_chat_message(conn, record)
     return message_fields, receipt
 
 
+def post_messages_bulk(
+    conn, messages: Iterable[tuple[str, str, str]]
+) -> list[tuple[dict[str, object], dict[str, object]]]:
+    items = list(messages)
+    for _, _, body in items:
+        _validate_message_body(body)
+    counts: dict[str, int] = {}
+    for room_id, _, _ in items:
+        counts[room_id] = counts.get(room_id, 0) + 1
+    created_at = int(time.time())
+    results: list[tuple[dict[str, object], dict[str, object]]] = []
+    records: list[ChatMessage] = []
+    with transaction(conn):
+        # One reservation per room; messages for a room chain in input order from there.
+        heads = {room_id: reserve_chat_seq(conn, room_id, count) for room_id, count in counts.items()}
+        for room_id, sender_account_id, body in items:
+            seq, prev_digest = heads[room_id]
+            record, message_fields, receipt = _chain_message(
+                room_id, sender_account_id, body, seq, prev_digest, created_at
+            )
+            heads[room_id] = (seq + 1, record.chain_head)
+            records.append(record)
+            results.append((message_fields, receipt))
+        insert_chat_messages(conn, records)
+    return results
+
+
 def list_messages(conn, room_id: str, after: int | None, limit: int) -> list[dict[str, object]]:
     return list_chat_messages(conn, room_id=room_id, after=after, limit=limit)
 
@@ -308,35 +395,7 @@ def list_account_activity(
     # For now, we'll return receipts that have a run_id matching transactions/orders for this account
     # In a real system, we'd have a join table or account_id on receipts
     rows = conn.execute(
-        """
-        SELECT
-          r.receipt_id,
-          r.module,
-          r.action,
-          r.state_hash,
-          r.receipt_hashes,
-          r.replay_ok,
-          r.run_id,
-          f.total_paid AS fee_total,
-          f.protocol_fee_total AS protocol_fee_total,
-          f.platform_fee_amount AS platform_fee_amount,
-          f.fee_address AS treasury_address
-        FROM receipts r
-        LEFT JOIN fee_ledger f ON f.run_id = r.run_id
-        WHERE r.run_id IN (
-            SELECT run_id FROM wallet_transfers WHERE from_address = ? OR to_address = ?
-            UNION
-            SELECT run_id FROM orders WHERE owner_address = ?
-            UNION
-            SELECT run_id FROM messages WHERE sender_account_id = ?
-            UNION
-            SELECT run_id FROM listings WHERE publisher_id = ?
-            UNION
-            SELECT run_id FROM purchases WHERE buyer_id = ?
-        )
-        ORDER BY r.receipt_id DESC
-        LIMIT ? OFFSET ?
-        """,
+        _SQL_ACCOUNT_ACTIVITY,
         (
             wallet_address,
             wallet_address,
@@ -351,10 +410,14 @@ def list_account_activity(
 
     results = []
     for row in rows:
-        record = {col: row[col] for col in row.keys()}
-        try:
-            record["receipt_hashes"] = json.loads(record.get("receipt_hashes", "[]"))
-        except (TypeError, ValueError):
-            record["receipt_hashes"] = []
+        record = dict(row)
+        raw_hashes = record.get("receipt_hashes")
+        hashes: object = []
+        if raw_hashes:
+            try:
+                hashes = json.loads(raw_hashes)
+            except (TypeError, ValueError):
+                pass
+        record["receipt_hashes"] = hashes
         results.append(record)
     return results
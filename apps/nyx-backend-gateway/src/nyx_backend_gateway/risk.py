@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import logging
+import math
+import threading
 import time
 from dataclasses import dataclass
-from typing import Literal
+from typing import Iterable, Literal
 
 from nyx_backend_gateway.errors import GatewayApiError
 from nyx_backend_gateway.settings import get_settings
@@ -11,16 +13,28 @@ from nyx_backend_gateway.settings import get_settings
 logger = logging.getLogger("nyx-risk")
 
 RiskMode = Literal["off", "monitor", "enforce"]
+RiskAlgorithm = Literal["window", "token_bucket"]
 
+# (action, account_id, client_ip, amount), the arguments of one RiskEngine.check call.
+RiskCheck = tuple[str, str | None, str | None, int | None]
+# (scope, ..., action), e.g. ("account", account_id, action)
+_CounterKey = tuple[str, ...]
 
-@dataclass(frozen=True)
+_BREAKER_OPEN = 0
+_BREAKER_HALF_OPEN = 1
+
+
+@dataclass(frozen=True, slots=True)
 class RiskLimit:
     max_count: int | None = None
     max_amount: int | None = None
     window_seconds: int = 60
+    # token_bucket refills max_count/max_amount per window_seconds; burst caps the count bucket (default max_count).
+    algorithm: RiskAlgorithm = "window"
+    burst: int | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class RiskConfig:
     mode: RiskMode
     global_paused: bool
@@ -30,14 +44,83 @@ class RiskConfig:
     action_limits: dict[str, RiskLimit]
     breaker_errors_per_min: int
     breaker_window_seconds: int
+    # Probes admitted per half-open round; all of them must succeed to close the breaker again.
+    breaker_half_open_successes: int = 3
+
+
+def _count_capacity(limit: RiskLimit) -> int | None:
+    if limit.algorithm == "token_bucket" and limit.max_count is not None and limit.burst is not None:
+        return limit.burst
+    return limit.max_count
+
+
+@dataclass(frozen=True, slots=True)
+class _ActionPlan:
+    global_key: _CounterKey
+    action_key: _CounterKey
+    action_label: str
+    action_limit: RiskLimit | None
+
+
+def _now_seconds() -> int:
+    # Windows are whole seconds on the monotonic clock, counted from an arbitrary origin rather than aligned to
+    # wall-clock minutes, so NTP steps cannot reset or double them. The ns clock is an int: no float rounding.
+    return time.monotonic_ns() // 1_000_000_000
+
+
+def _skip(*_args: object, **_kwargs: object) -> None:
+    return None
+
+
+def _allow_all(checks: Iterable[RiskCheck]) -> list[GatewayApiError | None]:
+    return [None for _ in checks]
+
+
+def _active(limit: RiskLimit) -> RiskLimit | None:
+    return None if limit.max_count is None and limit.max_amount is None else limit
+
+
+def _idle_seconds(limit: RiskLimit) -> int:
+    # How long a key can go unused before its state is indistinguishable from a fresh one.
+    if limit.algorithm == "token_bucket" and limit.max_count and limit.burst is not None:
+        return max(limit.window_seconds, math.ceil(limit.window_seconds * limit.burst / limit.max_count))
+    return 2 * limit.window_seconds
 
 
 class RiskEngine:
     def __init__(self, config: RiskConfig) -> None:
         self._config = config
-        self._counters: dict[str, tuple[int, int, int]] = {}
+        # key -> [previous count, previous amount, count, amount, window start]
+        self._counters: dict[_CounterKey, list[int]] = {}
+        # key -> (count tokens, amount tokens, last refill)
+        self._buckets: dict[_CounterKey, tuple[float, float, int]] = {}
+        # Keyed by action only, so these stay as small as the action set.
         self._error_counters: dict[str, tuple[int, int]] = {}
-        self._breaker_windows: dict[str, int] = {}
+        # action -> [state, since, probes admitted, probe successes]; closed breakers have no entry.
+        self._breakers: dict[str, list[int]] = {}
+        # Limits with neither a count nor an amount cap are dropped here so check() never builds their keys.
+        self._global_limit = _active(config.global_limit)
+        self._account_limit = _active(config.account_limit)
+        self._ip_limit = _active(config.ip_limit)
+        self._plans: dict[str, _ActionPlan] = {}
+        for action in config.action_limits:
+            self._add_plan(action)
+        limits = (config.global_limit, config.account_limit, config.ip_limit, *config.action_limits.values())
+        self._idle_horizon = max(_idle_seconds(limit) for limit in limits)
+        self._swept_at = _now_seconds()
+        self._lock = threading.Lock()
+        # Off mode, a global pause and a disabled breaker are bound once here instead of re-tested per call.
+        if config.mode == "off":
+            self.check = _skip  # type: ignore[method-assign]
+            self.check_many = _allow_all  # type: ignore[method-assign]
+            self.record_failure = _skip  # type: ignore[method-assign]
+            self.record_success = _skip  # type: ignore[method-assign]
+            return
+        if config.global_paused:
+            self.check = self._check_paused  # type: ignore[method-assign]
+        if config.breaker_errors_per_min <= 0:
+            self.record_failure = _skip  # type: ignore[method-assign]
+            self.record_success = _skip  # type: ignore[method-assign]
 
     @classmethod
     def from_settings(cls) -> "RiskEngine":
@@ -65,6 +148,7 @@ class RiskEngine:
                     max_count=settings.risk_faucet_max_per_min,
                     max_amount=settings.risk_max_faucet_amount,
                     window_seconds=60,
+                    algorithm="token_bucket",
                 ),
                 "wallet_transfer": RiskLimit(
                     max_count=settings.risk_transfer_max_per_min,
@@ -95,6 +179,7 @@ class RiskEngine:
                     max_count=settings.risk_chat_messages_per_min,
                     max_amount=None,
                     window_seconds=60,
+                    algorithm="token_bucket",
                 ),
             },
             breaker_errors_per_min=settings.risk_breaker_errors_per_min,
@@ -102,41 +187,98 @@ class RiskEngine:
         )
         return cls(config)
 
-    def _window(self, window_seconds: int) -> int:
-        now = int(time.time())
-        return now // window_seconds
-
-    def _bump_counter(self, key: str, limit: RiskLimit, amount: int) -> tuple[int, int]:
-        window_id = self._window(limit.window_seconds)
-        count, total_amount, stored_window = self._counters.get(key, (0, 0, window_id))
-        if stored_window != window_id:
-            count, total_amount = 0, 0
-        count += 1
-        total_amount += max(amount, 0)
-        self._counters[key] = (count, total_amount, window_id)
-        return count, total_amount
-
-    def _check_limit(self, label: str, key: str, limit: RiskLimit, amount: int) -> None:
-        if limit.max_count is None and limit.max_amount is None:
-            return
-        count, total_amount = self._bump_counter(key, limit, amount)
-        if limit.max_count is not None and count > limit.max_count:
-            self._deny(label, "count", limit.max_count, count, amount)
+    def _drain_bucket(self, key: _CounterKey, limit: RiskLimit, cost: int, now: int) -> tuple[int, int]:
+        # Returns usage the same way the window counters do: capacity minus the tokens left after this request.
+        count_capacity = _count_capacity(limit) or 0
+        amount_capacity = limit.max_amount or 0
+        count_tokens, amount_tokens, last = self._buckets.get(key, (count_capacity, amount_capacity, now))
+        elapsed = now - last
+        count = amount_used = 0
+        if limit.max_count is not None:
+            count_tokens = min(count_capacity, count_tokens + elapsed * limit.max_count / limit.window_seconds)
+            count = math.ceil(count_capacity - count_tokens) + 1
+        if limit.max_amount is not None:
+            amount_tokens = min(amount_capacity, amount_tokens + elapsed * limit.max_amount / limit.window_seconds)
+            amount_used = math.ceil(amount_capacity - amount_tokens) + cost
+        # Denied requests take nothing from the bucket, so a caller that backs off recovers at the refill rate.
+        if count <= count_capacity and amount_used <= amount_capacity:
+            if limit.max_count is not None:
+                count_tokens -= 1
+            if limit.max_amount is not None:
+                amount_tokens -= cost
+        self._buckets[key] = (count_tokens, amount_tokens, now)
+        return count, amount_used
+
+    def _check_limit(self, label: str, key: _CounterKey, limit: RiskLimit, amount: int, cost: int, now: int) -> None:
+        if limit.algorithm == "token_bucket":
+            count, total_amount = self._drain_bucket(key, limit, cost, now)
+            max_count = _count_capacity(limit)
+        else:
+            # The window counter is bumped inline: this branch runs for nearly every limit on every request.
+            window_seconds = limit.window_seconds
+            window_start = now - now % window_seconds
+            counters = self._counters
+            entry = counters.get(key)
+            if entry is None:
+                entry = counters[key] = [0, 0, 0, 0, window_start]
+            elif entry[4] != window_start:
+                if entry[4] == window_start - window_seconds:
+                    entry[0], entry[1] = entry[2], entry[3]
+                else:
+                    entry[0] = entry[1] = 0
+                entry[2] = entry[3] = 0
+                entry[4] = window_start
+            # Entries are updated in place, so the common same-window case never writes to the dict.
+            entry[2] += 1
+            entry[3] += cost
+            # Sliding window: the previous window still counts for the share of it that overlaps the last
+            # window_seconds, so a burst straddling a boundary cannot reach twice the limit.
+            remaining = window_seconds - now % window_seconds
+            count = entry[2] + entry[0] * remaining // window_seconds
+            total_amount = entry[3] + entry[1] * remaining // window_seconds
+            max_count = limit.max_count
+        if max_count is not None and count > max_count:
+            self._deny(label, "count", max_count, count, amount)
         if limit.max_amount is not None and total_amount > limit.max_amount:
             self._deny(label, "amount", limit.max_amount, total_amount, amount)
 
-    def _breaker_open(self, action: str) -> bool:
-        window_id = self._window(self._config.breaker_window_seconds)
-        return self._breaker_windows.get(action) == window_id
+    def _add_plan(self, action: str) -> _ActionPlan:
+        # Everything check() needs per action that does not depend on the caller; actions outside
+        # action_limits get a plan on first use.
+        limit = self._config.action_limits.get(action)
+        plan = _ActionPlan(
+            global_key=("global", action),
+            action_key=("action", action),
+            action_label=f"action:{action}",
+            action_limit=_active(limit) if limit is not None else None,
+        )
+        self._plans[action] = plan
+        return plan
+
+    def _sweep(self, now: int) -> None:
+        # Account and IP keys are unbounded; drop the ones idle long enough to no longer affect a decision.
+        # Runs under the engine lock, so the dicts can be rebuilt outright.
+        horizon = now - self._idle_horizon
+        self._counters = {key: entry for key, entry in self._counters.items() if entry[4] > horizon}
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > horizon}
+        self._swept_at = now
 
     def _deny(self, scope: str, dimension: str, limit: int, current: int, amount: int) -> None:
-        message = f"risk limit exceeded: {scope} {dimension} {current}/{limit}"
         if self._config.mode == "monitor":
-            logger.warning(message, extra={"scope": scope, "amount": amount})
+            # Monitor mode can deny on every request; only pay for formatting when a handler will see it.
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning(
+                    "risk limit exceeded: %s %s %s/%s",
+                    scope,
+                    dimension,
+                    current,
+                    limit,
+                    extra={"scope": scope, "amount": amount},
+                )
             return
         raise GatewayApiError(
             "RISK_LIMIT",
-            message,
+            f"risk limit exceeded: {scope} {dimension} {current}/{limit}",
             http_status=429,
             details={"scope": scope, "dimension": dimension, "limit": limit, "current": current, "amount": amount},
         )
@@ -149,45 +291,122 @@ class RiskEngine:
         client_ip: str | None,
         amount: int | None = None,
     ) -> None:
-        if self._config.mode == "off":
-            return
-        if self._config.global_paused:
-            self._deny("global_pause", "count", 0, 1, amount or 0)
-        if self._breaker_open(action):
+        self._check_at(_now_seconds(), action, account_id, client_ip, amount)
+
+    def check_many(self, checks: Iterable[RiskCheck]) -> list[GatewayApiError | None]:
+        # For bulk callers: one clock read for the whole batch, and every entry is checked on its own, with its
+        # denial returned in place rather than raised, so callers can accept the rest of the batch.
+        now = _now_seconds()
+        paused = self._config.global_paused
+        results: list[GatewayApiError | None] = []
+        for action, account_id, client_ip, amount in checks:
+            try:
+                if paused:
+                    self._deny("global_pause", "count", 0, 1, amount or 0)
+                self._check_at(now, action, account_id, client_ip, amount)
+            except GatewayApiError as exc:
+                results.append(exc)
+            else:
+                results.append(None)
+        return results
+
+    def _check_at(
+        self, now: int, action: str, account_id: str | None, client_ip: str | None, amount: int | None
+    ) -> None:
+        if action in self._breakers and not self._breaker_admits(action, now):
             self._deny("circuit_breaker", "count", 0, 1, amount or 0)
 
+        plan = self._plans.get(action) or self._add_plan(action)
         normalized_amount = int(amount or 0)
-        self._check_limit("global", f"global:{action}", self._config.global_limit, normalized_amount)
-
-        if account_id:
-            self._check_limit(
-                "account",
-                f"account:{account_id}:{action}",
-                self._config.account_limit,
-                normalized_amount,
-            )
-
-        if client_ip:
-            self._check_limit(
-                "ip",
-                f"ip:{client_ip}:{action}",
-                self._config.ip_limit,
-                normalized_amount,
-            )
-
-        action_limit = self._config.action_limits.get(action)
-        if action_limit:
-            self._check_limit(f"action:{action}", f"action:{action}", action_limit, normalized_amount)
+        # Counters only ever grow; negative amounts still count as a request but add nothing.
+        cost = normalized_amount if normalized_amount > 0 else 0
+        # Every request thread bumps the same global counter; unlocked read-modify-writes would drop counts
+        # under load and let traffic through above the configured limits.
+        with self._lock:
+            if now - self._swept_at >= self._idle_horizon:
+                self._sweep(now)
+            if self._global_limit is not None:
+                self._check_limit("global", plan.global_key, self._global_limit, normalized_amount, cost, now)
+
+            if account_id and self._account_limit is not None:
+                self._check_limit(
+                    "account",
+                    ("account", account_id, action),
+                    self._account_limit,
+                    normalized_amount,
+                    cost,
+                    now,
+                )
+
+            if client_ip and self._ip_limit is not None:
+                self._check_limit(
+                    "ip",
+                    ("ip", client_ip, action),
+                    self._ip_limit,
+                    normalized_amount,
+                    cost,
+                    now,
+                )
+
+            if plan.action_limit is not None:
+                self._check_limit(plan.action_label, plan.action_key, plan.action_limit, normalized_amount, cost, now)
+
+    def _breaker_admits(self, action: str, now: int) -> bool:
+        with self._lock:
+            breaker = self._breakers.get(action)
+            if breaker is None:
+                return True
+            if now - breaker[1] >= self._config.breaker_window_seconds:
+                # The timeout ran out, or a half-open round never heard back from its probes: start a new round.
+                breaker[:] = [_BREAKER_HALF_OPEN, now, 0, 0]
+            elif breaker[0] == _BREAKER_OPEN:
+                return False
+            if breaker[2] >= self._config.breaker_half_open_successes:
+                return False
+            breaker[2] += 1
+            return True
+
+    def _check_paused(
+        self,
+        action: str,
+        *,
+        account_id: str | None,
+        client_ip: str | None,
+        amount: int | None = None,
+    ) -> None:
+        # Bound as check() while mutations are paused; in monitor mode the pause is logged and checking goes on.
+        self._deny("global_pause", "count", 0, 1, amount or 0)
+        self._check_at(_now_seconds(), action, account_id, client_ip, amount)
 
     def record_failure(self, action: str) -> None:
-        if self._config.breaker_errors_per_min <= 0:
+        now = _now_seconds()
+        window_id = now // self._config.breaker_window_seconds
+        with self._lock:
+            breaker = self._breakers.get(action)
+            if breaker is not None:
+                if breaker[0] == _BREAKER_HALF_OPEN:
+                    # A failed probe sends the breaker straight back to open for another full timeout.
+                    breaker[:] = [_BREAKER_OPEN, now, 0, 0]
+                    logger.warning("circuit breaker reopened", extra={"action": action})
+                return
+            count, stored_window = self._error_counters.get(action, (0, window_id))
+            if stored_window != window_id:
+                count = 0
+            count += 1
+            self._error_counters[action] = (count, window_id)
+            if count >= self._config.breaker_errors_per_min:
+                self._breakers[action] = [_BREAKER_OPEN, now, 0, 0]
+                logger.warning("circuit breaker opened", extra={"action": action, "count": count})
+
+    def record_success(self, action: str) -> None:
+        if action not in self._breakers:
             return
-        window_id = self._window(self._config.breaker_window_seconds)
-        count, stored_window = self._error_counters.get(action, (0, window_id))
-        if stored_window != window_id:
-            count = 0
-        count += 1
-        self._error_counters[action] = (count, window_id)
-        if count >= self._config.breaker_errors_per_min:
-            self._breaker_windows[action] = window_id
-            logger.warning("circuit breaker opened", extra={"action": action, "count": count})
+        with self._lock:
+            breaker = self._breakers.get(action)
+            if breaker is None or breaker[0] != _BREAKER_HALF_OPEN:
+                return
+            breaker[3] += 1
+            if breaker[3] >= self._config.breaker_half_open_successes:
+                del self._breakers[action]
+                self._error_counters.pop(action, None)
+                logger.info("circuit breaker closed", extra={"action": action})
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
 import argparse
+import email.parser
+import functools
+import http.client
 import io
 import json
 import re
+import sqlite3
 import subprocess
+import threading
 import time
 import zipfile
+from collections import deque
+from contextlib import contextmanager
+from email.message import Message
 from http import HTTPStatus
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from typing import Callable, Iterator
 from urllib.parse import parse_qs, urlparse
 
 import nyx_backend_gateway.gateway as gateway
@@ -28,7 +37,9 @@ from nyx_backend_gateway.gateway import (
     execute_wallet_transfer,
     fetch_wallet_balance,
 )
+from nyx_backend_gateway.models import GatewayResult
 from nyx_backend_gateway.storage import (
+    ConnectionPool,
     StorageError,
     create_connection,
     get_wallet_balance,
@@ -43,20 +54,117 @@ _MAX_BODY = 4096
 _RATE_LIMIT = 120
 _RATE_WINDOW_SECONDS = 60
 _ACCOUNT_RATE_LIMIT = 60
+_KEEPALIVE_TIMEOUT_SECONDS = 30
+_STREAM_CHUNK_SIZE = 64 * 1024
+# Same header limits as http.client.
+_MAX_HEADER_LINE = 65536
+_MAX_HEADERS = 100
+_HEADER_LINE = re.compile(rb"([\x21-\x39\x3b-\x7e]+):[ \t]*([^\r\n]*)\r?\n?\Z")
+_COLUMNAR_JSON = "application/vnd.nyx.columnar+json"
+_ROOM_MESSAGES_PATH = re.compile(r"\A/chat/v1/rooms/([^/]+)/messages\Z")
+# Request fields that address the run itself rather than the action payload.
+_META_KEYS = frozenset({"seed", "run_id"})
+# Members an EC public JWK must carry as strings.
+_JWK_KEYS = ("kty", "crv", "x", "y")
+_FEE_RUN_ACTIONS = frozenset(
+    {
+        ("exchange", "route_swap"),
+        ("exchange", "place_order"),
+        ("exchange", "cancel_order"),
+        ("chat", "message_event"),
+        ("marketplace", "listing_publish"),
+        ("marketplace", "purchase_listing"),
+    }
+)
+
+
+_CORS_HEADERS = (
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+    b"Access-Control-Allow-Headers: Content-Type, Authorization\r\n"
+)
+_SECURITY_HEADERS = (
+    b"X-Content-Type-Options: nosniff\r\n"
+    b"X-Frame-Options: DENY\r\n"
+    b"Referrer-Policy: no-referrer\r\n"
+    b"Permissions-Policy: geolocation=(), camera=(), microphone=()\r\n"
+    b"Cross-Origin-Opener-Policy: same-origin\r\n"
+    b"Cross-Origin-Resource-Policy: same-origin\r\n"
+    b"Content-Security-Policy: default-src 'none'; frame-ancestors 'none'; base-uri 'none'\r\n"
+    b"Strict-Transport-Security: max-age=31536000; includeSubDomains\r\n"
+    b"Cache-Control: no-store\r\n"
+)
+
+# json.dumps builds a new encoder whenever options are passed; response trees are acyclic, so skip the cycle check.
+_JSON_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"), check_circular=False)
 
 
+def _json_bytes(payload: dict) -> bytes:
+    return _JSON_ENCODER.encode(payload).encode("utf-8")
+
+
+@functools.cache
 def _version_info() -> dict[str, str]:
     try:
-        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, timeout=1).strip()
     except Exception:
         commit = "unknown"
     try:
-        describe = subprocess.check_output(["git", "describe", "--tags", "--always"], text=True).strip()
+        describe = subprocess.check_output(["git", "describe", "--tags", "--always"], text=True, timeout=1).strip()
     except Exception:
         describe = "unknown"
     return {"commit": commit, "describe": describe, "build": "testnet"}
 
 
+_CAPABILITY_ENDPOINTS = (
+    "/run",
+    "/capabilities",
+    "/portal/v1/me",
+    "/portal/v1/activity",
+    "/portal/v1/accounts/search",
+    "/portal/v1/accounts/by_id",
+    "/portal/v1/e2ee/identity",
+    "/wallet/v1/balances",
+    "/wallet/v1/transfers",
+    "/wallet/v1/airdrop/tasks",
+    "/wallet/v1/airdrop/claim",
+    "/wallet/v1/faucet",
+    "/wallet/v1/transfer",
+    "/exchange/orderbook",
+    "/exchange/v1/my_orders",
+    "/exchange/v1/my_trades",
+    "/marketplace/listings",
+    "/marketplace/listings/search",
+    "/marketplace/v1/my_purchases",
+    "/chat/v1/conversations",
+    "/chat/messages",
+    "/integrations/v1/0x/quote",
+    "/integrations/v1/jupiter/quote",
+    "/integrations/v1/magic_eden/solana/collections",
+    "/integrations/v1/magic_eden/solana/collection_listings",
+    "/integrations/v1/magic_eden/solana/token",
+    "/integrations/v1/magic_eden/evm/collections/search",
+    "/integrations/v1/magic_eden/evm/collections",
+    "/web2/v1/allowlist",
+    "/web2/v1/request",
+    "/web2/v1/requests",
+    "/evidence",
+    "/evidence/v1/replay",
+    "/export.zip",
+    "/proof.zip",
+)
+_MODULE_FEATURES = {
+    "portal": {"auth": "mandatory", "profile": "enabled"},
+    "wallet": {"faucet": "enabled", "transfer": "enabled", "airdrop": "enabled"},
+    "exchange": {"trading": "enabled", "orderbook": "enabled"},
+    "marketplace": {"listing": "enabled", "purchase": "enabled"},
+    "chat": {"e2ee": "verified", "dm": "enabled"},
+    "dapp": {"browser": "enabled"},
+    "web2": {"guard": "enabled"},
+}
+
+
+@functools.cache
 def _capabilities() -> dict[str, object]:
     from nyx_backend_gateway.env import (
         get_0x_api_key,
@@ -71,61 +179,35 @@ def _capabilities() -> dict[str, object]:
         # PayEVM is not shipped yet (NO FAKE UI).
         "payevm": "disabled_not_implemented",
     }
-    module_features = {
-        "portal": {"auth": "mandatory", "profile": "enabled"},
-        "wallet": {"faucet": "enabled", "transfer": "enabled", "airdrop": "enabled"},
-        "exchange": {"trading": "enabled", "orderbook": "enabled"},
-        "marketplace": {"listing": "enabled", "purchase": "enabled"},
-        "chat": {"e2ee": "verified", "dm": "enabled"},
-        "dapp": {"browser": "enabled"},
-        "web2": {"guard": "enabled"},
-        "integrations": integration_features,
-    }
+    module_features = {**_MODULE_FEATURES, "integrations": integration_features}
     return {
-        "modules": sorted(module_features.keys()),
+        "modules": sorted(module_features),
         "module_features": module_features,
-        "endpoints": [
-            "/run",
-            "/capabilities",
-            "/portal/v1/me",
-            "/portal/v1/activity",
-            "/portal/v1/accounts/search",
-            "/portal/v1/accounts/by_id",
-            "/portal/v1/e2ee/identity",
-            "/wallet/v1/balances",
-            "/wallet/v1/transfers",
-            "/wallet/v1/airdrop/tasks",
-            "/wallet/v1/airdrop/claim",
-            "/wallet/v1/faucet",
-            "/wallet/v1/transfer",
-            "/exchange/orderbook",
-            "/exchange/v1/my_orders",
-            "/exchange/v1/my_trades",
-            "/marketplace/listings",
-            "/marketplace/listings/search",
-            "/marketplace/v1/my_purchases",
-            "/chat/v1/conversations",
-            "/chat/messages",
-            "/integrations/v1/0x/quote",
-            "/integrations/v1/jupiter/quote",
-            "/integrations/v1/magic_eden/solana/collections",
-            "/integrations/v1/magic_eden/solana/collection_listings",
-            "/integrations/v1/magic_eden/solana/token",
-            "/integrations/v1/magic_eden/evm/collections/search",
-            "/integrations/v1/magic_eden/evm/collections",
-            "/web2/v1/allowlist",
-            "/web2/v1/request",
-            "/web2/v1/requests",
-            "/evidence",
-            "/evidence/v1/replay",
-            "/export.zip",
-            "/proof.zip",
-        ],
+        "endpoints": list(_CAPABILITY_ENDPOINTS),
         "assets": gateway.supported_assets(),
         "exchange_pairs": [{"base": "ECHO", "quote": "NYXT", "status": "enabled"}],
     }
 
 
+# The capabilities document cannot change while the process runs, so it is serialized once.
+@functools.cache
+def _capabilities_json() -> bytes:
+    return _json_bytes(_capabilities())
+
+
+def _run_response(result: GatewayResult, extra: dict[str, object] | None = None) -> dict[str, object]:
+    response: dict[str, object] = {
+        "run_id": result.run_id,
+        "status": "complete",
+        "state_hash": result.state_hash,
+        "receipt_hashes": result.receipt_hashes,
+        "replay_ok": result.replay_ok,
+    }
+    if extra:
+        response.update(extra)
+    return response
+
+
 def _fee_summary(module: str, action: str, payload: dict, run_id: str) -> dict[str, object]:
     from nyx_backend_gateway.fees import route_fee
 
@@ -141,31 +223,209 @@ def _fee_summary(module: str, action: str, payload: dict, run_id: str) -> dict[s
     }
 
 
+def _parse_headers(rfile: io.BufferedIOBase) -> Message:
+    # http.client.parse_headers feeds the header block through the email package's parser, which is about half the
+    # cost of a small request. Plain "Name: value" lines are stored directly; a block with anything else in it
+    # (folded lines, malformed names, stray carriage returns) is still handed to the email parser.
+    lines = []
+    while True:
+        line = rfile.readline(_MAX_HEADER_LINE + 1)
+        if len(line) > _MAX_HEADER_LINE:
+            raise http.client.LineTooLong("header line")
+        lines.append(line)
+        if len(lines) > _MAX_HEADERS:
+            raise http.client.HTTPException(f"got more than {_MAX_HEADERS} headers")
+        if line in (b"\r\n", b"\n", b""):
+            break
+    message = http.client.HTTPMessage()
+    for line in lines[:-1]:
+        match = _HEADER_LINE.match(line)
+        if match is None:
+            block = b"".join(lines).decode("iso-8859-1")
+            return email.parser.Parser(_class=http.client.HTTPMessage).parsestr(block)
+        message[match[1].decode("iso-8859-1")] = match[2].decode("iso-8859-1")
+    return message
+
+
+class _StreamWriter:
+    # File-like sink for bodies of unknown length. zipfile issues many small header writes, so they are coalesced
+    # into chunks of at least _STREAM_CHUNK_SIZE; large payloads go out without being copied into the buffer.
+    def __init__(self, wfile: io.BufferedIOBase, *, chunked: bool) -> None:
+        self._wfile = wfile
+        self._chunked = chunked
+        self._pending = bytearray()
+
+    def write(self, data: bytes) -> int:
+        size = len(data)
+        if size >= _STREAM_CHUNK_SIZE:
+            self._emit()
+            self._send(data)
+        else:
+            self._pending += data
+            if len(self._pending) >= _STREAM_CHUNK_SIZE:
+                self._emit()
+        return size
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self._emit()
+        if self._chunked:
+            self._wfile.write(b"0\r\n\r\n")
+
+    def _emit(self) -> None:
+        if self._pending:
+            self._send(self._pending)
+            self._pending = bytearray()
+
+    def _send(self, data: bytes | bytearray) -> None:
+        if self._chunked:
+            self._wfile.write(b"%x\r\n" % len(data))
+            self._wfile.write(data)
+            self._wfile.write(b"\r\n")
+        else:
+            self._wfile.write(data)
+
+
 class RequestLimiter:
     def __init__(self, limit: int, window_seconds: int) -> None:
         self._limit = limit
         self._window = window_seconds
-        self._state: dict[str, tuple[int, float]] = {}
+        # Per key, the admission times still inside the rolling window; never more than `limit` of them.
+        self._state: dict[str, deque[float]] = {}
+        self._swept_at = time.monotonic()
+        self._lock = threading.Lock()
 
     def allow(self, key: str) -> bool:
         now = time.monotonic()
-        count, start = self._state.get(key, (0, now))
-        if now - start >= self._window:
-            count, start = 0, now
-        if count >= self._limit:
-            self._state[key] = (count, start)
-            return False
-        self._state[key] = (count + 1, start)
-        return True
+        cutoff = now - self._window
+        # Handler threads share the limiter; expiry, the count and the append must not interleave.
+        with self._lock:
+            if now - self._swept_at >= self._window:
+                self._sweep(cutoff)
+                self._swept_at = now
+            hits = self._state.get(key)
+            if hits is None:
+                hits = self._state[key] = deque()
+            while hits and hits[0] <= cutoff:
+                hits.popleft()
+            if len(hits) >= self._limit:
+                return False
+            hits.append(now)
+            return True
+
+    def _sweep(self, cutoff: float) -> None:
+        # Client IPs and account ids are unbounded; keys with nothing left in the window are dropped.
+        # Runs under the limiter lock, so the dict can be rebuilt outright.
+        self._state = {key: hits for key, hits in self._state.items() if hits and hits[-1] > cutoff}
 
 
 class GatewayHandler(BaseHTTPRequestHandler):
+    server: GatewayServer
+    _headers_buffer: list[bytes]
+    raw_requestline: bytes
     server_version = "NYXGateway/2.0"
+    # Keep-alive lets a client reuse one socket and handler thread for many requests; idle sockets close after
+    # the timeout so they do not pin threads.
+    protocol_version = "HTTP/1.1"
+    timeout = _KEEPALIVE_TIMEOUT_SECONDS
     _response_status: int | None = None
+    _body_read = False
+
+    def parse_request(self) -> bool:
+        # BaseHTTPRequestHandler.parse_request with the header block read by _parse_headers; request line, version
+        # and Connection/Expect handling follow the standard library.
+        self.command = ""
+        self.request_version = version = self.default_request_version
+        self.close_connection = True
+        requestline = str(self.raw_requestline, "iso-8859-1").rstrip("\r\n")
+        self.requestline = requestline
+        words = requestline.split()
+        if not words:
+            return False
+        if len(words) >= 3:
+            version = words[-1]
+            try:
+                if not version.startswith("HTTP/"):
+                    raise ValueError
+                base_version_number = version.split("/", 1)[1]
+                components = base_version_number.split(".")
+                if len(components) != 2:
+                    raise ValueError
+                if any(not component.isdigit() or len(component) > 10 for component in components):
+                    raise ValueError
+                version_number = int(components[0]), int(components[1])
+            except (ValueError, IndexError):
+                self.send_error(HTTPStatus.BAD_REQUEST, f"Bad request version ({version!r})")
+                return False
+            if version_number >= (1, 1):
+                self.close_connection = False
+            if version_number >= (2, 0):
+                self.send_error(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED, f"Invalid HTTP version ({base_version_number})")
+                return False
+            self.request_version = version
+        if not 2 <= len(words) <= 3:
+            self.send_error(HTTPStatus.BAD_REQUEST, f"Bad request syntax ({requestline!r})")
+            return False
+        command, path = words[:2]
+        if len(words) == 2:
+            self.close_connection = True
+            if command != "GET":
+                self.send_error(HTTPStatus.BAD_REQUEST, f"Bad HTTP/0.9 request type ({command!r})")
+                return False
+        self.command = command
+        # gh-87389: "//host/path" would read as a network-path reference.
+        self.path = "/" + path.lstrip("/") if path.startswith("//") else path
+        try:
+            self.headers = _parse_headers(self.rfile)
+        except http.client.LineTooLong as err:
+            self.send_error(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Line too long", str(err))
+            return False
+        except http.client.HTTPException as err:
+            self.send_error(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers", str(err))
+            return False
+        # Bodies are framed by Content-Length alone. A chunked body, or one whose length is ambiguous, would leave
+        # bytes on the kept-alive socket that are then read as the next request. send_error closes the connection.
+        if "Transfer-Encoding" in self.headers:
+            self.send_error(HTTPStatus.NOT_IMPLEMENTED, "Transfer-Encoding not supported")
+            return False
+        if len(set(self.headers.get_all("Content-Length", ()))) > 1:
+            self.send_error(HTTPStatus.BAD_REQUEST, "Conflicting Content-Length")
+            return False
+        self._body_read = False
+        conntype = self.headers.get("Connection", "").lower()
+        if conntype == "close":
+            self.close_connection = True
+        elif conntype == "keep-alive":
+            self.close_connection = False
+        expect = self.headers.get("Expect", "")
+        if expect.lower() == "100-continue" and self.request_version >= "HTTP/1.1":
+            return self.handle_expect_100()
+        return True
 
     def send_response(self, code: int, message: str | None = None) -> None:
         self._response_status = code
         super().send_response(code, message)
+        self._discard_unread_body()
+
+    def _discard_unread_body(self) -> None:
+        # The next request on the socket starts right after this one's body, so a body the handler never read
+        # (rate limited, auth failure, GET with a body) is drained, or the connection is closed after the response.
+        # Transfer-Encoding was already refused in parse_request.
+        if self._body_read:
+            return
+        self._body_read = True
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length == 0:
+            return
+        if 0 < length <= _MAX_BODY:
+            self.rfile.read(length)
+            return
+        self.send_header("Connection", "close")
 
     def _record_metrics(self, method: str, start_time: float) -> None:
         try:
@@ -178,22 +438,34 @@ class GatewayHandler(BaseHTTPRequestHandler):
     def handle_one_request(self) -> None:
         start = metrics.monotonic_seconds()
         self._response_status = None
+        # Until this request's headers are parsed there is no body to drain; an error sent for a bad request line
+        # must not act on a missing or previous request's headers.
+        self._body_read = True
+        # On a kept-alive socket a timeout or EOF ends the call without parsing a request; do not report the
+        # previous one again.
+        self.command = ""
         try:
             super().handle_one_request()
         finally:
             if self.command:
                 self._record_metrics(self.command, start)
 
+    def _send_header_block(self, block: bytes) -> None:
+        # Same guard as send_header: HTTP/0.9 responses carry no headers.
+        if self.request_version != "HTTP/0.9":
+            self._headers_buffer.append(block)
+
     def _send_security_headers(self) -> None:
-        self.send_header("X-Content-Type-Options", "nosniff")
-        self.send_header("X-Frame-Options", "DENY")
-        self.send_header("Referrer-Policy", "no-referrer")
-        self.send_header("Permissions-Policy", "geolocation=(), camera=(), microphone=()")
-        self.send_header("Cross-Origin-Opener-Policy", "same-origin")
-        self.send_header("Cross-Origin-Resource-Policy", "same-origin")
-        self.send_header("Content-Security-Policy", "default-src 'none'; frame-ancestors 'none'; base-uri 'none'")
-        self.send_header("Strict-Transport-Security", "max-age=31536000; includeSubDomains")
-        self.send_header("Cache-Control", "no-store")
+        self._send_header_block(_SECURITY_HEADERS)
+
+    def _end_headers_with(self, body: bytes) -> None:
+        # Small bodies ride along with the header block so the response goes out in a single write.
+        if self.request_version != "HTTP/0.9":
+            self._headers_buffer.append(b"\r\n")
+            self._headers_buffer.append(body)
+            self.flush_headers()
+            return
+        self.wfile.write(body)
 
     def _risk_guard(
         self,
@@ -221,6 +493,12 @@ class GatewayHandler(BaseHTTPRequestHandler):
         except Exception:
             pass
 
+    def _risk_success(self, action: str) -> None:
+        try:
+            self.server.risk_engine.record_success(action)
+        except Exception:
+            pass
+
     @staticmethod
     def _parse_int(value: object | None) -> int | None:
         if isinstance(value, bool):
@@ -235,18 +513,11 @@ class GatewayHandler(BaseHTTPRequestHandler):
                 return int(text)
         return None
 
-    def _send_json(self, payload: dict, status: HTTPStatus = HTTPStatus.OK) -> None:
+    def _send_json(
+        self, payload: dict, status: HTTPStatus = HTTPStatus.OK, content_type: str = "application/json"
+    ) -> None:
         try:
-            data = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
-            self.send_response(status)
-            self.send_header("Content-Type", "application/json")
-            self.send_header("Content-Length", str(len(data)))
-            self.send_header("Access-Control-Allow-Origin", "*")
-            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-            self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization")
-            self._send_security_headers()
-            self.end_headers()
-            self.wfile.write(data)
+            self._send_json_body(_json_bytes(payload), status, content_type)
         except Exception:
             # Fallback for serialization errors
             error_data = json.dumps({"error": "internal serialization error"}).encode("utf-8")
@@ -254,8 +525,20 @@ class GatewayHandler(BaseHTTPRequestHandler):
             self.send_header("Content-Type", "application/json")
             self.send_header("Content-Length", str(len(error_data)))
             self._send_security_headers()
-            self.end_headers()
-            self.wfile.write(error_data)
+            self._end_headers_with(error_data)
+
+    def _send_json_body(
+        self, data: bytes, status: HTTPStatus = HTTPStatus.OK, content_type: str = "application/json"
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self._send_header_block(_CORS_HEADERS)
+        self._send_security_headers()
+        self._end_headers_with(data)
+
+    def _wants_columnar(self) -> bool:
+        return _COLUMNAR_JSON in (self.headers.get("Accept") or "")
 
     def _send_error(self, exc: Exception, status: HTTPStatus = HTTPStatus.BAD_REQUEST) -> None:
         if isinstance(exc, GatewayApiError):
@@ -270,9 +553,7 @@ class GatewayHandler(BaseHTTPRequestHandler):
 
     def do_OPTIONS(self) -> None:  # noqa: N802
         self.send_response(HTTPStatus.NO_CONTENT)
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization")
+        self._send_header_block(_CORS_HEADERS)
         self._send_security_headers()
         self.end_headers()
 
@@ -282,8 +563,7 @@ class GatewayHandler(BaseHTTPRequestHandler):
         self.send_header("Content-Type", "text/plain; charset=utf-8")
         self.send_header("Content-Length", str(len(data)))
         self._send_security_headers()
-        self.end_headers()
-        self.wfile.write(data)
+        self._end_headers_with(data)
 
     def _send_metrics(self) -> None:
         payload = metrics.render_metrics().encode("utf-8")
@@ -291,8 +571,7 @@ class GatewayHandler(BaseHTTPRequestHandler):
         self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
         self.send_header("Content-Length", str(len(payload)))
         self._send_security_headers()
-        self.end_headers()
-        self.wfile.write(payload)
+        self._end_headers_with(payload)
 
     def _send_bytes(self, data: bytes, content_type: str) -> None:
         self.send_response(HTTPStatus.OK)
@@ -302,16 +581,43 @@ class GatewayHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(data)
 
+    def _start_streamed_response(self, content_type: str) -> _StreamWriter:
+        chunked = self.request_version == "HTTP/1.1"
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            # HTTP/1.0 has no chunked framing; the body ends when the connection does.
+            self.send_header("Connection", "close")
+        self._send_header_block(_CORS_HEADERS)
+        self._send_security_headers()
+        self.end_headers()
+        return _StreamWriter(self.wfile, chunked=chunked)
+
     def _parse_body(self) -> dict:
-        length = int(self.headers.get("Content-Length", "0"))
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise GatewayError("invalid content length")
         if length <= 0:
             return {}
         if length > _MAX_BODY:
             raise GatewayError("payload too large")
-        body = self.rfile.read(length)
+        self._body_read = True
+        # Read straight into one buffer; both JSON decoders accept a bytearray.
+        body = bytearray(length)
+        view = memoryview(body)
+        received = 0
+        while received < length:
+            count = self.rfile.readinto(view[received:])
+            if not count:
+                raise GatewayError("incomplete body")
+            received += count
         try:
-            payload = json.loads(body.decode("utf-8"))
-        except json.JSONDecodeError:
+            payload = json.loads(body)
+        except ValueError:
+            # Covers JSONDecodeError as well as bytes that are not valid UTF-8.
             raise GatewayError("invalid json")
         if not isinstance(payload, dict):
             raise GatewayError("payload must be object")
@@ -330,6 +636,29 @@ class GatewayHandler(BaseHTTPRequestHandler):
             return True
         return limiter.allow(account_id)
 
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        pool = getattr(self.server, "connection_pool", None)
+        if pool is not None:
+            with pool.connection(_db_path()) as conn:
+                yield conn
+            return
+        conn = create_connection(_db_path())
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _extract_sub_payload(payload: dict) -> dict:
+        # Clients either nest the action fields under "payload" or send them inline next to seed and run_id.
+        sub = payload.get("payload")
+        if sub is None:
+            return {k: v for k, v in payload.items() if k not in _META_KEYS}
+        if not isinstance(sub, dict):
+            raise GatewayError("payload must be object")
+        return sub
+
     def _require_run_id(self, payload: dict) -> str:
         run_id = payload.get("run_id")
         if not isinstance(run_id, str) or not run_id or isinstance(run_id, bool):
@@ -355,803 +684,710 @@ class GatewayHandler(BaseHTTPRequestHandler):
         token = auth.split(" ", 1)[1].strip()
         if not token:
             raise GatewayApiError("AUTH_REQUIRED", "auth required", http_status=HTTPStatus.UNAUTHORIZED)
-        conn = create_connection(_db_path())
-        try:
-            session = portal.require_session(conn, token)
-        except portal.PortalError as exc:
-            raise GatewayApiError("AUTH_INVALID", str(exc), http_status=HTTPStatus.UNAUTHORIZED) from exc
-        finally:
-            conn.close()
+        with self._connection() as conn:
+            try:
+                session = portal.require_session(conn, token)
+            except portal.PortalError as exc:
+                raise GatewayApiError("AUTH_INVALID", str(exc), http_status=HTTPStatus.UNAUTHORIZED) from exc
         if not self._account_rate_limit_ok(session.account_id):
             raise GatewayApiError("ACCOUNT_RATE_LIMIT", "rate limit exceeded", http_status=HTTPStatus.TOO_MANY_REQUESTS)
         return session
 
     def _require_wallet_account(self) -> tuple[portal.PortalSession, portal.PortalAccount]:
         session = self._require_auth()
-        conn = create_connection(_db_path())
-        try:
+        with self._connection() as conn:
             account = portal.load_account(conn, session.account_id)
-        finally:
-            conn.close()
         if account is None:
             raise GatewayApiError("ACCOUNT_NOT_FOUND", "account not found", http_status=HTTPStatus.BAD_REQUEST)
         return session, account
 
+    def _post_run(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        module = payload.get("module")
+        action = payload.get("action")
+        extra = payload.get("payload")
+        if not isinstance(module, str) or not module or isinstance(module, bool):
+            raise GatewayError("module required")
+        if not isinstance(action, str) or not action or isinstance(action, bool):
+            raise GatewayError("action required")
+        if extra is None:
+            extra = {}
+        if not isinstance(extra, dict):
+            raise GatewayError("payload must be object")
+        result = execute_run(
+            seed=seed,
+            run_id=run_id,
+            module=module,
+            action=action,
+            payload=extra,
+            caller_wallet_address=account.wallet_address,
+            caller_account_id=session.account_id,
+        )
+        response = _run_response(result)
+        if (module, action) in _FEE_RUN_ACTIONS:
+            response.update(_fee_summary(module, action, extra, result.run_id))
+        self._send_json(response)
+
+    def _post_portal_accounts(self) -> None:
+        payload = self._parse_body()
+        handle = payload.get("handle")
+        pubkey = payload.get("pubkey")
+        if not isinstance(handle, str) or not handle:
+            raise GatewayError("handle required")
+        if not isinstance(pubkey, str) or not pubkey:
+            raise GatewayError("pubkey required")
+        with self._connection() as conn:
+            account = portal.create_account(conn, handle, pubkey)
+        self._send_json(
+            {
+                "account_id": account.account_id,
+                "handle": account.handle,
+                "pubkey": account.public_key,
+                "wallet_address": account.wallet_address,
+                "created_at": account.created_at,
+                "status": account.status,
+            }
+        )
+
+    def _post_portal_auth_challenge(self) -> None:
+        payload = self._parse_body()
+        account_id = payload.get("account_id")
+        if not isinstance(account_id, str) or not account_id:
+            raise GatewayError("account_id required")
+        with self._connection() as conn:
+            challenge = portal.issue_challenge(conn, account_id)
+        self._send_json({"nonce": challenge.nonce, "expires_at": challenge.expires_at})
+
+    def _post_portal_auth_verify(self) -> None:
+        payload = self._parse_body()
+        account_id = payload.get("account_id")
+        nonce = payload.get("nonce")
+        signature = payload.get("signature")
+        if not isinstance(account_id, str) or not account_id:
+            raise GatewayError("account_id required")
+        if not isinstance(nonce, str) or not nonce:
+            raise GatewayError("nonce required")
+        if not isinstance(signature, str) or not signature:
+            raise GatewayError("signature required")
+        with self._connection() as conn:
+            session = portal.verify_challenge(conn, account_id, nonce, signature)
+            account_record = portal.load_account(conn, account_id)
+        response = {"access_token": session.token, "expires_at": session.expires_at}
+        if account_record is not None:
+            response["wallet_address"] = account_record.wallet_address
+        self._send_json(response)
+
+    def _post_portal_auth_logout(self) -> None:
+        session = self._require_auth()
+        with self._connection() as conn:
+            portal.logout_session(conn, session.token)
+        self._send_json({"ok": True})
+
+    def _post_portal_profile(self) -> None:
+        session = self._require_auth()
+        payload = self._parse_body()
+        with self._connection() as conn:
+            account = portal.update_profile(
+                conn, session.account_id, handle=payload.get("handle"), bio=payload.get("bio")
+            )
+        self._send_json({"account": account})
+
+    def _post_portal_e2ee_identity(self) -> None:
+        session = self._require_auth()
+        payload = self._parse_body()
+        public_jwk = payload.get("public_jwk")
+        jwk_obj: dict | None = None
+        jwk_str: str | None = None
+        if isinstance(public_jwk, dict):
+            jwk_obj = public_jwk
+            jwk_str = portal._canonical_json(public_jwk).decode("utf-8")
+        elif isinstance(public_jwk, str) and public_jwk.strip():
+            jwk_str = public_jwk.strip()
+            try:
+                jwk_obj = json.loads(jwk_str)
+            except json.JSONDecodeError as exc:
+                raise GatewayError("public_jwk invalid") from exc
+        else:
+            raise GatewayError("public_jwk required")
+        if not isinstance(jwk_obj, dict):
+            raise GatewayError("public_jwk invalid")
+        if len(jwk_str or "") > 2048:
+            raise GatewayError("public_jwk too long")
+        if not all(isinstance(jwk_obj.get(key), str) for key in _JWK_KEYS):
+            raise GatewayError("public_jwk invalid")
+        updated_at = int(time.time())
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO e2ee_identities (account_id, public_jwk, updated_at) VALUES (?, ?, ?)",
+                (session.account_id, jwk_str, updated_at),
+            )
+            conn.commit()
+        self._send_json({"account_id": session.account_id, "public_jwk": jwk_obj, "updated_at": updated_at})
+
+    def _post_chat_rooms(self) -> None:
+        _ = self._require_auth()
+        payload = self._parse_body()
+        name = payload.get("name")
+        if not isinstance(name, str) or not name:
+            raise GatewayError("name required")
+        is_public = payload.get("is_public", True)
+        with self._connection() as conn:
+            room = portal.create_room(conn, name=name, is_public=bool(is_public))
+        self._send_json(
+            {
+                "room_id": room.room_id,
+                "name": room.name,
+                "created_at": room.created_at,
+                "is_public": bool(room.is_public),
+            }
+        )
+
+    def _post_chat_room_message(self, room_id: str) -> None:
+        session = self._require_auth()
+        payload = self._parse_body()
+        body = payload.get("body")
+        if not isinstance(body, str) or not body:
+            raise GatewayError("body required")
+        self._risk_guard(
+            "chat_message",
+            account_id=session.account_id,
+            client_ip=self.client_address[0] if self.client_address else None,
+            amount=None,
+        )
+        with self._connection() as conn:
+            try:
+                message_fields, receipt = portal.post_message(
+                    conn, room_id=room_id, sender_account_id=session.account_id, body=body
+                )
+            except Exception:
+                self._risk_failure("chat_message")
+                raise
+            else:
+                self._risk_success("chat_message")
+        self._send_json({"message": message_fields, "receipt": receipt})
+
+    def _post_wallet_v1_faucet(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        faucet_payload = self._extract_sub_payload(payload)
+        client_ip = self.client_address[0] if self.client_address else None
+        faucet_amount = self._parse_int(faucet_payload.get("amount"))
+        self._risk_guard(
+            "wallet_faucet",
+            account_id=session.account_id,
+            client_ip=client_ip,
+            amount=faucet_amount,
+        )
+        try:
+            result, balance, fee_record = gateway.execute_wallet_faucet_v1(
+                seed=seed,
+                run_id=run_id,
+                payload=faucet_payload,
+                account_id=session.account_id,
+                wallet_address=account.wallet_address,
+                client_ip=client_ip,
+            )
+        except Exception:
+            self._risk_failure("wallet_faucet")
+            raise
+        else:
+            self._risk_success("wallet_faucet")
+        self._send_json(
+            _run_response(
+                result,
+                {
+                    "address": account.wallet_address,
+                    "balance": balance,
+                    "fee_total": fee_record.total_paid,
+                    "fee_breakdown": {
+                        "protocol_fee_total": fee_record.protocol_fee_total,
+                        "platform_fee_amount": fee_record.platform_fee_amount,
+                    },
+                    "payer": account.wallet_address,
+                    "treasury_address": fee_record.fee_address,
+                },
+            )
+        )
+
+    def _post_wallet_v1_airdrop_claim(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        claim_payload = self._extract_sub_payload(payload)
+        claim_amount = self._parse_int(claim_payload.get("amount"))
+        self._risk_guard(
+            "wallet_airdrop",
+            account_id=session.account_id,
+            client_ip=self.client_address[0] if self.client_address else None,
+            amount=claim_amount,
+        )
+        try:
+            result, balance, fee_record, claim = gateway.execute_airdrop_claim_v1(
+                seed=seed,
+                run_id=run_id,
+                payload=claim_payload,
+                account_id=session.account_id,
+                wallet_address=account.wallet_address,
+            )
+        except Exception:
+            self._risk_failure("wallet_airdrop")
+            raise
+        else:
+            self._risk_success("wallet_airdrop")
+        self._send_json(
+            _run_response(
+                result,
+                {
+                    "account_id": session.account_id,
+                    "task_id": claim.get("task_id"),
+                    "reward": claim.get("reward"),
+                    "completion_run_id": claim.get("completion_run_id"),
+                    "balance": balance,
+                    "fee_total": fee_record.total_paid,
+                    "fee_breakdown": {
+                        "protocol_fee_total": fee_record.protocol_fee_total,
+                        "platform_fee_amount": fee_record.platform_fee_amount,
+                    },
+                    "payer": account.wallet_address,
+                    "treasury_address": fee_record.fee_address,
+                },
+            )
+        )
+
+    def _post_wallet_v1_transfer(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        transfer_payload = self._extract_sub_payload(payload)
+        if transfer_payload.get("from_address") != account.wallet_address:
+            raise GatewayApiError(
+                "FROM_ADDRESS_MISMATCH",
+                "from_address must match authenticated wallet_address",
+                http_status=403,
+            )
+        transfer_amount = self._parse_int(transfer_payload.get("amount"))
+        self._risk_guard(
+            "wallet_transfer",
+            account_id=session.account_id,
+            client_ip=self.client_address[0] if self.client_address else None,
+            amount=transfer_amount,
+        )
+        try:
+            result, balances, fee_record = execute_wallet_transfer(
+                seed=seed,
+                run_id=run_id,
+                payload=transfer_payload,
+                account_id=session.account_id,
+                wallet_address=account.wallet_address,
+            )
+        except Exception:
+            self._risk_failure("wallet_transfer")
+            raise
+        else:
+            self._risk_success("wallet_transfer")
+        self._send_json(
+            _run_response(
+                result,
+                {
+                    "from_address": transfer_payload.get("from_address"),
+                    "to_address": transfer_payload.get("to_address"),
+                    "asset_id": transfer_payload.get("asset_id", "NYXT"),
+                    "amount": transfer_payload.get("amount"),
+                    "fee_total": fee_record.total_paid,
+                    "fee_breakdown": {
+                        "protocol_fee_total": fee_record.protocol_fee_total,
+                        "platform_fee_amount": fee_record.platform_fee_amount,
+                    },
+                    "payer": account.wallet_address,
+                    "treasury_address": fee_record.fee_address,
+                    "from_balance": balances["from_balance"],
+                    "to_balance": balances["to_balance"],
+                    "treasury_balance": balances["treasury_balance"],
+                },
+            )
+        )
+
+    def _post_exchange_place_order(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        order_payload = self._extract_sub_payload(payload)
+        notional = None
+        amount_val = self._parse_int(order_payload.get("amount"))
+        price_val = self._parse_int(order_payload.get("price"))
+        if amount_val is not None and price_val is not None:
+            notional = amount_val * price_val
+        else:
+            notional = amount_val
+        self._risk_guard(
+            "exchange_order",
+            account_id=session.account_id,
+            client_ip=self.client_address[0] if self.client_address else None,
+            amount=notional,
+        )
+        try:
+            result = execute_run(
+                seed=seed,
+                run_id=run_id,
+                module="exchange",
+                action="place_order",
+                payload=order_payload,
+                caller_wallet_address=account.wallet_address,
+                caller_account_id=session.account_id,
+            )
+        except Exception:
+            self._risk_failure("exchange_order")
+            raise
+        else:
+            self._risk_success("exchange_order")
+        self._send_json(_run_response(result, _fee_summary("exchange", "place_order", order_payload, result.run_id)))
+
+    def _post_exchange_cancel_order(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        cancel_payload = self._extract_sub_payload(payload)
+        self._risk_guard(
+            "exchange_cancel",
+            account_id=session.account_id,
+            client_ip=self.client_address[0] if self.client_address else None,
+            amount=None,
+        )
+        try:
+            result = execute_run(
+                seed=seed,
+                run_id=run_id,
+                module="exchange",
+                action="cancel_order",
+                payload=cancel_payload,
+                caller_wallet_address=account.wallet_address,
+                caller_account_id=session.account_id,
+            )
+        except Exception:
+            self._risk_failure("exchange_cancel")
+            raise
+        else:
+            self._risk_success("exchange_cancel")
+        self._send_json(_run_response(result, _fee_summary("exchange", "cancel_order", cancel_payload, result.run_id)))
+
+    def _post_chat_send(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        message_payload = self._extract_sub_payload(payload)
+        self._risk_guard(
+            "chat_message",
+            account_id=session.account_id,
+            client_ip=self.client_address[0] if self.client_address else None,
+            amount=None,
+        )
+        try:
+            result = execute_run(
+                seed=seed,
+                run_id=run_id,
+                module="chat",
+                action="message_event",
+                payload=message_payload,
+                caller_wallet_address=account.wallet_address,
+                caller_account_id=session.account_id,
+            )
+        except Exception:
+            self._risk_failure("chat_message")
+            raise
+        else:
+            self._risk_success("chat_message")
+        self._send_json(_run_response(result, _fee_summary("chat", "message_event", message_payload, result.run_id)))
+
+    def _post_wallet_faucet(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        faucet_payload = self._extract_sub_payload(payload)
+        faucet_amount = self._parse_int(faucet_payload.get("amount"))
+        self._risk_guard(
+            "wallet_faucet",
+            account_id=session.account_id,
+            client_ip=self.client_address[0] if self.client_address else None,
+            amount=faucet_amount,
+        )
+        try:
+            result, balances, fee_record = execute_wallet_faucet(
+                seed=seed,
+                run_id=run_id,
+                payload=faucet_payload,
+                account_id=session.account_id,
+                wallet_address=account.wallet_address,
+            )
+        except Exception:
+            self._risk_failure("wallet_faucet")
+            raise
+        else:
+            self._risk_success("wallet_faucet")
+        self._send_json(
+            _run_response(
+                result,
+                {
+                    "address": account.wallet_address,
+                    "balance": balances["balance"],
+                    "fee_total": fee_record.total_paid,
+                    "payer": account.wallet_address,
+                    "treasury_address": fee_record.fee_address,
+                },
+            )
+        )
+
+    def _post_wallet_airdrop_claim(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        claim_payload = self._extract_sub_payload(payload)
+        claim_amount = self._parse_int(claim_payload.get("amount"))
+        self._risk_guard(
+            "wallet_airdrop",
+            account_id=session.account_id,
+            client_ip=self.client_address[0] if self.client_address else None,
+            amount=claim_amount,
+        )
+        try:
+            result, balance, fee_record, claim = gateway.execute_airdrop_claim_v1(
+                seed=seed,
+                run_id=run_id,
+                payload=claim_payload,
+                account_id=session.account_id,
+                wallet_address=account.wallet_address,
+            )
+        except Exception:
+            self._risk_failure("wallet_airdrop")
+            raise
+        else:
+            self._risk_success("wallet_airdrop")
+        self._send_json(
+            _run_response(
+                result,
+                {
+                    "account_id": session.account_id,
+                    "task_id": claim.get("task_id"),
+                    "reward": claim.get("reward"),
+                    "completion_run_id": claim.get("completion_run_id"),
+                    "balance": balance,
+                    "fee_total": fee_record.total_paid,
+                    "payer": account.wallet_address,
+                    "treasury_address": fee_record.fee_address,
+                },
+            )
+        )
+
+    def _post_wallet_transfer(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        transfer_payload = self._extract_sub_payload(payload)
+        if transfer_payload.get("from_address") != account.wallet_address:
+            raise GatewayApiError(
+                "FROM_ADDRESS_MISMATCH",
+                "from_address must match authenticated wallet_address",
+                http_status=403,
+            )
+        transfer_amount = self._parse_int(transfer_payload.get("amount"))
+        self._risk_guard(
+            "wallet_transfer",
+            account_id=session.account_id,
+            client_ip=self.client_address[0] if self.client_address else None,
+            amount=transfer_amount,
+        )
+        try:
+            result, balances, fee_record = execute_wallet_transfer(
+                seed=seed,
+                run_id=run_id,
+                payload=transfer_payload,
+                account_id=session.account_id,
+                wallet_address=account.wallet_address,
+            )
+        except Exception:
+            self._risk_failure("wallet_transfer")
+            raise
+        else:
+            self._risk_success("wallet_transfer")
+        self._send_json(
+            _run_response(
+                result,
+                {
+                    "from_address": transfer_payload.get("from_address"),
+                    "to_address": transfer_payload.get("to_address"),
+                    "amount": transfer_payload.get("amount"),
+                    "fee_total": fee_record.total_paid,
+                    "fee_breakdown": {
+                        "protocol_fee_total": fee_record.protocol_fee_total,
+                        "platform_fee_amount": fee_record.platform_fee_amount,
+                    },
+                    "payer": account.wallet_address,
+                    "treasury_address": fee_record.fee_address,
+                    "from_balance": balances["from_balance"],
+                    "to_balance": balances["to_balance"],
+                    "treasury_balance": balances["treasury_balance"],
+                },
+            )
+        )
+
+    def _post_marketplace_listing(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        listing_payload = self._extract_sub_payload(payload)
+        if "publisher_id" not in listing_payload:
+            listing_payload["publisher_id"] = account.wallet_address
+        result = execute_run(
+            seed=seed,
+            run_id=run_id,
+            module="marketplace",
+            action="listing_publish",
+            payload=listing_payload,
+            caller_wallet_address=account.wallet_address,
+            caller_account_id=session.account_id,
+        )
+        self._send_json(
+            _run_response(result, _fee_summary("marketplace", "listing_publish", listing_payload, result.run_id))
+        )
+
+    def _post_marketplace_purchase(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        purchase_payload = self._extract_sub_payload(payload)
+        if "buyer_id" not in purchase_payload:
+            purchase_payload["buyer_id"] = account.wallet_address
+        notional = None
+        qty_val = self._parse_int(purchase_payload.get("qty"))
+        price_val = self._parse_int(purchase_payload.get("price"))
+        amount_val = self._parse_int(purchase_payload.get("amount"))
+        if qty_val is not None and price_val is not None:
+            notional = qty_val * price_val
+        elif amount_val is not None:
+            notional = amount_val
+        self._risk_guard(
+            "marketplace_purchase",
+            account_id=session.account_id,
+            client_ip=self.client_address[0] if self.client_address else None,
+            amount=notional,
+        )
+        try:
+            result = execute_run(
+                seed=seed,
+                run_id=run_id,
+                module="marketplace",
+                action="purchase_listing",
+                payload=purchase_payload,
+                caller_wallet_address=account.wallet_address,
+                caller_account_id=session.account_id,
+            )
+        except Exception:
+            self._risk_failure("marketplace_purchase")
+            raise
+        else:
+            self._risk_success("marketplace_purchase")
+        self._send_json(
+            _run_response(result, _fee_summary("marketplace", "purchase_listing", purchase_payload, result.run_id))
+        )
+
+    def _post_web2_request(self) -> None:
+        session, account = self._require_wallet_account()
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        web2_payload = self._extract_sub_payload(payload)
+        response = gateway.execute_web2_guard_request(
+            seed=seed,
+            run_id=run_id,
+            payload=web2_payload,
+            account_id=session.account_id,
+            wallet_address=account.wallet_address,
+        )
+        self._send_json(response)
+
+    def _post_entertainment_step(self) -> None:
+        payload = self._parse_body()
+        seed = self._require_seed(payload)
+        run_id = self._require_run_id(payload)
+        step_payload = self._extract_sub_payload(payload)
+        result = execute_run(
+            seed=seed,
+            run_id=run_id,
+            module="entertainment",
+            action="state_step",
+            payload=step_payload,
+        )
+        self._send_json(_run_response(result))
+
+    def _post_evidence_replay(self) -> None:
+        _ = self._require_auth()
+        payload = self._parse_body()
+        run_id_value = payload.get("run_id")
+        if not isinstance(run_id_value, str) or not run_id_value or isinstance(run_id_value, bool):
+            raise GatewayError("run_id required")
+        run_id = run_id_value
+        backend_src = gateway._backend_src()
+        if str(backend_src) not in __import__("sys").path:
+            __import__("sys").path.insert(0, str(backend_src))
+        from nyx_backend.evidence import EvidenceError, replay_verify_run
+
+        try:
+            result = replay_verify_run(run_id, base_dir=_run_root())
+        except EvidenceError as exc:
+            raise GatewayError(str(exc)) from exc
+        self._send_json(result)
+
+    _POST_ROUTES: dict[str, Callable[[GatewayHandler], None]] = {
+        "/run": _post_run,
+        "/portal/v1/accounts": _post_portal_accounts,
+        "/portal/v1/auth/challenge": _post_portal_auth_challenge,
+        "/portal/v1/auth/verify": _post_portal_auth_verify,
+        "/portal/v1/auth/logout": _post_portal_auth_logout,
+        "/portal/v1/profile": _post_portal_profile,
+        "/portal/v1/e2ee/identity": _post_portal_e2ee_identity,
+        "/chat/v1/rooms": _post_chat_rooms,
+        "/wallet/v1/faucet": _post_wallet_v1_faucet,
+        "/wallet/v1/airdrop/claim": _post_wallet_v1_airdrop_claim,
+        "/wallet/v1/transfer": _post_wallet_v1_transfer,
+        "/exchange/place_order": _post_exchange_place_order,
+        "/exchange/cancel_order": _post_exchange_cancel_order,
+        "/chat/send": _post_chat_send,
+        "/wallet/faucet": _post_wallet_faucet,
+        "/wallet/airdrop/claim": _post_wallet_airdrop_claim,
+        "/wallet/transfer": _post_wallet_transfer,
+        "/marketplace/listing": _post_marketplace_listing,
+        "/marketplace/purchase": _post_marketplace_purchase,
+        "/web2/v1/request": _post_web2_request,
+        "/entertainment/step": _post_entertainment_step,
+        "/evidence/v1/replay": _post_evidence_replay,
+    }
+
     def do_POST(self) -> None:  # noqa: N802
         if not self._rate_limit_ok():
             self._send_text("rate limit exceeded", HTTPStatus.TOO_MANY_REQUESTS)
             return
         try:
-            if self.path == "/run":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                module = payload.get("module")
-                action = payload.get("action")
-                extra = payload.get("payload")
-                if not isinstance(module, str) or not module or isinstance(module, bool):
-                    raise GatewayError("module required")
-                if not isinstance(action, str) or not action or isinstance(action, bool):
-                    raise GatewayError("action required")
-                if extra is None:
-                    extra = {}
-                if not isinstance(extra, dict):
-                    raise GatewayError("payload must be object")
-                result = execute_run(
-                    seed=seed,
-                    run_id=run_id,
-                    module=module,
-                    action=action,
-                    payload=extra,
-                    caller_wallet_address=account.wallet_address,
-                    caller_account_id=session.account_id,
-                )
-                response = {
-                    "run_id": result.run_id,
-                    "status": "complete",
-                    "state_hash": result.state_hash,
-                    "receipt_hashes": result.receipt_hashes,
-                    "replay_ok": result.replay_ok,
-                }
-                if (module, action) in {
-                    ("exchange", "route_swap"),
-                    ("exchange", "place_order"),
-                    ("exchange", "cancel_order"),
-                    ("chat", "message_event"),
-                    ("marketplace", "listing_publish"),
-                    ("marketplace", "purchase_listing"),
-                }:
-                    response.update(_fee_summary(module, action, extra, result.run_id))
-                self._send_json(response)
-                return
-            if self.path == "/portal/v1/accounts":
-                payload = self._parse_body()
-                handle = payload.get("handle")
-                pubkey = payload.get("pubkey")
-                if not isinstance(handle, str) or not handle:
-                    raise GatewayError("handle required")
-                if not isinstance(pubkey, str) or not pubkey:
-                    raise GatewayError("pubkey required")
-                conn = create_connection(_db_path())
-                try:
-                    account = portal.create_account(conn, handle, pubkey)
-                finally:
-                    conn.close()
-                self._send_json(
-                    {
-                        "account_id": account.account_id,
-                        "handle": account.handle,
-                        "pubkey": account.public_key,
-                        "wallet_address": account.wallet_address,
-                        "created_at": account.created_at,
-                        "status": account.status,
-                    }
-                )
-                return
-            if self.path == "/portal/v1/auth/challenge":
-                payload = self._parse_body()
-                account_id = payload.get("account_id")
-                if not isinstance(account_id, str) or not account_id:
-                    raise GatewayError("account_id required")
-                conn = create_connection(_db_path())
-                try:
-                    challenge = portal.issue_challenge(conn, account_id)
-                finally:
-                    conn.close()
-                self._send_json({"nonce": challenge.nonce, "expires_at": challenge.expires_at})
+            handler = self._POST_ROUTES.get(self.path)
+            if handler is not None:
+                handler(self)
                 return
-            if self.path == "/portal/v1/auth/verify":
-                payload = self._parse_body()
-                account_id = payload.get("account_id")
-                nonce = payload.get("nonce")
-                signature = payload.get("signature")
-                if not isinstance(account_id, str) or not account_id:
-                    raise GatewayError("account_id required")
-                if not isinstance(nonce, str) or not nonce:
-                    raise GatewayError("nonce required")
-                if not isinstance(signature, str) or not signature:
-                    raise GatewayError("signature required")
-                conn = create_connection(_db_path())
-                try:
-                    session = portal.verify_challenge(conn, account_id, nonce, signature)
-                    account_record = portal.load_account(conn, account_id)
-                finally:
-                    conn.close()
-                response = {"access_token": session.token, "expires_at": session.expires_at}
-                if account_record is not None:
-                    response["wallet_address"] = account_record.wallet_address
-                self._send_json(response)
-                return
-            if self.path == "/portal/v1/auth/logout":
-                session = self._require_auth()
-                conn = create_connection(_db_path())
-                try:
-                    portal.logout_session(conn, session.token)
-                finally:
-                    conn.close()
-                self._send_json({"ok": True})
-                return
-            if self.path == "/portal/v1/profile":
-                session = self._require_auth()
-                payload = self._parse_body()
-                conn = create_connection(_db_path())
-                try:
-                    account = portal.update_profile(
-                        conn, session.account_id, handle=payload.get("handle"), bio=payload.get("bio")
-                    )
-                finally:
-                    conn.close()
-                self._send_json({"account": account})
-                return
-            if self.path == "/portal/v1/e2ee/identity":
-                session = self._require_auth()
-                payload = self._parse_body()
-                public_jwk = payload.get("public_jwk")
-                jwk_obj: dict | None = None
-                jwk_str: str | None = None
-                if isinstance(public_jwk, dict):
-                    jwk_obj = public_jwk
-                    jwk_str = json.dumps(public_jwk, sort_keys=True, separators=(",", ":"))
-                elif isinstance(public_jwk, str) and public_jwk.strip():
-                    jwk_str = public_jwk.strip()
-                    jwk_obj = json.loads(jwk_str)
-                else:
-                    raise GatewayError("public_jwk required")
-                if not isinstance(jwk_obj, dict):
-                    raise GatewayError("public_jwk invalid")
-                if len(jwk_str or "") > 2048:
-                    raise GatewayError("public_jwk too long")
-                if not isinstance(jwk_obj.get("kty"), str) or not isinstance(jwk_obj.get("crv"), str):
-                    raise GatewayError("public_jwk invalid")
-                if not isinstance(jwk_obj.get("x"), str) or not isinstance(jwk_obj.get("y"), str):
-                    raise GatewayError("public_jwk invalid")
-                updated_at = int(time.time())
-                conn = create_connection(_db_path())
-                try:
-                    conn.execute(
-                        "INSERT OR REPLACE INTO e2ee_identities (account_id, public_jwk, updated_at) VALUES (?, ?, ?)",
-                        (session.account_id, jwk_str, updated_at),
-                    )
-                    conn.commit()
-                finally:
-                    conn.close()
-                self._send_json({"account_id": session.account_id, "public_jwk": jwk_obj, "updated_at": updated_at})
-                return
-            if self.path == "/chat/v1/rooms":
-                _ = self._require_auth()
-                payload = self._parse_body()
-                name = payload.get("name")
-                if not isinstance(name, str) or not name:
-                    raise GatewayError("name required")
-                is_public = payload.get("is_public", True)
-                conn = create_connection(_db_path())
-                try:
-                    room = portal.create_room(conn, name=name, is_public=bool(is_public))
-                finally:
-                    conn.close()
-                self._send_json(
-                    {
-                        "room_id": room.room_id,
-                        "name": room.name,
-                        "created_at": room.created_at,
-                        "is_public": bool(room.is_public),
-                    }
-                )
-                return
-            if self.path.startswith("/chat/v1/rooms/") and self.path.endswith("/messages"):
-                parts = self.path.split("/")
-                if len(parts) != 6:
-                    raise GatewayError("room_id required")
-                room_id = parts[4]
-                session = self._require_auth()
-                payload = self._parse_body()
-                body = payload.get("body")
-                if not isinstance(body, str) or not body:
-                    raise GatewayError("body required")
-                self._risk_guard(
-                    "chat_message",
-                    account_id=session.account_id,
-                    client_ip=self.client_address[0] if self.client_address else None,
-                    amount=None,
-                )
-                conn = create_connection(_db_path())
-                try:
-                    try:
-                        message_fields, receipt = portal.post_message(
-                            conn, room_id=room_id, sender_account_id=session.account_id, body=body
-                        )
-                    except Exception:
-                        self._risk_failure("chat_message")
-                        raise
-                finally:
-                    conn.close()
-                self._send_json({"message": message_fields, "receipt": receipt})
-                return
-            if self.path == "/wallet/v1/faucet":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                faucet_payload = payload.get("payload")
-                if faucet_payload is None:
-                    faucet_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                client_ip = self.client_address[0] if self.client_address else None
-                faucet_amount = None
-                if isinstance(faucet_payload, dict):
-                    faucet_amount = self._parse_int(faucet_payload.get("amount"))
-                self._risk_guard(
-                    "wallet_faucet",
-                    account_id=session.account_id,
-                    client_ip=client_ip,
-                    amount=faucet_amount,
-                )
-                try:
-                    result, balance, fee_record = gateway.execute_wallet_faucet_v1(
-                        seed=seed,
-                        run_id=run_id,
-                        payload=faucet_payload,
-                        account_id=session.account_id,
-                        wallet_address=account.wallet_address,
-                        client_ip=client_ip,
-                    )
-                except Exception:
-                    self._risk_failure("wallet_faucet")
-                    raise
-                self._send_json(
-                    {
-                        "run_id": result.run_id,
-                        "status": "complete",
-                        "state_hash": result.state_hash,
-                        "receipt_hashes": result.receipt_hashes,
-                        "replay_ok": result.replay_ok,
-                        "address": account.wallet_address,
-                        "balance": balance,
-                        "fee_total": fee_record.total_paid,
-                        "fee_breakdown": {
-                            "protocol_fee_total": fee_record.protocol_fee_total,
-                            "platform_fee_amount": fee_record.platform_fee_amount,
-                        },
-                        "payer": account.wallet_address,
-                        "treasury_address": fee_record.fee_address,
-                    }
-                )
-                return
-            if self.path == "/wallet/v1/airdrop/claim":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                claim_payload = payload.get("payload")
-                if claim_payload is None:
-                    claim_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                if not isinstance(claim_payload, dict):
-                    raise GatewayError("payload must be object")
-                claim_amount = self._parse_int(claim_payload.get("amount"))
-                self._risk_guard(
-                    "wallet_airdrop",
-                    account_id=session.account_id,
-                    client_ip=self.client_address[0] if self.client_address else None,
-                    amount=claim_amount,
-                )
-                try:
-                    result, balance, fee_record, claim = gateway.execute_airdrop_claim_v1(
-                        seed=seed,
-                        run_id=run_id,
-                        payload=claim_payload,
-                        account_id=session.account_id,
-                        wallet_address=account.wallet_address,
-                    )
-                except Exception:
-                    self._risk_failure("wallet_airdrop")
-                    raise
-                self._send_json(
-                    {
-                        "run_id": result.run_id,
-                        "status": "complete",
-                        "state_hash": result.state_hash,
-                        "receipt_hashes": result.receipt_hashes,
-                        "replay_ok": result.replay_ok,
-                        "account_id": session.account_id,
-                        "task_id": claim.get("task_id"),
-                        "reward": claim.get("reward"),
-                        "completion_run_id": claim.get("completion_run_id"),
-                        "balance": balance,
-                        "fee_total": fee_record.total_paid,
-                        "fee_breakdown": {
-                            "protocol_fee_total": fee_record.protocol_fee_total,
-                            "platform_fee_amount": fee_record.platform_fee_amount,
-                        },
-                        "payer": account.wallet_address,
-                        "treasury_address": fee_record.fee_address,
-                    }
-                )
-                return
-            if self.path == "/wallet/v1/transfer":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                transfer_payload = payload.get("payload")
-                if transfer_payload is None:
-                    transfer_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                if not isinstance(transfer_payload, dict):
-                    raise GatewayError("payload must be object")
-                if transfer_payload.get("from_address") != account.wallet_address:
-                    raise GatewayApiError(
-                        "FROM_ADDRESS_MISMATCH",
-                        "from_address must match authenticated wallet_address",
-                        http_status=403,
-                    )
-                transfer_amount = self._parse_int(transfer_payload.get("amount"))
-                self._risk_guard(
-                    "wallet_transfer",
-                    account_id=session.account_id,
-                    client_ip=self.client_address[0] if self.client_address else None,
-                    amount=transfer_amount,
-                )
-                try:
-                    result, balances, fee_record = execute_wallet_transfer(
-                        seed=seed,
-                        run_id=run_id,
-                        payload=transfer_payload,
-                        account_id=session.account_id,
-                        wallet_address=account.wallet_address,
-                    )
-                except Exception:
-                    self._risk_failure("wallet_transfer")
-                    raise
-                self._send_json(
-                    {
-                        "run_id": result.run_id,
-                        "status": "complete",
-                        "state_hash": result.state_hash,
-                        "receipt_hashes": result.receipt_hashes,
-                        "replay_ok": result.replay_ok,
-                        "from_address": transfer_payload.get("from_address"),
-                        "to_address": transfer_payload.get("to_address"),
-                        "asset_id": transfer_payload.get("asset_id", "NYXT"),
-                        "amount": transfer_payload.get("amount"),
-                        "fee_total": fee_record.total_paid,
-                        "fee_breakdown": {
-                            "protocol_fee_total": fee_record.protocol_fee_total,
-                            "platform_fee_amount": fee_record.platform_fee_amount,
-                        },
-                        "payer": account.wallet_address,
-                        "treasury_address": fee_record.fee_address,
-                        "from_balance": balances["from_balance"],
-                        "to_balance": balances["to_balance"],
-                        "treasury_balance": balances["treasury_balance"],
-                    }
-                )
-                return
-            if self.path == "/exchange/place_order":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                order_payload = payload.get("payload")
-                if order_payload is None:
-                    order_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                notional = None
-                if isinstance(order_payload, dict):
-                    amount_val = self._parse_int(order_payload.get("amount"))
-                    price_val = self._parse_int(order_payload.get("price"))
-                    if amount_val is not None and price_val is not None:
-                        notional = amount_val * price_val
-                    else:
-                        notional = amount_val
-                self._risk_guard(
-                    "exchange_order",
-                    account_id=session.account_id,
-                    client_ip=self.client_address[0] if self.client_address else None,
-                    amount=notional,
-                )
-                try:
-                    result = execute_run(
-                        seed=seed,
-                        run_id=run_id,
-                        module="exchange",
-                        action="place_order",
-                        payload=order_payload,
-                        caller_wallet_address=account.wallet_address,
-                        caller_account_id=session.account_id,
-                    )
-                except Exception:
-                    self._risk_failure("exchange_order")
-                    raise
-                response = {
-                    "run_id": result.run_id,
-                    "status": "complete",
-                    "state_hash": result.state_hash,
-                    "receipt_hashes": result.receipt_hashes,
-                    "replay_ok": result.replay_ok,
-                }
-                if isinstance(order_payload, dict):
-                    response.update(_fee_summary("exchange", "place_order", order_payload, result.run_id))
-                self._send_json(response)
-                return
-            if self.path == "/exchange/cancel_order":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                cancel_payload = payload.get("payload")
-                if cancel_payload is None:
-                    cancel_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                self._risk_guard(
-                    "exchange_cancel",
-                    account_id=session.account_id,
-                    client_ip=self.client_address[0] if self.client_address else None,
-                    amount=None,
-                )
-                try:
-                    result = execute_run(
-                        seed=seed,
-                        run_id=run_id,
-                        module="exchange",
-                        action="cancel_order",
-                        payload=cancel_payload,
-                        caller_wallet_address=account.wallet_address,
-                        caller_account_id=session.account_id,
-                    )
-                except Exception:
-                    self._risk_failure("exchange_cancel")
-                    raise
-                response = {
-                    "run_id": result.run_id,
-                    "status": "complete",
-                    "state_hash": result.state_hash,
-                    "receipt_hashes": result.receipt_hashes,
-                    "replay_ok": result.replay_ok,
-                }
-                if isinstance(cancel_payload, dict):
-                    response.update(_fee_summary("exchange", "cancel_order", cancel_payload, result.run_id))
-                self._send_json(response)
-                return
-            if self.path == "/chat/send":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                message_payload = payload.get("payload")
-                if message_payload is None:
-                    message_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                self._risk_guard(
-                    "chat_message",
-                    account_id=session.account_id,
-                    client_ip=self.client_address[0] if self.client_address else None,
-                    amount=None,
-                )
-                try:
-                    result = execute_run(
-                        seed=seed,
-                        run_id=run_id,
-                        module="chat",
-                        action="message_event",
-                        payload=message_payload,
-                        caller_wallet_address=account.wallet_address,
-                        caller_account_id=session.account_id,
-                    )
-                except Exception:
-                    self._risk_failure("chat_message")
-                    raise
-                response = {
-                    "run_id": result.run_id,
-                    "status": "complete",
-                    "state_hash": result.state_hash,
-                    "receipt_hashes": result.receipt_hashes,
-                    "replay_ok": result.replay_ok,
-                }
-                if isinstance(message_payload, dict):
-                    response.update(_fee_summary("chat", "message_event", message_payload, result.run_id))
-                self._send_json(response)
-                return
-            if self.path == "/wallet/faucet":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                faucet_payload = payload.get("payload")
-                if faucet_payload is None:
-                    faucet_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                faucet_amount = None
-                if isinstance(faucet_payload, dict):
-                    faucet_amount = self._parse_int(faucet_payload.get("amount"))
-                self._risk_guard(
-                    "wallet_faucet",
-                    account_id=session.account_id,
-                    client_ip=self.client_address[0] if self.client_address else None,
-                    amount=faucet_amount,
-                )
-                try:
-                    result, balances, fee_record = execute_wallet_faucet(
-                        seed=seed,
-                        run_id=run_id,
-                        payload=faucet_payload,
-                        account_id=session.account_id,
-                        wallet_address=account.wallet_address,
-                    )
-                except Exception:
-                    self._risk_failure("wallet_faucet")
-                    raise
-                self._send_json(
-                    {
-                        "run_id": result.run_id,
-                        "status": "complete",
-                        "state_hash": result.state_hash,
-                        "receipt_hashes": result.receipt_hashes,
-                        "replay_ok": result.replay_ok,
-                        "address": account.wallet_address,
-                        "balance": balances["balance"],
-                        "fee_total": fee_record.total_paid,
-                        "payer": account.wallet_address,
-                        "treasury_address": fee_record.fee_address,
-                    }
-                )
-                return
-            if self.path == "/wallet/airdrop/claim":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                claim_payload = payload.get("payload")
-                if claim_payload is None:
-                    claim_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                if not isinstance(claim_payload, dict):
-                    raise GatewayError("payload must be object")
-                claim_amount = self._parse_int(claim_payload.get("amount"))
-                self._risk_guard(
-                    "wallet_airdrop",
-                    account_id=session.account_id,
-                    client_ip=self.client_address[0] if self.client_address else None,
-                    amount=claim_amount,
-                )
-                try:
-                    result, balance, fee_record, claim = gateway.execute_airdrop_claim_v1(
-                        seed=seed,
-                        run_id=run_id,
-                        payload=claim_payload,
-                        account_id=session.account_id,
-                        wallet_address=account.wallet_address,
-                    )
-                except Exception:
-                    self._risk_failure("wallet_airdrop")
-                    raise
-                self._send_json(
-                    {
-                        "run_id": result.run_id,
-                        "status": "complete",
-                        "state_hash": result.state_hash,
-                        "receipt_hashes": result.receipt_hashes,
-                        "replay_ok": result.replay_ok,
-                        "account_id": session.account_id,
-                        "task_id": claim.get("task_id"),
-                        "reward": claim.get("reward"),
-                        "completion_run_id": claim.get("completion_run_id"),
-                        "balance": balance,
-                        "fee_total": fee_record.total_paid,
-                        "payer": account.wallet_address,
-                        "treasury_address": fee_record.fee_address,
-                    }
-                )
-                return
-            if self.path in {"/wallet/transfer", "/wallet/v1/transfer"}:
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                transfer_payload = payload.get("payload")
-                if transfer_payload is None:
-                    transfer_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                if not isinstance(transfer_payload, dict):
-                    raise GatewayError("payload must be object")
-                if transfer_payload.get("from_address") != account.wallet_address:
-                    raise GatewayApiError(
-                        "FROM_ADDRESS_MISMATCH",
-                        "from_address must match authenticated wallet_address",
-                        http_status=403,
-                    )
-                transfer_amount = self._parse_int(transfer_payload.get("amount"))
-                self._risk_guard(
-                    "wallet_transfer",
-                    account_id=session.account_id,
-                    client_ip=self.client_address[0] if self.client_address else None,
-                    amount=transfer_amount,
-                )
-                try:
-                    result, balances, fee_record = execute_wallet_transfer(
-                        seed=seed,
-                        run_id=run_id,
-                        payload=transfer_payload,
-                        account_id=session.account_id,
-                        wallet_address=account.wallet_address,
-                    )
-                except Exception:
-                    self._risk_failure("wallet_transfer")
-                    raise
-                self._send_json(
-                    {
-                        "run_id": result.run_id,
-                        "status": "complete",
-                        "state_hash": result.state_hash,
-                        "receipt_hashes": result.receipt_hashes,
-                        "replay_ok": result.replay_ok,
-                        "from_address": transfer_payload.get("from_address"),
-                        "to_address": transfer_payload.get("to_address"),
-                        "amount": transfer_payload.get("amount"),
-                        "fee_total": fee_record.total_paid,
-                        "fee_breakdown": {
-                            "protocol_fee_total": fee_record.protocol_fee_total,
-                            "platform_fee_amount": fee_record.platform_fee_amount,
-                        },
-                        "payer": account.wallet_address,
-                        "treasury_address": fee_record.fee_address,
-                        "from_balance": balances["from_balance"],
-                        "to_balance": balances["to_balance"],
-                        "treasury_balance": balances["treasury_balance"],
-                    }
-                )
-                return
-            if self.path == "/marketplace/listing":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                listing_payload = payload.get("payload")
-                if listing_payload is None:
-                    listing_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                if isinstance(listing_payload, dict) and "publisher_id" not in listing_payload:
-                    listing_payload["publisher_id"] = account.wallet_address
-                result = execute_run(
-                    seed=seed,
-                    run_id=run_id,
-                    module="marketplace",
-                    action="listing_publish",
-                    payload=listing_payload,
-                    caller_wallet_address=account.wallet_address,
-                    caller_account_id=session.account_id,
-                )
-                response = {
-                    "run_id": result.run_id,
-                    "status": "complete",
-                    "state_hash": result.state_hash,
-                    "receipt_hashes": result.receipt_hashes,
-                    "replay_ok": result.replay_ok,
-                }
-                if isinstance(listing_payload, dict):
-                    response.update(_fee_summary("marketplace", "listing_publish", listing_payload, result.run_id))
-                self._send_json(response)
-                return
-            if self.path == "/marketplace/purchase":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                purchase_payload = payload.get("payload")
-                if purchase_payload is None:
-                    purchase_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                if isinstance(purchase_payload, dict) and "buyer_id" not in purchase_payload:
-                    purchase_payload["buyer_id"] = account.wallet_address
-                notional = None
-                if isinstance(purchase_payload, dict):
-                    qty_val = self._parse_int(purchase_payload.get("qty"))
-                    price_val = self._parse_int(purchase_payload.get("price"))
-                    amount_val = self._parse_int(purchase_payload.get("amount"))
-                    if qty_val is not None and price_val is not None:
-                        notional = qty_val * price_val
-                    elif amount_val is not None:
-                        notional = amount_val
-                self._risk_guard(
-                    "marketplace_purchase",
-                    account_id=session.account_id,
-                    client_ip=self.client_address[0] if self.client_address else None,
-                    amount=notional,
-                )
-                try:
-                    result = execute_run(
-                        seed=seed,
-                        run_id=run_id,
-                        module="marketplace",
-                        action="purchase_listing",
-                        payload=purchase_payload,
-                        caller_wallet_address=account.wallet_address,
-                        caller_account_id=session.account_id,
-                    )
-                except Exception:
-                    self._risk_failure("marketplace_purchase")
-                    raise
-                response = {
-                    "run_id": result.run_id,
-                    "status": "complete",
-                    "state_hash": result.state_hash,
-                    "receipt_hashes": result.receipt_hashes,
-                    "replay_ok": result.replay_ok,
-                }
-                if isinstance(purchase_payload, dict):
-                    response.update(_fee_summary("marketplace", "purchase_listing", purchase_payload, result.run_id))
-                self._send_json(response)
-                return
-            if self.path == "/web2/v1/request":
-                session, account = self._require_wallet_account()
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                web2_payload = payload.get("payload")
-                if web2_payload is None:
-                    web2_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                if not isinstance(web2_payload, dict):
-                    raise GatewayError("payload must be object")
-                response = gateway.execute_web2_guard_request(
-                    seed=seed,
-                    run_id=run_id,
-                    payload=web2_payload,
-                    account_id=session.account_id,
-                    wallet_address=account.wallet_address,
-                )
-                self._send_json(response)
-                return
-            if self.path == "/entertainment/step":
-                payload = self._parse_body()
-                seed = self._require_seed(payload)
-                run_id = self._require_run_id(payload)
-                step_payload = payload.get("payload")
-                if step_payload is None:
-                    step_payload = {k: v for k, v in payload.items() if k not in {"seed", "run_id"}}
-                result = execute_run(
-                    seed=seed,
-                    run_id=run_id,
-                    module="entertainment",
-                    action="state_step",
-                    payload=step_payload,
-                )
-                self._send_json(
-                    {
-                        "run_id": result.run_id,
-                        "status": "complete",
-                        "state_hash": result.state_hash,
-                        "receipt_hashes": result.receipt_hashes,
-                        "replay_ok": result.replay_ok,
-                    }
-                )
-                return
-            if self.path == "/evidence/v1/replay":
-                _ = self._require_auth()
-                payload = self._parse_body()
-                run_id_value = payload.get("run_id")
-                if not isinstance(run_id_value, str) or not run_id_value or isinstance(run_id_value, bool):
-                    raise GatewayError("run_id required")
-                run_id = run_id_value
-                backend_src = gateway._backend_src()
-                if str(backend_src) not in __import__("sys").path:
-                    __import__("sys").path.insert(0, str(backend_src))
-                from nyx_backend.evidence import EvidenceError, replay_verify_run
-
-                try:
-                    result = replay_verify_run(run_id, base_dir=_run_root())
-                except EvidenceError as exc:
-                    raise GatewayError(str(exc)) from exc
-                self._send_json(result)
+            room_match = _ROOM_MESSAGES_PATH.match(self.path)
+            if room_match is not None:
+                self._post_chat_room_message(room_match.group(1))
                 return
             self._send_text("not found", HTTPStatus.NOT_FOUND)
         except (GatewayApiError, GatewayError, portal.PortalError, StorageError) as exc:
@@ -1169,11 +1405,10 @@ class GatewayHandler(BaseHTTPRequestHandler):
             return
         if path == "/discovery/feed":
             try:
-                conn = create_connection(_db_path())
-                # Mix of rooms and listings
-                rooms = portal.list_rooms(conn, limit=5)
-                listings = gateway.marketplace_list_active_listings(conn, limit=5)
-                conn.close()
+                with self._connection() as conn:
+                    # Mix of rooms and listings
+                    rooms = portal.list_rooms(conn, limit=5)
+                    listings = gateway.marketplace_list_active_listings(conn, limit=5)
                 self._send_json(
                     {
                         "feed": [{"type": "room", "data": r} for r in rooms]
@@ -1190,7 +1425,7 @@ class GatewayHandler(BaseHTTPRequestHandler):
             self._send_json(_version_info())
             return
         if path == "/capabilities":
-            self._send_json(_capabilities())
+            self._send_json_body(_capabilities_json())
             return
         if path == "/web2/v1/allowlist":
             self._send_json({"allowlist": gateway.list_web2_allowlist()})
@@ -1217,9 +1452,8 @@ class GatewayHandler(BaseHTTPRequestHandler):
         if path == "/portal/v1/me":
             try:
                 session = self._require_auth()
-                conn = create_connection(_db_path())
-                account = portal.load_account(conn, session.account_id)
-                conn.close()
+                with self._connection() as conn:
+                    account = portal.load_account(conn, session.account_id)
                 if account is None:
                     raise GatewayError("account not found")
                 self._send_json(
@@ -1241,18 +1475,17 @@ class GatewayHandler(BaseHTTPRequestHandler):
                 account_id = (query.get("account_id") or [""])[0].strip()
                 if not account_id:
                     raise GatewayError("account_id required")
-                conn = create_connection(_db_path())
-                row = conn.execute(
-                    "SELECT a.account_id, a.handle, a.wallet_address, i.public_jwk "
-                    "FROM portal_accounts a "
-                    "LEFT JOIN e2ee_identities i ON i.account_id = a.account_id "
-                    "WHERE a.account_id = ?",
-                    (account_id,),
-                ).fetchone()
-                conn.close()
+                with self._connection() as conn:
+                    row = conn.execute(
+                        "SELECT a.account_id, a.handle, a.wallet_address, i.public_jwk "
+                        "FROM portal_accounts a "
+                        "LEFT JOIN e2ee_identities i ON i.account_id = a.account_id "
+                        "WHERE a.account_id = ?",
+                        (account_id,),
+                    ).fetchone()
                 if row is None:
                     raise GatewayError("account not found")
-                record = {col: row[col] for col in row.keys()}
+                record = dict(row)
                 public_jwk = record.get("public_jwk")
                 if isinstance(public_jwk, str) and public_jwk:
                     try:
@@ -1275,15 +1508,14 @@ class GatewayHandler(BaseHTTPRequestHandler):
                     offset = int(offset_raw)
                 except ValueError:
                     raise GatewayError("limit or offset invalid")
-                conn = create_connection(_db_path())
-                receipts = portal.list_account_activity(
-                    conn,
-                    session.account_id,
-                    account.wallet_address,
-                    limit=limit,
-                    offset=offset,
-                )
-                conn.close()
+                with self._connection() as conn:
+                    receipts = portal.list_account_activity(
+                        conn,
+                        session.account_id,
+                        account.wallet_address,
+                        limit=limit,
+                        offset=offset,
+                    )
                 self._send_json(
                     {
                         "account_id": session.account_id,
@@ -1366,8 +1598,7 @@ class GatewayHandler(BaseHTTPRequestHandler):
                 if limit < 1 or limit > 500:
                     raise GatewayError("limit out of bounds")
 
-                conn = create_connection(_db_path())
-                try:
+                with self._connection() as conn:
                     rows = conn.execute(
                         """
                         SELECT DISTINCT r.run_id, r.module, r.action, r.state_hash, r.receipt_hashes, r.replay_ok
@@ -1398,8 +1629,6 @@ class GatewayHandler(BaseHTTPRequestHandler):
                             limit,
                         ),
                     ).fetchall()
-                finally:
-                    conn.close()
 
                 if not rows:
                     raise GatewayError("no runs found for prefix")
@@ -1410,48 +1639,54 @@ class GatewayHandler(BaseHTTPRequestHandler):
                 from nyx_backend.evidence import EvidenceError, build_export_zip
 
                 manifest_runs = []
-                buffer = io.BytesIO()
-                with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as zip_file:
-                    for row in rows:
-                        run_id = str(row["run_id"])
-                        receipt_hashes_raw = row["receipt_hashes"]
-                        receipt_hashes = []
-                        if isinstance(receipt_hashes_raw, str) and receipt_hashes_raw:
-                            try:
-                                receipt_hashes = json.loads(receipt_hashes_raw)
-                            except Exception:
-                                receipt_hashes = []
-                        manifest_runs.append(
-                            {
-                                "run_id": run_id,
-                                "module": str(row["module"]),
-                                "action": str(row["action"]),
-                                "state_hash": str(row["state_hash"]),
-                                "receipt_hashes": receipt_hashes,
-                                "replay_ok": bool(row["replay_ok"]),
-                            }
-                        )
+                # Every export is built before the response starts, so a failing run still gets a 400.
+                exports = []
+                for row in rows:
+                    run_id = str(row["run_id"])
+                    receipt_hashes_raw = row["receipt_hashes"]
+                    receipt_hashes = []
+                    if isinstance(receipt_hashes_raw, str) and receipt_hashes_raw:
                         try:
-                            export_bytes = build_export_zip(run_id, base_dir=_run_root())
-                        except EvidenceError as exc:
-                            raise GatewayError(f"export failed for {run_id}: {exc}") from exc
-                        zip_file.writestr(f"runs/{run_id}.zip", export_bytes)
-
-                    manifest = {
-                        "kind": "nyx-proof-package",
-                        "version": 1,
-                        "account_id": session.account_id,
-                        "prefix": prefix,
-                        "runs": manifest_runs,
-                    }
-                    zip_file.writestr(
+                            receipt_hashes = json.loads(receipt_hashes_raw)
+                        except Exception:
+                            receipt_hashes = []
+                    manifest_runs.append(
+                        {
+                            "run_id": run_id,
+                            "module": str(row["module"]),
+                            "action": str(row["action"]),
+                            "state_hash": str(row["state_hash"]),
+                            "receipt_hashes": receipt_hashes,
+                            "replay_ok": bool(row["replay_ok"]),
+                        }
+                    )
+                    try:
+                        exports.append((f"runs/{run_id}.zip", build_export_zip(run_id, base_dir=_run_root())))
+                    except EvidenceError as exc:
+                        raise GatewayError(f"export failed for {run_id}: {exc}") from exc
+
+                manifest = {
+                    "kind": "nyx-proof-package",
+                    "version": 1,
+                    "account_id": session.account_id,
+                    "prefix": prefix,
+                    "runs": manifest_runs,
+                }
+                exports.append(
+                    (
                         "manifest.json",
                         json.dumps(manifest, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8"),
                     )
-
-                self._send_bytes(buffer.getvalue(), "application/zip")
+                )
             except (GatewayApiError, GatewayError, portal.PortalError, StorageError) as exc:
                 self._send_error(exc, HTTPStatus.BAD_REQUEST)
+                return
+            # Only the outer archive is streamed: the per-run exports above are held in memory until it is written.
+            writer = self._start_streamed_response("application/zip")
+            with zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_STORED) as zip_file:
+                for name, content in exports:
+                    zip_file.writestr(name, content)
+            writer.close()
             return
         if path == "/list":
             from nyx_backend.evidence import list_runs
@@ -1463,11 +1698,8 @@ class GatewayHandler(BaseHTTPRequestHandler):
         if path == "/wallet/v1/airdrop/tasks":
             try:
                 session, account = self._require_wallet_account()
-                conn = create_connection(_db_path())
-                try:
+                with self._connection() as conn:
                     tasks = gateway.list_airdrop_tasks_v1(conn, session.account_id, account.wallet_address)
-                finally:
-                    conn.close()
                 self._send_json(
                     {"account_id": session.account_id, "wallet_address": account.wallet_address, "tasks": tasks}
                 )
@@ -1484,13 +1716,12 @@ class GatewayHandler(BaseHTTPRequestHandler):
                         "address must match authenticated wallet_address",
                         http_status=HTTPStatus.FORBIDDEN,
                     )
-                conn = create_connection(_db_path())
-                assets = gateway.supported_assets()
-                balances = []
-                for asset in assets:
-                    asset_id = str(asset.get("asset_id", "NYXT"))
-                    balances.append({"asset_id": asset_id, "balance": get_wallet_balance(conn, address, asset_id)})
-                conn.close()
+                with self._connection() as conn:
+                    assets = gateway.supported_assets()
+                    balances = []
+                    for asset in assets:
+                        asset_id = str(asset.get("asset_id", "NYXT"))
+                        balances.append({"asset_id": asset_id, "balance": get_wallet_balance(conn, address, asset_id)})
                 self._send_json({"address": address, "assets": assets, "balances": balances})
             except (GatewayApiError, GatewayError, portal.PortalError, StorageError) as exc:
                 self._send_error(exc, HTTPStatus.BAD_REQUEST)
@@ -1516,27 +1747,26 @@ class GatewayHandler(BaseHTTPRequestHandler):
                     raise GatewayError("limit out of bounds")
                 if offset < 0:
                     raise GatewayError("offset out of bounds")
-                conn = create_connection(_db_path())
-                rows = conn.execute(
-                    "SELECT wt.transfer_id, wt.from_address, wt.to_address, wt.asset_id, wt.amount, wt.fee_total, "
-                    "wt.treasury_address, wt.run_id, r.state_hash, r.receipt_hashes, r.replay_ok "
-                    "FROM wallet_transfers wt "
-                    "LEFT JOIN receipts r ON r.run_id = wt.run_id "
-                    "WHERE wt.from_address = ? OR wt.to_address = ? "
-                    "ORDER BY wt.rowid DESC LIMIT ? OFFSET ?",
-                    (address, address, limit, offset),
-                ).fetchall()
-                transfers = []
-                for row in rows:
-                    record = {col: row[col] for col in row.keys()}
-                    raw_hashes = record.get("receipt_hashes") or "[]"
-                    try:
-                        record["receipt_hashes"] = json.loads(raw_hashes) if isinstance(raw_hashes, str) else []
-                    except Exception:
-                        record["receipt_hashes"] = []
-                    record["replay_ok"] = bool(record.get("replay_ok"))
-                    transfers.append(record)
-                conn.close()
+                with self._connection() as conn:
+                    rows = conn.execute(
+                        "SELECT wt.transfer_id, wt.from_address, wt.to_address, wt.asset_id, wt.amount, wt.fee_total, "
+                        "wt.treasury_address, wt.run_id, r.state_hash, r.receipt_hashes, r.replay_ok "
+                        "FROM wallet_transfers wt "
+                        "LEFT JOIN receipts r ON r.run_id = wt.run_id "
+                        "WHERE wt.from_address = ? OR wt.to_address = ? "
+                        "ORDER BY wt.rowid DESC LIMIT ? OFFSET ?",
+                        (address, address, limit, offset),
+                    ).fetchall()
+                    transfers = []
+                    for row in rows:
+                        record = dict(row)
+                        raw_hashes = record.get("receipt_hashes") or "[]"
+                        try:
+                            record["receipt_hashes"] = json.loads(raw_hashes) if isinstance(raw_hashes, str) else []
+                        except Exception:
+                            record["receipt_hashes"] = []
+                        record["replay_ok"] = bool(record.get("replay_ok"))
+                        transfers.append(record)
                 self._send_json({"address": address, "transfers": transfers, "limit": limit, "offset": offset})
             except (GatewayApiError, GatewayError, portal.PortalError, StorageError) as exc:
                 self._send_error(exc, HTTPStatus.BAD_REQUEST)
@@ -1563,42 +1793,41 @@ class GatewayHandler(BaseHTTPRequestHandler):
                     raise GatewayError("status invalid")
                 status_filter = None if status == "all" else status
 
-                conn = create_connection(_db_path())
-                clauses = ["o.owner_address = ?"]
-                params: list[object] = [account.wallet_address]
-                if side:
-                    clauses.append("o.side = ?")
-                    params.append(side)
-                if asset_in:
-                    clauses.append("o.asset_in = ?")
-                    params.append(asset_in)
-                if asset_out:
-                    clauses.append("o.asset_out = ?")
-                    params.append(asset_out)
-                if status_filter is not None:
-                    clauses.append("o.status = ?")
-                    params.append(status_filter)
-                where = " AND ".join(clauses)
-                rows = conn.execute(
-                    "SELECT o.order_id, o.owner_address, o.side, o.amount, o.price, o.asset_in, o.asset_out, o.status, o.run_id, "
-                    "r.state_hash, r.receipt_hashes, r.replay_ok "
-                    "FROM orders o "
-                    "LEFT JOIN receipts r ON r.run_id = o.run_id "
-                    f"WHERE {where} "
-                    "ORDER BY o.rowid DESC LIMIT ? OFFSET ?",
-                    (*params, limit, offset),
-                ).fetchall()
-                orders = []
-                for row in rows:
-                    record = {col: row[col] for col in row.keys()}
-                    raw_hashes = record.get("receipt_hashes") or "[]"
-                    try:
-                        record["receipt_hashes"] = json.loads(raw_hashes) if isinstance(raw_hashes, str) else []
-                    except Exception:
-                        record["receipt_hashes"] = []
-                    record["replay_ok"] = bool(record.get("replay_ok"))
-                    orders.append(record)
-                conn.close()
+                with self._connection() as conn:
+                    clauses = ["o.owner_address = ?"]
+                    params: list[object] = [account.wallet_address]
+                    if side:
+                        clauses.append("o.side = ?")
+                        params.append(side)
+                    if asset_in:
+                        clauses.append("o.asset_in = ?")
+                        params.append(asset_in)
+                    if asset_out:
+                        clauses.append("o.asset_out = ?")
+                        params.append(asset_out)
+                    if status_filter is not None:
+                        clauses.append("o.status = ?")
+                        params.append(status_filter)
+                    where = " AND ".join(clauses)
+                    rows = conn.execute(
+                        "SELECT o.order_id, o.owner_address, o.side, o.amount, o.price, o.asset_in, o.asset_out, o.status, o.run_id, "
+                        "r.state_hash, r.receipt_hashes, r.replay_ok "
+                        "FROM orders o "
+                        "LEFT JOIN receipts r ON r.run_id = o.run_id "
+                        f"WHERE {where} "
+                        "ORDER BY o.rowid DESC LIMIT ? OFFSET ?",
+                        (*params, limit, offset),
+                    ).fetchall()
+                    orders = []
+                    for row in rows:
+                        record = dict(row)
+                        raw_hashes = record.get("receipt_hashes") or "[]"
+                        try:
+                            record["receipt_hashes"] = json.loads(raw_hashes) if isinstance(raw_hashes, str) else []
+                        except Exception:
+                            record["receipt_hashes"] = []
+                        record["replay_ok"] = bool(record.get("replay_ok"))
+                        orders.append(record)
                 self._send_json(
                     {
                         "account_id": session.account_id,
@@ -1617,29 +1846,28 @@ class GatewayHandler(BaseHTTPRequestHandler):
                 session, account = self._require_wallet_account()
                 limit = int((query.get("limit") or ["50"])[0])
                 offset = int((query.get("offset") or ["0"])[0])
-                conn = create_connection(_db_path())
-                rows = conn.execute(
-                    "SELECT t.trade_id, t.order_id, t.amount, t.price, t.run_id, "
-                    "o.side, o.asset_in, o.asset_out, o.status, "
-                    "r.state_hash, r.receipt_hashes, r.replay_ok "
-                    "FROM trades t "
-                    "JOIN orders o ON o.order_id = t.order_id "
-                    "LEFT JOIN receipts r ON r.run_id = t.run_id "
-                    "WHERE o.owner_address = ? "
-                    "ORDER BY t.trade_id DESC LIMIT ? OFFSET ?",
-                    (account.wallet_address, limit, offset),
-                ).fetchall()
-                trades = []
-                for row in rows:
-                    record = {col: row[col] for col in row.keys()}
-                    raw_hashes = record.get("receipt_hashes") or "[]"
-                    try:
-                        record["receipt_hashes"] = json.loads(raw_hashes) if isinstance(raw_hashes, str) else []
-                    except Exception:
-                        record["receipt_hashes"] = []
-                    record["replay_ok"] = bool(record.get("replay_ok"))
-                    trades.append(record)
-                conn.close()
+                with self._connection() as conn:
+                    rows = conn.execute(
+                        "SELECT t.trade_id, t.order_id, t.amount, t.price, t.run_id, "
+                        "o.side, o.asset_in, o.asset_out, o.status, "
+                        "r.state_hash, r.receipt_hashes, r.replay_ok "
+                        "FROM trades t "
+                        "JOIN orders o ON o.order_id = t.order_id "
+                        "LEFT JOIN receipts r ON r.run_id = t.run_id "
+                        "WHERE o.owner_address = ? "
+                        "ORDER BY t.trade_id DESC LIMIT ? OFFSET ?",
+                        (account.wallet_address, limit, offset),
+                    ).fetchall()
+                    trades = []
+                    for row in rows:
+                        record = dict(row)
+                        raw_hashes = record.get("receipt_hashes") or "[]"
+                        try:
+                            record["receipt_hashes"] = json.loads(raw_hashes) if isinstance(raw_hashes, str) else []
+                        except Exception:
+                            record["receipt_hashes"] = []
+                        record["replay_ok"] = bool(record.get("replay_ok"))
+                        trades.append(record)
                 self._send_json(
                     {
                         "account_id": session.account_id,
@@ -1654,47 +1882,48 @@ class GatewayHandler(BaseHTTPRequestHandler):
             return
         if path == "/exchange/orders":
             try:
-                conn = create_connection(_db_path())
-                side = (query.get("side") or [""])[0] or None
-                asset_in = (query.get("asset_in") or [""])[0] or None
-                asset_out = (query.get("asset_out") or [""])[0] or None
-                status = (query.get("status") or ["open"])[0] or "open"
-                limit = int((query.get("limit") or ["100"])[0])
-                offset = int((query.get("offset") or ["0"])[0])
-                status_filter = None if status == "all" else status
-                orders = list_orders(
-                    conn,
-                    side=side,
-                    asset_in=asset_in,
-                    asset_out=asset_out,
-                    status=status_filter,
-                    limit=limit,
-                    offset=offset,
-                )
-                conn.close()
+                with self._connection() as conn:
+                    side = (query.get("side") or [""])[0] or None
+                    asset_in = (query.get("asset_in") or [""])[0] or None
+                    asset_out = (query.get("asset_out") or [""])[0] or None
+                    status = (query.get("status") or ["open"])[0] or "open"
+                    limit = int((query.get("limit") or ["100"])[0])
+                    offset = int((query.get("offset") or ["0"])[0])
+                    status_filter = None if status == "all" else status
+                    orders = list_orders(
+                        conn,
+                        side=side,
+                        asset_in=asset_in,
+                        asset_out=asset_out,
+                        status=status_filter,
+                        limit=limit,
+                        offset=offset,
+                    )
                 self._send_json({"orders": orders, "limit": limit, "offset": offset})
             except Exception as exc:
                 self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
             return
         if path == "/exchange/trades":
             try:
-                conn = create_connection(_db_path())
-                limit = int((query.get("limit") or ["100"])[0])
-                offset = int((query.get("offset") or ["0"])[0])
-                trades = list_trades(conn, limit=limit, offset=offset)
-                conn.close()
+                with self._connection() as conn:
+                    limit = int((query.get("limit") or ["100"])[0])
+                    offset = int((query.get("offset") or ["0"])[0])
+                    trades = list_trades(conn, limit=limit, offset=offset)
                 self._send_json({"trades": trades, "limit": limit, "offset": offset})
             except Exception as exc:
                 self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
             return
         if path == "/exchange/orderbook":
             try:
-                conn = create_connection(_db_path())
-                limit = int((query.get("limit") or ["50"])[0])
-                offset = int((query.get("offset") or ["0"])[0])
-                buys = list_orders(conn, side="BUY", order_by="price DESC, order_id ASC", limit=limit, offset=offset)
-                sells = list_orders(conn, side="SELL", order_by="price ASC, order_id ASC", limit=limit, offset=offset)
-                conn.close()
+                with self._connection() as conn:
+                    limit = int((query.get("limit") or ["50"])[0])
+                    offset = int((query.get("offset") or ["0"])[0])
+                    buys = list_orders(
+                        conn, side="BUY", order_by="price DESC, order_id ASC", limit=limit, offset=offset
+                    )
+                    sells = list_orders(
+                        conn, side="SELL", order_by="price ASC, order_id ASC", limit=limit, offset=offset
+                    )
                 self._send_json({"buy": buys, "sell": sells, "limit": limit, "offset": offset})
             except Exception as exc:
                 self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
@@ -1717,26 +1946,25 @@ class GatewayHandler(BaseHTTPRequestHandler):
                     raise GatewayError("limit out of bounds")
                 if offset < 0:
                     raise GatewayError("offset out of bounds")
-                conn = create_connection(_db_path())
-                rows = conn.execute(
-                    "SELECT m.message_id, m.channel, m.sender_account_id, m.body, m.run_id, r.state_hash, r.receipt_hashes, r.replay_ok "
-                    "FROM messages m "
-                    "LEFT JOIN receipts r ON r.run_id = m.run_id "
-                    "WHERE m.channel = ? "
-                    "ORDER BY m.rowid DESC LIMIT ? OFFSET ?",
-                    (channel, limit, offset),
-                ).fetchall()
-                messages = []
-                for row in rows:
-                    record = {col: row[col] for col in row.keys()}
-                    raw_hashes = record.get("receipt_hashes") or "[]"
-                    try:
-                        record["receipt_hashes"] = json.loads(raw_hashes) if isinstance(raw_hashes, str) else []
-                    except Exception:
-                        record["receipt_hashes"] = []
-                    record["replay_ok"] = bool(record.get("replay_ok"))
-                    messages.append(record)
-                conn.close()
+                with self._connection() as conn:
+                    rows = conn.execute(
+                        "SELECT m.message_id, m.channel, m.sender_account_id, m.body, m.run_id, r.state_hash, r.receipt_hashes, r.replay_ok "
+                        "FROM messages m "
+                        "LEFT JOIN receipts r ON r.run_id = m.run_id "
+                        "WHERE m.channel = ? "
+                        "ORDER BY m.rowid DESC LIMIT ? OFFSET ?",
+                        (channel, limit, offset),
+                    ).fetchall()
+                    messages = []
+                    for row in rows:
+                        record = dict(row)
+                        raw_hashes = record.get("receipt_hashes") or "[]"
+                        try:
+                            record["receipt_hashes"] = json.loads(raw_hashes) if isinstance(raw_hashes, str) else []
+                        except Exception:
+                            record["receipt_hashes"] = []
+                        record["replay_ok"] = bool(record.get("replay_ok"))
+                        messages.append(record)
                 self._send_json({"channel": channel, "messages": messages, "limit": limit, "offset": offset})
             except (GatewayApiError, GatewayError, portal.PortalError, StorageError) as exc:
                 self._send_error(exc, HTTPStatus.BAD_REQUEST)
@@ -1750,19 +1978,18 @@ class GatewayHandler(BaseHTTPRequestHandler):
                     raise GatewayError("limit out of bounds")
                 if offset < 0:
                     raise GatewayError("offset out of bounds")
-                conn = create_connection(_db_path())
-                rows = conn.execute(
-                    "SELECT c.channel, c.max_rowid, m.message_id, m.sender_account_id, m.run_id "
-                    "FROM (SELECT channel, MAX(rowid) AS max_rowid FROM messages GROUP BY channel) c "
-                    "JOIN messages m ON m.rowid = c.max_rowid "
-                    "WHERE c.channel = 'lobby' OR c.channel LIKE ? "
-                    "ORDER BY c.max_rowid DESC LIMIT ? OFFSET ?",
-                    (f"%{session.account_id}%", limit, offset),
-                ).fetchall()
-                conversations = []
-                for row in rows:
-                    conversations.append({col: row[col] for col in row.keys()})
-                conn.close()
+                with self._connection() as conn:
+                    rows = conn.execute(
+                        "SELECT c.channel, c.max_rowid, m.message_id, m.sender_account_id, m.run_id "
+                        "FROM (SELECT channel, MAX(rowid) AS max_rowid FROM messages GROUP BY channel) c "
+                        "JOIN messages m ON m.rowid = c.max_rowid "
+                        "WHERE c.channel = 'lobby' OR c.channel LIKE ? "
+                        "ORDER BY c.max_rowid DESC LIMIT ? OFFSET ?",
+                        (f"%{session.account_id}%", limit, offset),
+                    ).fetchall()
+                    conversations = []
+                    for row in rows:
+                        conversations.append(dict(row))
                 self._send_json(
                     {"account_id": session.account_id, "conversations": conversations, "limit": limit, "offset": offset}
                 )
@@ -1911,9 +2138,8 @@ class GatewayHandler(BaseHTTPRequestHandler):
                 _ = self._require_auth()
                 limit = int((query.get("limit") or ["50"])[0])
                 offset = int((query.get("offset") or ["0"])[0])
-                conn = create_connection(_db_path())
-                rooms = portal.list_rooms(conn, limit=limit, offset=offset)
-                conn.close()
+                with self._connection() as conn:
+                    rooms = portal.list_rooms(conn, limit=limit, offset=offset)
                 self._send_json({"rooms": rooms, "limit": limit, "offset": offset})
             except GatewayError as exc:
                 self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
@@ -1927,28 +2153,27 @@ class GatewayHandler(BaseHTTPRequestHandler):
                 limit = int((query.get("limit") or ["20"])[0])
                 if limit < 1 or limit > 50:
                     raise GatewayError("limit out of bounds")
-                conn = create_connection(_db_path())
-                rows = conn.execute(
-                    "SELECT a.account_id, a.handle, a.wallet_address, i.public_jwk "
-                    "FROM portal_accounts a "
-                    "LEFT JOIN e2ee_identities i ON i.account_id = a.account_id "
-                    "WHERE a.handle LIKE ? "
-                    "ORDER BY a.handle ASC LIMIT ?",
-                    (f"{q}%", limit),
-                ).fetchall()
-                accounts = []
-                for row in rows:
-                    record = {col: row[col] for col in row.keys()}
-                    public_jwk = record.get("public_jwk")
-                    if isinstance(public_jwk, str) and public_jwk:
-                        try:
-                            record["public_jwk"] = json.loads(public_jwk)
-                        except Exception:
+                with self._connection() as conn:
+                    rows = conn.execute(
+                        "SELECT a.account_id, a.handle, a.wallet_address, i.public_jwk "
+                        "FROM portal_accounts a "
+                        "LEFT JOIN e2ee_identities i ON i.account_id = a.account_id "
+                        "WHERE a.handle LIKE ? "
+                        "ORDER BY a.handle ASC LIMIT ?",
+                        (f"{q}%", limit),
+                    ).fetchall()
+                    accounts = []
+                    for row in rows:
+                        record = dict(row)
+                        public_jwk = record.get("public_jwk")
+                        if isinstance(public_jwk, str) and public_jwk:
+                            try:
+                                record["public_jwk"] = json.loads(public_jwk)
+                            except Exception:
+                                record["public_jwk"] = None
+                        else:
                             record["public_jwk"] = None
-                    else:
-                        record["public_jwk"] = None
-                    accounts.append(record)
-                conn.close()
+                        accounts.append(record)
                 self._send_json({"accounts": accounts, "q": q, "limit": limit})
             except (GatewayApiError, GatewayError, portal.PortalError, StorageError) as exc:
                 self._send_error(exc, HTTPStatus.BAD_REQUEST)
@@ -1957,9 +2182,8 @@ class GatewayHandler(BaseHTTPRequestHandler):
             try:
                 _ = self._require_auth()
                 q = (query.get("q") or [""])[0]
-                conn = create_connection(_db_path())
-                rooms = portal.search_rooms(conn, q)
-                conn.close()
+                with self._connection() as conn:
+                    rooms = portal.search_rooms(conn, q)
                 self._send_json({"rooms": rooms})
             except Exception as exc:
                 self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
@@ -1976,9 +2200,8 @@ class GatewayHandler(BaseHTTPRequestHandler):
                 limit_raw_value = (query.get("limit") or [""])[0] or None
                 after_value = int(after_raw_value) if after_raw_value else None
                 limit_value = int(limit_raw_value) if limit_raw_value else 50
-                conn = create_connection(_db_path())
-                messages = portal.list_messages(conn, room_id=room_id, after=after_value, limit=limit_value)
-                conn.close()
+                with self._connection() as conn:
+                    messages = portal.list_messages(conn, room_id=room_id, after=after_value, limit=limit_value)
                 self._send_json({"messages": messages})
             except Exception as exc:
                 self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
@@ -1987,9 +2210,17 @@ class GatewayHandler(BaseHTTPRequestHandler):
             try:
                 limit = int((query.get("limit") or ["50"])[0])
                 offset = int((query.get("offset") or ["0"])[0])
-                conn = create_connection(_db_path())
-                listings = gateway.marketplace_list_active_listings(conn, limit=limit, offset=offset)
-                conn.close()
+                wants_columnar = self._wants_columnar()
+                with self._connection() as conn:
+                    if wants_columnar:
+                        columnar = gateway.marketplace_list_active_listings_columnar(conn, limit=limit, offset=offset)
+                    else:
+                        listings = gateway.marketplace_list_active_listings(conn, limit=limit, offset=offset)
+                if wants_columnar:
+                    self._send_json(
+                        {"listings": columnar, "limit": limit, "offset": offset}, content_type=_COLUMNAR_JSON
+                    )
+                    return
                 self._send_json({"listings": listings, "limit": limit, "offset": offset})
             except (GatewayApiError, GatewayError, portal.PortalError, StorageError) as exc:
                 self._send_error(exc, HTTPStatus.BAD_REQUEST)
@@ -1999,9 +2230,18 @@ class GatewayHandler(BaseHTTPRequestHandler):
                 q = (query.get("q") or [""])[0]
                 limit = int((query.get("limit") or ["50"])[0])
                 offset = int((query.get("offset") or ["0"])[0])
-                conn = create_connection(_db_path())
-                listings = gateway.marketplace_search_listings(conn, q, limit=limit, offset=offset)
-                conn.close()
+                wants_columnar = self._wants_columnar()
+                with self._connection() as conn:
+                    if wants_columnar:
+                        columnar = gateway.marketplace_search_listings_columnar(conn, q, limit=limit, offset=offset)
+                    else:
+                        listings = gateway.marketplace_search_listings(conn, q, limit=limit, offset=offset)
+                if wants_columnar:
+                    self._send_json(
+                        {"listings": columnar, "limit": limit, "offset": offset, "q": q},
+                        content_type=_COLUMNAR_JSON,
+                    )
+                    return
                 self._send_json({"listings": listings, "limit": limit, "offset": offset, "q": q})
             except (GatewayApiError, GatewayError, portal.PortalError, StorageError) as exc:
                 self._send_error(exc, HTTPStatus.BAD_REQUEST)
@@ -2015,29 +2255,28 @@ class GatewayHandler(BaseHTTPRequestHandler):
                     raise GatewayError("limit out of bounds")
                 if offset < 0:
                     raise GatewayError("offset out of bounds")
-                conn = create_connection(_db_path())
-                rows = conn.execute(
-                    "SELECT p.purchase_id, p.listing_id, p.buyer_id, p.qty, p.run_id, "
-                    "l.publisher_id, l.sku, l.title, l.price, l.status, "
-                    "r.state_hash, r.receipt_hashes, r.replay_ok "
-                    "FROM purchases p "
-                    "LEFT JOIN listings l ON l.listing_id = p.listing_id "
-                    "LEFT JOIN receipts r ON r.run_id = p.run_id "
-                    "WHERE p.buyer_id = ? "
-                    "ORDER BY p.rowid DESC LIMIT ? OFFSET ?",
-                    (account.wallet_address, limit, offset),
-                ).fetchall()
-                purchases = []
-                for row in rows:
-                    record = {col: row[col] for col in row.keys()}
-                    raw_hashes = record.get("receipt_hashes") or "[]"
-                    try:
-                        record["receipt_hashes"] = json.loads(raw_hashes) if isinstance(raw_hashes, str) else []
-                    except Exception:
-                        record["receipt_hashes"] = []
-                    record["replay_ok"] = bool(record.get("replay_ok"))
-                    purchases.append(record)
-                conn.close()
+                with self._connection() as conn:
+                    rows = conn.execute(
+                        "SELECT p.purchase_id, p.listing_id, p.buyer_id, p.qty, p.run_id, "
+                        "l.publisher_id, l.sku, l.title, l.price, l.status, "
+                        "r.state_hash, r.receipt_hashes, r.replay_ok "
+                        "FROM purchases p "
+                        "LEFT JOIN listings l ON l.listing_id = p.listing_id "
+                        "LEFT JOIN receipts r ON r.run_id = p.run_id "
+                        "WHERE p.buyer_id = ? "
+                        "ORDER BY p.rowid DESC LIMIT ? OFFSET ?",
+                        (account.wallet_address, limit, offset),
+                    ).fetchall()
+                    purchases = []
+                    for row in rows:
+                        record = dict(row)
+                        raw_hashes = record.get("receipt_hashes") or "[]"
+                        try:
+                            record["receipt_hashes"] = json.loads(raw_hashes) if isinstance(raw_hashes, str) else []
+                        except Exception:
+                            record["receipt_hashes"] = []
+                        record["replay_ok"] = bool(record.get("replay_ok"))
+                        purchases.append(record)
                 self._send_json(
                     {
                         "account_id": session.account_id,
@@ -2052,36 +2291,33 @@ class GatewayHandler(BaseHTTPRequestHandler):
             return
         if path == "/marketplace/purchases":
             try:
-                conn = create_connection(_db_path())
-                listing_id = (query.get("listing_id") or [""])[0] or None
-                limit = int((query.get("limit") or ["100"])[0])
-                offset = int((query.get("offset") or ["0"])[0])
-                purchases = list_purchases(conn, listing_id=listing_id, limit=limit, offset=offset)
-                conn.close()
+                with self._connection() as conn:
+                    listing_id = (query.get("listing_id") or [""])[0] or None
+                    limit = int((query.get("limit") or ["100"])[0])
+                    offset = int((query.get("offset") or ["0"])[0])
+                    purchases = list_purchases(conn, listing_id=listing_id, limit=limit, offset=offset)
                 self._send_json({"purchases": purchases, "limit": limit, "offset": offset})
             except Exception as exc:
                 self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
             return
         if path == "/entertainment/items":
             try:
-                conn = create_connection(_db_path())
-                gateway._ensure_entertainment_items(conn)
-                limit = int((query.get("limit") or ["100"])[0])
-                offset = int((query.get("offset") or ["0"])[0])
-                items = list_entertainment_items(conn, limit=limit, offset=offset)
-                conn.close()
+                with self._connection() as conn:
+                    gateway._ensure_entertainment_items(conn)
+                    limit = int((query.get("limit") or ["100"])[0])
+                    offset = int((query.get("offset") or ["0"])[0])
+                    items = list_entertainment_items(conn, limit=limit, offset=offset)
                 self._send_json({"items": items, "limit": limit, "offset": offset})
             except Exception as exc:
                 self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
             return
         if path == "/entertainment/events":
             try:
-                conn = create_connection(_db_path())
-                item_id = (query.get("item_id") or [""])[0] or None
-                limit = int((query.get("limit") or ["100"])[0])
-                offset = int((query.get("offset") or ["0"])[0])
-                events = list_entertainment_events(conn, item_id=item_id, limit=limit, offset=offset)
-                conn.close()
+                with self._connection() as conn:
+                    item_id = (query.get("item_id") or [""])[0] or None
+                    limit = int((query.get("limit") or ["100"])[0])
+                    offset = int((query.get("offset") or ["0"])[0])
+                    events = list_entertainment_events(conn, item_id=item_id, limit=limit, offset=offset)
                 self._send_json({"events": events, "limit": limit, "offset": offset})
             except Exception as exc:
                 self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
@@ -2093,6 +2329,7 @@ class GatewayServer(ThreadingHTTPServer):
     rate_limiter: RequestLimiter
     account_limiter: RequestLimiter
     risk_engine: risk.RiskEngine
+    connection_pool: ConnectionPool
 
 
 def run_server(host: str = "0.0.0.0", port: int = 8091) -> None:
@@ -2101,6 +2338,7 @@ def run_server(host: str = "0.0.0.0", port: int = 8091) -> None:
     server.rate_limiter = RequestLimiter(_RATE_LIMIT, _RATE_WINDOW_SECONDS)
     server.account_limiter = RequestLimiter(_ACCOUNT_RATE_LIMIT, _RATE_WINDOW_SECONDS)
     server.risk_engine = risk.RiskEngine.from_settings()
+    server.connection_pool = ConnectionPool()
     server.serve_forever()
 
 
@@ -3,9 +3,12 @@ from __future__ import annotations
 import json
 import re
 import sqlite3
+import threading
 import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable, Iterator
 
 from nyx_backend_gateway import metrics
 from nyx_backend_gateway.identifiers import wallet_address as derive_wallet_address
@@ -16,7 +19,23 @@ class StorageError(ValueError):
     pass
 
 
+CHAT_GENESIS_HEAD = "0" * 64
+
+# Per-connection prepared statement LRU; the default of 128 is smaller than the gateway's distinct SQL texts.
+_STATEMENT_CACHE_SIZE = 256
+
+
 class InstrumentedConnection(sqlite3.Connection):
+    db_path: Path | None = None
+    listings_fts = False
+    _defer_commit = False
+
+    def commit(self):
+        # Inside transaction() the storage helpers' own commits are folded into the outer one.
+        if self._defer_commit:
+            return
+        super().commit()
+
     def execute(self, sql, parameters=()):
         start = time.perf_counter()
         try:
@@ -39,15 +58,93 @@ class InstrumentedConnection(sqlite3.Connection):
             metrics.record_db_query("SCRIPT", time.perf_counter() - start)
 
 
-def create_connection(db_path: Path) -> sqlite3.Connection:
+def create_connection(db_path: Path, *, check_same_thread: bool = True) -> sqlite3.Connection:
     if not isinstance(db_path, Path):
         raise StorageError("db_path must be Path")
-    conn = sqlite3.connect(str(db_path), factory=InstrumentedConnection)
+    conn = sqlite3.connect(
+        str(db_path),
+        factory=InstrumentedConnection,
+        cached_statements=_STATEMENT_CACHE_SIZE,
+        check_same_thread=check_same_thread,
+    )
+    conn.db_path = db_path
     conn.row_factory = sqlite3.Row
-    apply_migrations(conn)
+    conn.listings_fts = apply_migrations(conn)
     return conn
 
 
+class ConnectionPool:
+    # Connections are handed to one thread at a time, so they are opened without the same-thread check.
+    def __init__(self, max_idle: int = 8) -> None:
+        self._max_idle = max_idle
+        self._idle: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self, db_path: Path) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire(db_path)
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def _acquire(self, db_path: Path) -> sqlite3.Connection:
+        stale: list[sqlite3.Connection] = []
+        conn = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if getattr(candidate, "db_path", None) == db_path:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close()
+        if conn is None:
+            conn = create_connection(db_path, check_same_thread=False)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._lock:
+            if len(self._idle) < self._max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    if not isinstance(conn, InstrumentedConnection):
+        raise StorageError("transaction requires an instrumented connection")
+    if conn._defer_commit:
+        yield conn
+        return
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    conn._defer_commit = True
+    try:
+        yield conn
+    except BaseException:
+        conn._defer_commit = False
+        conn.rollback()
+        raise
+    conn._defer_commit = False
+    conn.commit()
+
+
 def _validate_text(value: object, name: str, pattern: str = r"[A-Za-z0-9_./-]{1,128}") -> str:
     if not isinstance(value, str) or not value or isinstance(value, bool):
         raise StorageError(f"{name} required")
@@ -362,7 +459,7 @@ def load_portal_account(conn: sqlite3.Connection, account_id: str) -> PortalAcco
     ).fetchone()
     if row is None:
         return None
-    record = {col: row[col] for col in row.keys()}
+    record = dict(row)
     if not record.get("wallet_address"):
         record["wallet_address"] = derive_wallet_address(record["account_id"])
         conn.execute(
@@ -382,7 +479,7 @@ def load_portal_account_by_handle(conn: sqlite3.Connection, handle: str) -> Port
     ).fetchone()
     if row is None:
         return None
-    record = {col: row[col] for col in row.keys()}
+    record = dict(row)
     if not record.get("wallet_address"):
         record["wallet_address"] = derive_wallet_address(record["account_id"])
         conn.execute(
@@ -414,7 +511,7 @@ def consume_portal_challenge(conn: sqlite3.Connection, account_id: str, nonce: s
     ).fetchone()
     if row is None:
         return None
-    challenge = PortalChallenge(**{col: row[col] for col in row.keys()})
+    challenge = PortalChallenge(**dict(row))
     if challenge.used:
         return challenge
     conn.execute(
@@ -444,7 +541,7 @@ def load_portal_session(conn: sqlite3.Connection, token: str) -> PortalSession |
     ).fetchone()
     if row is None:
         return None
-    return PortalSession(**{col: row[col] for col in row.keys()})
+    return PortalSession(**dict(row))
 
 
 def delete_portal_session(conn: sqlite3.Connection, token: str) -> None:
@@ -469,10 +566,10 @@ def list_chat_rooms(conn: sqlite3.Connection) -> list[dict[str, object]]:
     rows = conn.execute(
         "SELECT room_id, name, created_at, is_public FROM chat_rooms ORDER BY created_at ASC, room_id ASC"
     ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return [dict(row) for row in rows]
 
 
-def insert_chat_message(conn: sqlite3.Connection, message: ChatMessage) -> None:
+def _chat_message_params(message: ChatMessage) -> tuple[str, str, str, str, int, str, str, str, int]:
     message_id = _validate_text(message.message_id, "message_id", r"[A-Za-z0-9_-]{1,64}")
     room_id = _validate_text(message.room_id, "room_id", r"[A-Za-z0-9_-]{1,64}")
     sender = _validate_text(message.sender_account_id, "sender_account_id", r"[A-Za-z0-9_-]{1,64}")
@@ -482,14 +579,50 @@ def insert_chat_message(conn: sqlite3.Connection, message: ChatMessage) -> None:
     msg_digest = _validate_text(message.msg_digest, "msg_digest", r"[A-Fa-f0-9]{16,128}")
     chain_head = _validate_text(message.chain_head, "chain_head", r"[A-Fa-f0-9]{16,128}")
     created_at = _validate_int(message.created_at, "created_at", 1)
-    conn.execute(
+    return (message_id, room_id, sender, body, seq, prev_digest, msg_digest, chain_head, created_at)
+
+
+def insert_chat_message(conn: sqlite3.Connection, message: ChatMessage) -> None:
+    insert_chat_messages(conn, [message])
+
+
+def insert_chat_messages(conn: sqlite3.Connection, messages: Iterable[ChatMessage]) -> None:
+    rows = [_chat_message_params(message) for message in messages]
+    if not rows:
+        return
+    conn.executemany(
         "INSERT OR REPLACE INTO chat_messages (message_id, room_id, sender_account_id, body, seq, prev_digest, msg_digest, "
         "chain_head, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (message_id, room_id, sender, body, seq, prev_digest, msg_digest, chain_head, created_at),
+        rows,
+    )
+    heads: dict[str, tuple[int, str]] = {}
+    for row in rows:
+        head = heads.get(row[1])
+        if head is None or row[4] >= head[0]:
+            heads[row[1]] = (row[4], row[7])
+    conn.executemany(
+        "INSERT INTO chat_room_state (room_id, last_seq, last_chain_head) VALUES (?, ?, ?) "
+        "ON CONFLICT (room_id) DO UPDATE SET last_seq = excluded.last_seq, last_chain_head = excluded.last_chain_head "
+        "WHERE excluded.last_seq >= last_seq",
+        [(room_id, seq, chain_head) for room_id, (seq, chain_head) in heads.items()],
     )
     conn.commit()
 
 
+def reserve_chat_seq(conn: sqlite3.Connection, room_id: str, count: int = 1) -> tuple[int, str]:
+    rid = _validate_text(room_id, "room_id", r"[A-Za-z0-9_-]{1,64}")
+    total = _validate_int(count, "count", 1)
+    # Returns the first of `count` reserved seqs and the head it chains from; insert_chat_messages then records the
+    # new head.
+    rows = conn.execute(
+        "INSERT INTO chat_room_state (room_id, last_seq, last_chain_head) VALUES (?, ?, ?) "
+        "ON CONFLICT (room_id) DO UPDATE SET last_seq = last_seq + excluded.last_seq "
+        "RETURNING last_seq, last_chain_head",
+        (rid, total, CHAT_GENESIS_HEAD),
+    ).fetchall()
+    return int(rows[0][0]) - total + 1, str(rows[0][1])
+
+
 def list_chat_messages(
     conn: sqlite3.Connection, room_id: str, after: int | None, limit: int
 ) -> list[dict[str, object]]:
@@ -507,7 +640,7 @@ def list_chat_messages(
         f"{clause} ORDER BY seq ASC, message_id ASC LIMIT ?",
         tuple(params),
     ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return [dict(row) for row in rows]
 
 
 def list_receipts(conn: sqlite3.Connection, limit: int = 50, offset: int = 0) -> list[dict[str, object]]:
@@ -520,7 +653,7 @@ def list_receipts(conn: sqlite3.Connection, limit: int = 50, offset: int = 0) ->
     ).fetchall()
     results = []
     for row in rows:
-        record = {col: row[col] for col in row.keys()}
+        record = dict(row)
         raw_hashes = record.get("receipt_hashes", "[]")
         try:
             record["receipt_hashes"] = json.loads(raw_hashes)
@@ -605,7 +738,7 @@ def list_orders(
         f"SELECT * FROM orders {where} ORDER BY {order_by} LIMIT ? OFFSET ?",
         (*params, lim, off),
     ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return [dict(row) for row in rows]
 
 
 def insert_trade(conn: sqlite3.Connection, trade: Trade, *, commit: bool = True) -> None:
@@ -626,7 +759,7 @@ def list_trades(conn: sqlite3.Connection, limit: int = 100, offset: int = 0) ->
     lim = _validate_int(limit, "limit", 1, 1000)
     off = _validate_int(offset, "offset", 0)
     rows = conn.execute("SELECT * FROM trades ORDER BY trade_id ASC LIMIT ? OFFSET ?", (lim, off)).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return [dict(row) for row in rows]
 
 
 def insert_message_event(conn: sqlite3.Connection, message: MessageEvent) -> None:
@@ -660,7 +793,7 @@ def list_messages(
         f"SELECT * FROM messages {where} ORDER BY message_id ASC LIMIT ? OFFSET ?",
         (*params, lim, off),
     ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return [dict(row) for row in rows]
 
 
 def insert_listing(conn: sqlite3.Connection, listing: Listing) -> None:
@@ -674,22 +807,54 @@ def insert_listing(conn: sqlite3.Connection, listing: Listing) -> None:
     price = _validate_int(listing.price, "price", 1)
     status = _validate_text(listing.status, "status", r"(active|sold)")
     run_id = _validate_text(listing.run_id, "run_id")
+    # Upsert rather than REPLACE: REPLACE deletes the old row without firing the listings_fts delete trigger.
     conn.execute(
-        "INSERT OR REPLACE INTO listings (listing_id, publisher_id, sku, title, price, status, run_id) "
-        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        "INSERT INTO listings (listing_id, publisher_id, sku, title, price, status, run_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (listing_id) DO UPDATE SET publisher_id = excluded.publisher_id, sku = excluded.sku, "
+        "title = excluded.title, price = excluded.price, status = excluded.status, run_id = excluded.run_id",
         (listing_id, publisher_id, sku, listing.title, price, status, run_id),
     )
     conn.commit()
 
 
-def list_listings(conn: sqlite3.Connection, limit: int = 100, offset: int = 0) -> list[dict[str, object]]:
+LISTING_COLUMNS = ("listing_id", "publisher_id", "sku", "title", "price", "status", "run_id")
+_LISTING_SELECT = ", ".join(LISTING_COLUMNS)
+
+
+def listing_select_columns(fields: Iterable[str] | None = None) -> str:
+    if fields is None:
+        return _LISTING_SELECT
+    selected = list(fields)
+    if not selected or any(field not in LISTING_COLUMNS for field in selected):
+        raise StorageError("fields not allowed")
+    return ", ".join(selected)
+
+
+def list_listings(
+    conn: sqlite3.Connection,
+    limit: int = 100,
+    offset: int = 0,
+    fields: Iterable[str] | None = None,
+) -> list[dict[str, object]]:
+    lim = _validate_int(limit, "limit", 1, 1000)
+    off = _validate_int(offset, "offset", 0)
+    columns = listing_select_columns(fields)
+    rows = conn.execute(
+        f"SELECT {columns} FROM listings WHERE status = 'active' ORDER BY listing_id ASC LIMIT ? OFFSET ?",
+        (lim, off),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def list_listings_columnar(conn: sqlite3.Connection, limit: int = 100, offset: int = 0) -> dict[str, list]:
     lim = _validate_int(limit, "limit", 1, 1000)
     off = _validate_int(offset, "offset", 0)
     rows = conn.execute(
-        "SELECT * FROM listings WHERE status = 'active' ORDER BY listing_id ASC LIMIT ? OFFSET ?",
+        f"SELECT {_LISTING_SELECT} FROM listings WHERE status = 'active' ORDER BY listing_id ASC LIMIT ? OFFSET ?",
         (lim, off),
     ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return {"columns": list(LISTING_COLUMNS), "rows": [list(row) for row in rows]}
 
 
 def insert_purchase(conn: sqlite3.Connection, purchase: Purchase) -> None:
@@ -720,7 +885,7 @@ def list_purchases(
         f"SELECT * FROM purchases {where} ORDER BY purchase_id ASC LIMIT ? OFFSET ?",
         (*params, lim, off),
     ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return [dict(row) for row in rows]
 
 
 def insert_entertainment_item(conn: sqlite3.Connection, item: EntertainmentItem) -> None:
@@ -748,7 +913,7 @@ def list_entertainment_items(conn: sqlite3.Connection, limit: int = 100, offset:
         "SELECT * FROM entertainment_items ORDER BY item_id ASC LIMIT ? OFFSET ?",
         (lim, off),
     ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return [dict(row) for row in rows]
 
 
 def insert_entertainment_event(conn: sqlite3.Connection, event: EntertainmentEvent) -> None:
@@ -782,7 +947,7 @@ def list_entertainment_events(
         f"SELECT * FROM entertainment_events {where} ORDER BY event_id ASC LIMIT ? OFFSET ?",
         (*params, lim, off),
     ).fetchall()
-    return [{col: row[col] for col in row.keys()} for row in rows]
+    return [dict(row) for row in rows]
 
 
 def insert_receipt(conn: sqlite3.Connection, receipt: Receipt) -> None:
@@ -1089,7 +1254,7 @@ def list_web2_guard_requests(
     ).fetchall()
     output: list[dict[str, object]] = []
     for row in rows:
-        record = {col: row[col] for col in row.keys()}
+        record = dict(row)
         raw_headers = record.get("header_names") or "[]"
         try:
             record["header_names"] = json.loads(raw_headers)
@@ -1125,4 +1290,4 @@ def load_by_id(conn: sqlite3.Connection, table: str, key: str, value: str) -> di
     ).fetchone()
     if row is None:
         return None
-    return {col: row[col] for col in row.keys()}
+    return dict(row)
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import _bootstrap  # noqa: F401
+import nyx_backend_gateway.gateway as gateway
+from nyx_backend_gateway.errors import GatewayApiError
+from nyx_backend_gateway.storage import create_connection
+
+
+class FaucetRateLimitCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.addCleanup(gateway._refresh_faucet_env)
+        env = mock.patch.dict(
+            os.environ,
+            {
+                "NYX_TESTNET_FEE_ADDRESS": "testnet-fee-address",
+                "NYX_FAUCET_COOLDOWN_SECONDS": "0",
+                "NYX_FAUCET_MAX_CLAIMS_PER_24H": "2",
+            },
+        )
+        env.start()
+        self.addCleanup(env.stop)
+        gateway._refresh_faucet_env()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "gateway.db"
+        self.run_root = Path(self.tmp.name) / "runs"
+        self.key = (str(self.db_path), "acct-cache-1", "127.0.0.1")
+
+    def _claim(self, run_id: str, amount: int = 100) -> int:
+        _, balance, _ = gateway.execute_wallet_faucet_v1(
+            seed=7,
+            run_id=run_id,
+            payload={"address": "wallet-cache-1", "amount": amount, "asset_id": "NYXT"},
+            account_id="acct-cache-1",
+            wallet_address="wallet-cache-1",
+            client_ip="127.0.0.1",
+            db_path=self.db_path,
+            run_root=self.run_root,
+        )
+        return balance
+
+    def test_successful_claim_invalidates_cached_usage(self) -> None:
+        self.assertEqual(self._claim("run-faucet-cache-1"), 100)
+        self.assertEqual(self._claim("run-faucet-cache-2"), 200)
+        with self.assertRaises(GatewayApiError) as ctx:
+            self._claim("run-faucet-cache-3")
+        self.assertEqual(ctx.exception.code, "FAUCET_DAILY_CLAIMS_EXCEEDED")
+        self.assertIn(self.key, gateway._FAUCET_USAGE_CACHE)
+        with self.assertRaises(GatewayApiError):
+            self._claim("run-faucet-cache-4")
+
+    def test_aggregates_are_skipped_on_hit_and_reloaded_after_claim(self) -> None:
+        with mock.patch.dict(os.environ, {"NYX_FAUCET_MAX_AMOUNT_PER_24H": "250"}):
+            gateway._refresh_faucet_env()
+            with mock.patch.object(gateway, "_load_faucet_usage", wraps=gateway._load_faucet_usage) as load:
+                self._claim("run-faucet-cache-1")
+                # The pre-check misses the cache and the claim re-checks inside its transaction.
+                self.assertEqual(load.call_count, 2)
+                with self.assertRaises(GatewayApiError) as ctx:
+                    self._claim("run-faucet-cache-2", amount=200)
+                self.assertEqual(ctx.exception.code, "FAUCET_DAILY_AMOUNT_EXCEEDED")
+                self.assertEqual(load.call_count, 3)
+                with self.assertRaises(GatewayApiError):
+                    self._claim("run-faucet-cache-3", amount=200)
+                self.assertEqual(load.call_count, 3)
+                self._claim("run-faucet-cache-4")
+                self.assertEqual(load.call_count, 4)
+                with self.assertRaises(GatewayApiError) as ctx:
+                    self._claim("run-faucet-cache-5")
+                self.assertEqual(ctx.exception.code, "FAUCET_DAILY_CLAIMS_EXCEEDED")
+                self.assertEqual(load.call_count, 5)
+
+    def test_usage_read_before_invalidation_is_not_cached(self) -> None:
+        self._claim("run-faucet-cache-1")
+        real_load = gateway._load_faucet_usage
+
+        def load_racing_claim(*args):
+            usage = real_load(*args)
+            gateway._invalidate_faucet_usage(*self.key)
+            return usage
+
+        conn = create_connection(self.db_path)
+        self.addCleanup(conn.close)
+        with mock.patch.object(gateway, "_load_faucet_usage", side_effect=load_racing_claim):
+            usage = gateway._faucet_usage(conn, self.key, 0)
+        self.assertEqual(usage[1], 1)
+        self.assertNotIn(self.key, gateway._FAUCET_USAGE_CACHE)
+
+    def test_claim_rechecks_limits_against_database(self) -> None:
+        self._claim("run-faucet-cache-1")
+        stale = (0, 0, 0, 0)
+        with mock.patch.object(gateway, "_faucet_usage", return_value=stale):
+            self._claim("run-faucet-cache-2")
+            with self.assertRaises(GatewayApiError) as ctx:
+                self._claim("run-faucet-cache-3")
+        self.assertEqual(ctx.exception.code, "FAUCET_DAILY_CLAIMS_EXCEEDED")
+
+
+if __name__ == "__main__":
+    unittest.main()
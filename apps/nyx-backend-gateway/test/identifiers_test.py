@@ -0,0 +1,23 @@
+import hashlib
+import unittest
+
+import _bootstrap  # noqa: F401
+from nyx_backend_gateway.identifiers import deterministic_id, deterministic_ids
+
+
+class IdentifierTests(unittest.TestCase):
+    def test_ids_match_prefixed_sha256(self) -> None:
+        expected = "listing-" + hashlib.sha256(b"listing:run-7").hexdigest()[:16]
+        self.assertEqual(deterministic_id("listing", "run-7"), expected)
+        self.assertEqual(deterministic_id("listing", "run-7"), expected)
+
+    def test_batch_ids_match_single_ids(self) -> None:
+        prefixes = ("purchase-xfer", "purchase", "fee")
+        ids = deterministic_ids("run-ü", prefixes)
+        self.assertEqual(list(ids), list(prefixes))
+        for prefix in prefixes:
+            self.assertEqual(ids[prefix], deterministic_id(prefix, "run-ü"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import _bootstrap  # noqa: F401
+import nyx_backend_gateway.integrations as integrations
+from nyx_backend_gateway import metrics
+from nyx_backend_gateway.errors import GatewayApiError
+
+
+class _UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002
+        return
+
+    def do_GET(self) -> None:
+        self.server.peers.add(self.client_address)
+        self.server.hits += 1
+        self.server.methods.append(self.command)
+        if self.path.startswith("/drop"):
+            # Hang up without answering, as an upstream closing an idle socket does.
+            self.close_connection = True
+            return
+        if self.path.startswith("/redirect/"):
+            self._send_body(int(self.path.rsplit("/", 1)[1]), b"", location="/q?from=redirect")
+        elif self.path.startswith("/fail"):
+            self._send_body(503, b'{"error":"nope"}')
+        else:
+            self._send_body(200, json.dumps({"path": self.path}).encode("utf-8"))
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.do_GET()
+
+    def _send_body(self, status: int, body: bytes, location: str | None = None) -> None:
+        self.send_response(status)
+        if location is not None:
+            self.send_header("Location", location)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class IntegrationsPoolTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _UpstreamHandler)
+        self.httpd.peers = set()
+        self.httpd.hits = 0
+        self.httpd.methods = []
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def tearDown(self) -> None:
+        with integrations._POOL_LOCK:
+            for idle in integrations._POOL.values():
+                for conn in idle:
+                    conn.close()
+            integrations._POOL.clear()
+        with integrations._RESPONSE_CACHE_LOCK:
+            integrations._RESPONSE_CACHE.clear()
+        self.httpd.shutdown()
+        self.thread.join(timeout=2)
+        self.httpd.server_close()
+
+    def test_sequential_calls_reuse_connection(self) -> None:
+        for idx in range(3):
+            result = integrations._http_get_json(f"{self.base}/q?i={idx}", headers={"accept": "application/json"})
+            self.assertEqual(result["status"], 200)
+            self.assertEqual(result["data"]["path"], f"/q?i={idx}")
+        self.assertEqual(len(self.httpd.peers), 1)
+
+    def test_http_error_maps_to_gateway_error(self) -> None:
+        with self.assertRaises(GatewayApiError) as ctx:
+            integrations._http_get_json(f"{self.base}/fail", headers={})
+        self.assertEqual(ctx.exception.code, "UPSTREAM_HTTP_ERROR")
+        self.assertEqual(ctx.exception.details["status"], 503)
+        result = integrations._http_get_json(f"{self.base}/ok", headers={})
+        self.assertEqual(result["status"], 200)
+        self.assertEqual(len(self.httpd.peers), 1)
+
+    def test_cached_get_serves_repeat_requests(self) -> None:
+        before = metrics.UPSTREAM_CACHE_TOTAL._merged()
+        url = f"{self.base}/collections?limit=5"
+        first = integrations._http_get_json_cached(url, headers={"accept": "application/json"})
+        first["data"] = "mutated"
+        second = integrations._http_get_json_cached(url, headers={"accept": "application/json"})
+        self.assertEqual(second["data"], {"path": "/collections?limit=5"})
+        self.assertEqual(self.httpd.hits, 1)
+        integrations._http_get_json_cached(url, headers={"accept": "text/plain"})
+        self.assertEqual(self.httpd.hits, 2)
+        with integrations._RESPONSE_CACHE_LOCK:
+            for key, (_, result) in list(integrations._RESPONSE_CACHE.items()):
+                integrations._RESPONSE_CACHE[key] = (0.0, result)
+        integrations._http_get_json_cached(url, headers={"accept": "application/json"})
+        self.assertEqual(self.httpd.hits, 3)
+        with self.assertRaises(GatewayApiError):
+            integrations._http_get_json_cached(f"{self.base}/fail", headers={})
+        with self.assertRaises(GatewayApiError):
+            integrations._http_get_json_cached(f"{self.base}/fail", headers={})
+        self.assertEqual(self.httpd.hits, 5)
+        after = metrics.UPSTREAM_CACHE_TOTAL._merged()
+        for result, expected in (("hit", 1), ("miss", 5)):
+            self.assertEqual(after.get((result,), 0.0) - before.get((result,), 0.0), expected)
+        self.assertIn('nyx_gateway_upstream_cache_total{result="hit"}', metrics.render_metrics())
+
+    def test_redirects_are_followed_like_urlopen(self) -> None:
+        result = integrations._http_get_json(f"{self.base}/redirect/302", headers={})
+        self.assertEqual(result["data"]["path"], "/q?from=redirect")
+        result = integrations._http_post_json_any(f"{self.base}/redirect/303", headers={}, payload={"a": 1})
+        self.assertEqual(result["data"]["path"], "/q?from=redirect")
+        self.assertEqual(self.httpd.methods[-2:], ["POST", "GET"])
+        with self.assertRaises(GatewayApiError) as ctx:
+            integrations._http_post_json_any(f"{self.base}/redirect/307", headers={}, payload={"a": 1})
+        self.assertEqual(ctx.exception.code, "UPSTREAM_HTTP_ERROR")
+        self.assertEqual(ctx.exception.details["status"], 307)
+
+    def test_environment_proxy_is_honoured(self) -> None:
+        with mock.patch.dict(os.environ, {"http_proxy": self.base}):
+            for name in ("no_proxy", "NO_PROXY"):
+                os.environ.pop(name, None)
+            result = integrations._http_get_json("http://upstream.invalid/q?i=1", headers={})
+        self.assertEqual(result["data"]["path"], "http://upstream.invalid/q?i=1")
+        with mock.patch.dict(os.environ, {"http_proxy": "http://127.0.0.1:9", "no_proxy": "127.0.0.1"}):
+            result = integrations._http_get_json(f"{self.base}/q?i=2", headers={})
+        self.assertEqual(result["data"]["path"], "/q?i=2")
+
+    def test_only_idempotent_requests_are_retried(self) -> None:
+        integrations._http_get_json(f"{self.base}/q", headers={})
+        with self.assertRaises(GatewayApiError) as ctx:
+            integrations._http_post_json_any(f"{self.base}/drop", headers={}, payload={"a": 1})
+        self.assertEqual(ctx.exception.code, "UPSTREAM_UNAVAILABLE")
+        self.assertEqual(self.httpd.methods, ["GET", "POST"])
+        integrations._http_get_json(f"{self.base}/q", headers={})
+        with self.assertRaises(GatewayApiError):
+            integrations._http_get_json(f"{self.base}/drop", headers={})
+        self.assertEqual(self.httpd.methods, ["GET", "POST", "GET", "GET", "GET"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from unittest import mock
+
+import _bootstrap  # noqa: F401
+import nyx_backend_gateway.integrations as integrations
+from nyx_backend_gateway.errors import GatewayApiError
+
+
+class IntegrationsValidationTests(unittest.TestCase):
+    def test_sol_mint_allowlist(self) -> None:
+        mint = "So11111111111111111111111111111111111111112"
+        self.assertTrue(integrations._is_sol_mint(mint))
+        self.assertEqual(integrations._require_sol_mint(f"  {mint} ", name="mint"), mint)
+        for bad in (mint[:31], mint + "1" * 30, mint[:-1] + "0", mint[:-1] + "l", mint[:-1] + "é", mint + "\n1"):
+            self.assertFalse(integrations._is_sol_mint(bad), bad)
+        with self.assertRaises(GatewayApiError) as ctx:
+            integrations._require_sol_mint("O" * 40, name="input_mint")
+        self.assertEqual(ctx.exception.code, "PARAM_INVALID")
+        self.assertEqual(ctx.exception.details, {"param": "input_mint"})
+
+    def test_evm_address_check_matches_pattern(self) -> None:
+        cases = [
+            "0x" + "ab" * 20,
+            "0x" + "AbCd" * 10,
+            "0X" + "ab" * 20,
+            "0x" + "ab " * 13 + "a",
+            "0x" + "ab" * 19 + "\t1",
+            "0x" + "g" * 40,
+            "0x" + "\u0661" * 40,
+            "0x" + "ab" * 19,
+            "0x" + "ab" * 21,
+        ]
+        for case in cases:
+            self.assertEqual(
+                integrations._is_evm_address(case), bool(integrations._SAFE_EVM_ADDRESS.fullmatch(case)), case
+            )
+
+    def test_unanchored_patterns_still_require_full_match(self) -> None:
+        address = "0x" + "ab" * 20
+        self.assertEqual(
+            integrations._require_nonempty_str(address, name="a", pattern=integrations._SAFE_EVM_ADDRESS), address
+        )
+        for bad in (address + "0", "x" + address, address[:-1]):
+            with self.assertRaises(GatewayApiError):
+                integrations._require_nonempty_str(bad, name="a", pattern=integrations._SAFE_EVM_ADDRESS)
+
+    def test_quote_0x_rejects_precompile_range_taker(self) -> None:
+        token = "0x" + "ab" * 20
+        calls = []
+
+        def fake_get(url, headers):
+            calls.append(url)
+            return {"status": 200, "data": {}}
+
+        with (
+            mock.patch.object(integrations, "get_0x_api_key", return_value="k"),
+            mock.patch.object(integrations, "_http_get_json", side_effect=fake_get),
+        ):
+            for taker in ("0x" + "0" * 40, "0x" + "0" * 36 + "ffff", "0x" + "0" * 36 + "FFFF"):
+                with self.assertRaises(GatewayApiError) as ctx:
+                    integrations.quote_0x(
+                        network=None,
+                        chain_id=1,
+                        sell_token=token,
+                        buy_token=token,
+                        sell_amount="1",
+                        buy_amount=None,
+                        taker_address=taker,
+                        slippage_bps=None,
+                    )
+                self.assertEqual(ctx.exception.details, {"param": "taker_address"})
+            for taker in ("0x" + "0" * 35 + "10000", "0x" + "1" + "0" * 39):
+                integrations.quote_0x(
+                    network=None,
+                    chain_id=1,
+                    sell_token=token,
+                    buy_token=token,
+                    sell_amount="1",
+                    buy_amount=None,
+                    taker_address=taker,
+                    slippage_bps=None,
+                )
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(
+            calls[0],
+            f"https://api.0x.org/swap/permit2/quote?chainId=1&sellToken={token}&buyToken={token}"
+            f"&taker=0x{'0' * 35}10000&sellAmount=1",
+        )
+
+    def test_quote_0x_rejects_non_ascii_amount(self) -> None:
+        token = "0x" + "ab" * 20
+        with mock.patch.object(integrations, "get_0x_api_key", return_value="k"):
+            with self.assertRaises(GatewayApiError) as ctx:
+                integrations.quote_0x(
+                    network=None,
+                    chain_id=1,
+                    sell_token=token,
+                    buy_token=token,
+                    sell_amount="\u0661\u0662",
+                    buy_amount=None,
+                    taker_address="0x" + "1" * 40,
+                    slippage_bps=None,
+                )
+        self.assertEqual(ctx.exception.details, {"param": "sell_amount"})
+
+    def test_bps_to_fraction_matches_float_formatting(self) -> None:
+        for bps in range(0, 10_001):
+            self.assertEqual(integrations._bps_to_fraction(bps), f"{bps / 10_000:.6f}".rstrip("0").rstrip("."))
+        self.assertEqual(integrations._bps_to_fraction(50), "0.005")
+        self.assertEqual(integrations._bps_to_fraction(10_000), "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
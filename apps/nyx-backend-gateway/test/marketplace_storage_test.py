@@ -1,16 +1,23 @@
+import os
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 import _bootstrap  # noqa: F401
+import nyx_backend_gateway.gateway as gateway
+import nyx_backend_gateway.marketplace as marketplace
 from nyx_backend_gateway.storage import (
     Listing,
     Purchase,
+    StorageError,
     create_connection,
+    get_wallet_balance,
     insert_listing,
     insert_purchase,
     list_listings,
     list_purchases,
+    set_wallet_balance,
 )
 
 
@@ -37,9 +44,148 @@ class MarketplaceStorageTests(unittest.TestCase):
             listings = list_listings(conn)
             purchases = list_purchases(conn, listing_id="list-1")
             self.assertEqual(len(listings), 1)
+            self.assertEqual(
+                list_listings(conn, fields=["listing_id", "price"]), [{"listing_id": "list-1", "price": 10}]
+            )
+            with self.assertRaises(StorageError):
+                list_listings(conn, fields=["listing_id", "rowid"])
             self.assertEqual(len(purchases), 1)
             conn.close()
 
+    def test_search_cache_serves_until_invalidated(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = create_connection(Path(tmp) / "gateway.db")
+
+            def publish(listing_id: str) -> None:
+                insert_listing(
+                    conn,
+                    Listing(
+                        listing_id=listing_id,
+                        publisher_id="seller-1",
+                        sku="lamp",
+                        title="Desk Lamp",
+                        price=5,
+                        status="active",
+                        run_id=f"run-{listing_id}",
+                    ),
+                )
+
+            publish("list-a")
+            first = gateway.marketplace_search_listings(conn, "lamp", limit=10)
+            self.assertEqual([row["listing_id"] for row in first], ["list-a"])
+            first[0]["title"] = "mutated"
+
+            publish("list-b")
+            cached = gateway.marketplace_search_listings(conn, "lamp", limit=10)
+            self.assertEqual([row["listing_id"] for row in cached], ["list-a"])
+            self.assertEqual(cached[0]["title"], "Desk Lamp")
+
+            gateway._invalidate_listing_caches()
+            fresh = gateway.marketplace_search_listings(conn, "lamp", limit=10)
+            self.assertEqual([row["listing_id"] for row in fresh], ["list-a", "list-b"])
+            conn.close()
+
+    def test_active_listing_pages_slice_one_cached_window(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = create_connection(Path(tmp) / "gateway.db")
+            for idx in range(5):
+                insert_listing(
+                    conn,
+                    Listing(
+                        listing_id=f"list-{idx}",
+                        publisher_id="seller-1",
+                        sku=f"sku-{idx}",
+                        title="Item",
+                        price=1,
+                        status="active",
+                        run_id=f"run-{idx}",
+                    ),
+                )
+            gateway._invalidate_listing_caches()
+            page = gateway.marketplace_list_active_listings(conn, limit=2, offset=1)
+            self.assertEqual([row["listing_id"] for row in page], ["list-1", "list-2"])
+
+            conn.execute("UPDATE listings SET status = 'sold' WHERE listing_id = 'list-3'")
+            conn.commit()
+            page = gateway.marketplace_list_active_listings(conn, limit=2, offset=3)
+            self.assertEqual([row["listing_id"] for row in page], ["list-3", "list-4"])
+
+            gateway._invalidate_listing_caches()
+            page = gateway.marketplace_list_active_listings(conn, limit=2, offset=3)
+            self.assertEqual([row["listing_id"] for row in page], ["list-4"])
+            conn.close()
+
+    def test_fts_search_matches_like_scan(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = create_connection(Path(tmp) / "gateway.db")
+            if not conn.listings_fts:
+                conn.close()
+                self.skipTest("sqlite build lacks fts5 trigram")
+            titles = ["Desk Lamp", "LAMPSHADE", "Floor lamp 50%", 'Quoted "Lamp"', "Café Table", "Lamb_chop"]
+            for idx, title in enumerate(titles):
+                insert_listing(
+                    conn,
+                    Listing(
+                        listing_id=f"list-{idx}",
+                        publisher_id="seller-1",
+                        sku=f"sku-{idx}",
+                        title=title,
+                        price=1,
+                        status="sold" if idx == 1 else "active",
+                        run_id=f"run-{idx}",
+                    ),
+                )
+            insert_listing(
+                conn,
+                Listing(
+                    listing_id="list-0",
+                    publisher_id="seller-1",
+                    sku="sku-0",
+                    title="Desk Light",
+                    price=1,
+                    status="active",
+                    run_id="run-0b",
+                ),
+            )
+            queries = ["lamp", "LAMP", "light", "sku-3", '"lamp"', "50%", "lam", "la", "b_c", "café", "desk lamp"]
+            with_fts = {q: marketplace.search_listings(conn, q, limit=50) for q in queries}
+            conn.listings_fts = False
+            scanned = {q: marketplace.search_listings(conn, q, limit=50) for q in queries}
+            self.assertEqual(with_fts, scanned)
+            self.assertEqual([row["listing_id"] for row in with_fts["lamp"]], ["list-2", "list-3"])
+            self.assertEqual(with_fts["desk lamp"], [])
+            conn.close()
+
+    def test_purchase_rolls_back_when_fee_ledger_fails(self) -> None:
+        os.environ.setdefault("NYX_TESTNET_FEE_ADDRESS", "testnet-fee-address")
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = create_connection(Path(tmp) / "gateway.db")
+            insert_listing(
+                conn,
+                Listing(
+                    listing_id="list-1",
+                    publisher_id="seller-1",
+                    sku="sku-1",
+                    title="Item",
+                    price=10,
+                    status="active",
+                    run_id="run-1",
+                ),
+            )
+            set_wallet_balance(conn, "buyer-1", 1000)
+            payload = {"listing_id": "list-1", "buyer_id": "buyer-1", "qty": 1}
+            with mock.patch.object(marketplace, "insert_fee_ledger", side_effect=StorageError("ledger down")):
+                with self.assertRaises(StorageError):
+                    marketplace.purchase_listing(conn, "run-buy-1", payload, "buyer-1")
+            self.assertEqual(get_wallet_balance(conn, "buyer-1"), 1000)
+            self.assertEqual(list_purchases(conn, listing_id="list-1"), [])
+            self.assertEqual([row["listing_id"] for row in list_listings(conn)], ["list-1"])
+
+            marketplace.purchase_listing(conn, "run-buy-2", payload, "buyer-1")
+            self.assertEqual(len(list_purchases(conn, listing_id="list-1")), 1)
+            self.assertEqual(list_listings(conn), [])
+            conn.close()
+
 
 if __name__ == "__main__":
     unittest.main()
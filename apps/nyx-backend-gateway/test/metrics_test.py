@@ -0,0 +1,105 @@
+import threading
+import unittest
+
+import _bootstrap  # noqa: F401
+from nyx_backend_gateway import metrics
+from nyx_backend_gateway.metrics import Counter, Histogram, _sanitize_label
+
+
+class MetricsRenderTests(unittest.TestCase):
+    def test_counter_render_uses_labelname_order_and_sanitizes(self) -> None:
+        counter = Counter("t_total", "help", ("method", "path"))
+        counter.labels(path="/b", method="GET").inc()
+        counter.labels(method="GET", path='/a"x\n').inc(2)
+        counter.inc(labels={"method": "POST", "path": "/a"})
+        counter.labels(method="GET", path="/b").inc()
+        self.assertEqual(
+            counter.render().splitlines(),
+            [
+                "# HELP t_total help",
+                "# TYPE t_total counter",
+                't_total{method="GET",path="/a\\"x "} 2.0',
+                't_total{method="GET",path="/b"} 2.0',
+                't_total{method="POST",path="/a"} 1.0',
+            ],
+        )
+
+    def test_sanitize_label_escapes(self) -> None:
+        self.assertEqual(_sanitize_label('a\\b"c\nd'), 'a\\\\b\\"c d')
+        self.assertEqual(_sanitize_label("/plain"), "/plain")
+
+    def test_label_mismatch_rejected(self) -> None:
+        counter = Counter("t_total", "help", ("method",))
+        with self.assertRaises(ValueError):
+            counter.labels(path="/x").inc()
+        with self.assertRaises(ValueError):
+            counter.inc(labels={"method": "GET", "path": "/x"})
+
+    def test_histogram_sum_and_count(self) -> None:
+        histogram = Histogram("t_seconds", "help", ("op",), buckets=[0.1, 1, 0.5])
+        histogram.labels(op="SELECT").observe(0.25)
+        histogram.labels(op="SELECT").observe(0.5)
+        histogram.labels(op="INSERT").observe(5)
+        lines = histogram.render().splitlines()
+        self.assertEqual(
+            [line for line in lines if line.startswith('t_seconds_bucket{op="SELECT"')],
+            [
+                't_seconds_bucket{op="SELECT",le="0.1"} 0',
+                't_seconds_bucket{op="SELECT",le="0.5"} 2',
+                't_seconds_bucket{op="SELECT",le="1"} 2',
+                't_seconds_bucket{op="SELECT",le="+Inf"} 2',
+            ],
+        )
+        self.assertIn('t_seconds_bucket{op="INSERT",le="1"} 0', lines)
+        self.assertIn('t_seconds_bucket{op="INSERT",le="+Inf"} 1', lines)
+        self.assertIn('t_seconds_sum{op="SELECT"} 0.75', lines)
+        self.assertIn('t_seconds_count{op="SELECT"} 2', lines)
+        unlabeled = Histogram("n_seconds", "help", buckets=[1])
+        unlabeled.observe(0.5)
+        self.assertIn("n_seconds_sum 0.5", unlabeled.render().splitlines())
+
+    def test_concurrent_updates_merge_across_shards(self) -> None:
+        counter = Counter("c_total", "help", ("path",))
+        histogram = Histogram("h_seconds", "help", ("path",), buckets=[1])
+
+        def worker() -> None:
+            child = counter.labels(path="/x")
+            for _ in range(500):
+                child.inc()
+                histogram.labels(path="/x").observe(2)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn('c_total{path="/x"} 4000.0', counter.render().splitlines())
+        lines = histogram.render().splitlines()
+        self.assertIn('h_seconds_count{path="/x"} 4000', lines)
+        self.assertIn('h_seconds_sum{path="/x"} 8000.0', lines)
+
+    def test_render_order_tracks_new_series(self) -> None:
+        counter = Counter("o_total", "help", ("path",))
+        counter.labels(path="/b").inc()
+        self.assertEqual(counter.render().splitlines()[2:], ['o_total{path="/b"} 1.0'])
+        counter.labels(path="/a").inc()
+        lines: list[str] = ["# prefix"]
+        counter.render_into(lines)
+        self.assertEqual(lines[0], "# prefix")
+        self.assertEqual(lines[3:], ['o_total{path="/a"} 1.0', 'o_total{path="/b"} 1.0'])
+
+    def test_recorders_feed_module_metrics(self) -> None:
+        metrics.record_request("GET", "/metrics-test", 404, 0.01)
+        metrics.record_db_query("\n  select * FROM metrics_test", 0.001)
+        rendered = metrics.render_metrics().splitlines()
+        for prefix in (
+            'nyx_gateway_http_requests_total{method="GET",path="/metrics-test",status="404"} ',
+            'nyx_gateway_http_errors_total{method="GET",path="/metrics-test",code="404"} ',
+            'nyx_gateway_db_query_total{operation="SELECT"} ',
+        ):
+            self.assertTrue(any(line.startswith(prefix) for line in rendered), prefix)
+        self.assertIn('nyx_gateway_http_request_latency_seconds_count{method="GET",path="/metrics-test"} 1', rendered)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,20 @@
+import unittest
+from pathlib import Path
+
+import _bootstrap  # noqa: F401
+from nyx_backend_gateway import paths
+
+
+class PathsTests(unittest.TestCase):
+    def test_paths_resolve_once_under_repo_root(self) -> None:
+        root = paths.repo_root()
+        self.assertTrue(Path(paths.__file__).resolve().is_relative_to(root))
+        self.assertIs(paths.repo_root(), root)
+        self.assertIs(paths.db_path(), paths.db_path())
+        self.assertEqual(paths.db_path(), root / "apps" / "nyx-backend-gateway" / "data" / "nyx_gateway.db")
+        self.assertEqual(paths.run_root().parent, root / "apps" / "nyx-backend-gateway")
+        self.assertEqual(paths.backend_src(), root / "apps" / "nyx-backend" / "src")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+import base64
+import hashlib
+import hmac
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import _bootstrap  # noqa: F401
+from nyx_backend_gateway import portal
+from nyx_backend_gateway.storage import StorageError, create_connection
+
+
+class PortalTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = create_connection(Path(self.tmp.name) / "gateway.db")
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_account_id_matches_plain_digest(self) -> None:
+        pubkey = base64.b64encode(b"k" * 32).decode("ascii")
+        expected = hashlib.sha256(f"portal:acct:alice_1:{pubkey}".encode("utf-8")).hexdigest()[:16]
+        self.assertEqual(portal._derive_account_id("alice_1", pubkey), f"acct-{expected}")
+        self.assertEqual(portal._derive_account_id("alice_1", pubkey), f"acct-{expected}")
+
+    def test_canonical_json_matches_stdlib_bytes(self) -> None:
+        for value in (
+            {"seq": 3, "body": '{"ciphertext": "x", "iv": "y"}', "room_id": "room-1"},
+            {"body": "tab\tnew\nline\x7f", "b": 1, "a": -(2**70)},
+            {"body": "caf\u00e9 \u2028 \U0001f600"},
+        ):
+            self.assertEqual(
+                portal._canonical_json(value),
+                json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8"),
+            )
+
+    def test_validate_handle(self) -> None:
+        for handle in ("abc", "a_b-9", "x" * 24):
+            self.assertEqual(portal._validate_handle(handle), handle)
+        for handle, message in (
+            ("ab", "handle length invalid"),
+            ("x" * 25, "handle length invalid"),
+            ("Abc", "handle invalid"),
+            ("ab c", "handle invalid"),
+            ("abc\n", "handle invalid"),
+            ("caf\u00e9", "handle invalid"),
+            ("ab\u00b2", "handle invalid"),
+        ):
+            with self.assertRaises(portal.PortalError) as ctx:
+                portal._validate_handle(handle)
+            self.assertEqual(str(ctx.exception), message)
+        with self.assertRaises(portal.PortalError):
+            portal._validate_handle(True)
+
+    def test_challenge_signature_roundtrip(self) -> None:
+        key = b"k" * 32
+        account = portal.create_account(self.conn, "bob-2", base64.b64encode(key).decode("ascii"))
+        first = portal.issue_challenge(self.conn, account.account_id)
+        second = portal.issue_challenge(self.conn, account.account_id)
+        self.assertEqual(len(first.nonce), 64)
+        self.assertNotEqual(first.nonce, second.nonce)
+        signature = base64.b64encode(hmac.new(key, first.nonce.encode("utf-8"), hashlib.sha256).digest())
+        session = portal.verify_challenge(self.conn, account.account_id, first.nonce, signature.decode("ascii"))
+        self.assertEqual(session.account_id, account.account_id)
+        with self.assertRaises(portal.PortalError):
+            portal.verify_challenge(self.conn, account.account_id, second.nonce, signature.decode("ascii"))
+
+    def test_pubkey_validation_warms_signature_decode(self) -> None:
+        portal._decoded_pubkey.cache_clear()
+        pubkey = base64.b64encode(b"w" * 32).decode("ascii")
+        account = portal.create_account(self.conn, "warm-1", pubkey)
+        challenge = portal.issue_challenge(self.conn, account.account_id)
+        signature = base64.b64encode(hmac.new(b"w" * 32, challenge.nonce.encode("utf-8"), hashlib.sha256).digest())
+        portal.verify_challenge(self.conn, account.account_id, challenge.nonce, signature.decode("ascii"))
+        self.assertEqual(portal._decoded_pubkey.cache_info().hits, 1)
+        for bad in ("", "AAAA" * 3, "not base64!", "=" + pubkey, pubkey + "\n", "x" * 257):
+            with self.assertRaises(portal.PortalError):
+                portal._validate_pubkey(bad)
+
+    def test_verify_signature_reuses_decoded_pubkey(self) -> None:
+        key = b"s" * 32
+        pubkey = base64.b64encode(key).decode("ascii")
+        signature = base64.b64encode(hmac.new(key, b"nonce-1", hashlib.sha256).digest()).decode("ascii")
+        portal._decoded_pubkey.cache_clear()
+        self.assertTrue(portal._verify_signature(pubkey, "nonce-1", signature))
+        self.assertFalse(portal._verify_signature(pubkey, "nonce-2", signature))
+        self.assertEqual(portal._decoded_pubkey.cache_info().hits, 1)
+        self.assertFalse(portal._verify_signature(pubkey, "nonce-1", "not base64!"))
+        self.assertFalse(portal._verify_signature("not base64!", "nonce-1", signature))
+        self.assertFalse(portal._verify_signature("caf\u00e9", "nonce-1", signature))
+
+    def test_post_message_requires_e2ee_object(self) -> None:
+        room = portal.create_room(self.conn, "general")
+        for body, message in (
+            ("hello", "message must be e2ee json"),
+            ('["ciphertext"]', "message must be e2ee json"),
+            ('{"ciphertext": "x"', "message must be e2ee json"),
+            ('{"ciphertext": "x",}', "message must be e2ee json"),
+            ('{"iv": "y"}', "message missing ciphertext"),
+            ('{"ciphertext": "x", "iv": ""}', "message missing iv"),
+        ):
+            with self.assertRaises(portal.PortalError) as ctx:
+                portal.post_message(self.conn, room.room_id, "acct-1", body)
+            self.assertEqual(str(ctx.exception), message)
+        fields, receipt = portal.post_message(self.conn, room.room_id, "acct-1", '{"ciphertext": "x", "iv": "y"}')
+        self.assertEqual(fields["seq"], 1)
+        self.assertEqual(receipt["prev_digest"], "0" * 64)
+
+    def test_post_message_chains_room_heads(self) -> None:
+        room = portal.create_room(self.conn, "chain")
+        other = portal.create_room(self.conn, "other")
+        body = '{"ciphertext": "x", "iv": "y"}'
+        heads = []
+        for expected_seq in (1, 2, 3):
+            fields, receipt = portal.post_message(self.conn, room.room_id, "acct-1", body)
+            self.assertEqual(fields["seq"], expected_seq)
+            self.assertEqual(receipt["prev_digest"], heads[-1] if heads else "0" * 64)
+            chained = f"{receipt['prev_digest']}{receipt['msg_digest']}".encode("utf-8")
+            self.assertEqual(receipt["chain_head"], hashlib.sha256(chained).hexdigest())
+            message_id = hashlib.sha256(f"{room.room_id}:{expected_seq}".encode("utf-8")).hexdigest()[:12]
+            self.assertEqual(fields["message_id"], f"msg-{message_id}")
+            heads.append(receipt["chain_head"])
+        fields, receipt = portal.post_message(self.conn, other.room_id, "acct-1", body)
+        self.assertEqual((fields["seq"], receipt["prev_digest"]), (1, "0" * 64))
+        stored = portal.list_messages(self.conn, room.room_id, after=None, limit=10)
+        self.assertEqual([row["chain_head"] for row in stored], heads)
+        state = self.conn.execute(
+            "SELECT last_seq, last_chain_head FROM chat_room_state WHERE room_id = ?", (room.room_id,)
+        ).fetchone()
+        self.assertEqual(tuple(state), (3, heads[-1]))
+
+    def test_post_messages_bulk_matches_single_posts(self) -> None:
+        room = portal.create_room(self.conn, "bulk")
+        other = portal.create_room(self.conn, "bulk-other")
+        body = '{"ciphertext": "x", "iv": "y"}'
+        portal.post_message(self.conn, room.room_id, "acct-0", body)
+        results = portal.post_messages_bulk(
+            self.conn,
+            [
+                (room.room_id, "acct-1", body),
+                (other.room_id, "acct-2", body),
+                (room.room_id, "acct-3", body),
+            ],
+        )
+        self.assertEqual([fields["seq"] for fields, _ in results], [2, 1, 3])
+        self.assertEqual(results[2][1]["prev_digest"], results[0][1]["chain_head"])
+        fields, receipt = portal.post_message(self.conn, room.room_id, "acct-4", body)
+        self.assertEqual((fields["seq"], receipt["prev_digest"]), (4, results[2][1]["chain_head"]))
+        stored = portal.list_messages(self.conn, room.room_id, after=None, limit=10)
+        self.assertEqual([row["sender_account_id"] for row in stored], ["acct-0", "acct-1", "acct-3", "acct-4"])
+        self.assertEqual(stored[2]["chain_head"], results[2][1]["chain_head"])
+
+    def test_post_messages_bulk_is_all_or_nothing(self) -> None:
+        room = portal.create_room(self.conn, "bulk-fail")
+        body = '{"ciphertext": "x", "iv": "y"}'
+        with self.assertRaises(portal.PortalError):
+            portal.post_messages_bulk(self.conn, [(room.room_id, "acct-1", body), (room.room_id, "acct-2", "nope")])
+        with self.assertRaises(StorageError):
+            portal.post_messages_bulk(self.conn, [(room.room_id, "acct-1", body), (room.room_id, "bad sender!", body)])
+        self.assertEqual(portal.list_messages(self.conn, room.room_id, after=None, limit=10), [])
+        self.assertEqual(portal.post_messages_bulk(self.conn, []), [])
+        fields, _ = portal.post_message(self.conn, room.room_id, "acct-1", body)
+        self.assertEqual(fields["seq"], 1)
+
+    def test_post_message_failure_releases_seq(self) -> None:
+        room = portal.create_room(self.conn, "rollback")
+        with self.assertRaises(StorageError):
+            portal.post_message(self.conn, room.room_id, "bad sender!", '{"ciphertext": "x", "iv": "y"}')
+        fields, receipt = portal.post_message(self.conn, room.room_id, "acct-1", '{"ciphertext": "x", "iv": "y"}')
+        self.assertEqual((fields["seq"], receipt["prev_digest"]), (1, "0" * 64))
+
+    def test_account_activity_decodes_receipt_hashes(self) -> None:
+        for run_id, hashes in (("run-a", '["h1","h2"]'), ("run-b", "not json"), ("run-c", "")):
+            self.conn.execute(
+                "INSERT INTO receipts (receipt_id, module, action, state_hash, receipt_hashes, replay_ok, run_id) "
+                "VALUES (?, 'wallet', 'transfer', 's', ?, 1, ?)",
+                (f"rcpt-{run_id}", hashes, run_id),
+            )
+            self.conn.execute(
+                "INSERT INTO wallet_transfers (transfer_id, from_address, to_address, amount, fee_total, "
+                "treasury_address, run_id) VALUES (?, 'w-me', 'w-other', 1, 0, 't', ?)",
+                (f"xfer-{run_id}", run_id),
+            )
+        self.conn.commit()
+        rows = portal.list_account_activity(self.conn, "acct-me", "w-me")
+        self.assertEqual(
+            [(row["receipt_id"], row["receipt_hashes"]) for row in rows],
+            [("rcpt-run-c", []), ("rcpt-run-b", []), ("rcpt-run-a", ["h1", "h2"])],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,256 @@
+import threading
+import unittest
+from unittest import mock
+
+import _bootstrap  # noqa: F401
+from nyx_backend_gateway import risk
+from nyx_backend_gateway.errors import GatewayApiError
+from nyx_backend_gateway.risk import RiskConfig, RiskEngine, RiskLimit
+
+
+def _config(**overrides) -> RiskConfig:
+    values = {
+        "mode": "enforce",
+        "global_paused": False,
+        "global_limit": RiskLimit(max_count=1000, max_amount=None),
+        "account_limit": RiskLimit(max_count=3, max_amount=100),
+        "ip_limit": RiskLimit(max_count=1000, max_amount=None),
+        "action_limits": {"wallet_transfer": RiskLimit(max_count=1000, max_amount=1000)},
+        "breaker_errors_per_min": 2,
+        "breaker_window_seconds": 60,
+    }
+    values.update(overrides)
+    return RiskConfig(**values)
+
+
+def _at(seconds: float):
+    return mock.patch.object(risk.time, "monotonic_ns", return_value=int(seconds * 1_000_000_000))
+
+
+class RiskEngineTests(unittest.TestCase):
+    def _check(self, engine: RiskEngine, amount: int | None = None, account_id: str = "acct-1") -> None:
+        engine.check("wallet_transfer", account_id=account_id, client_ip="10.0.0.1", amount=amount)
+
+    def test_check_reads_clock_once(self) -> None:
+        engine = RiskEngine(_config())
+        with _at(120.5) as clock:
+            self._check(engine, amount=5)
+        self.assertEqual(clock.call_count, 1)
+
+    def test_account_count_limit_slides_across_windows(self) -> None:
+        engine = RiskEngine(_config())
+        with _at(170):
+            for _ in range(3):
+                self._check(engine)
+            with self.assertRaises(GatewayApiError) as ctx:
+                self._check(engine)
+            self._check(engine, account_id="acct-2")
+        self.assertEqual(ctx.exception.details["scope"], "account")
+        self.assertEqual(ctx.exception.details["dimension"], "count")
+        # Just past the boundary the previous window still weighs in: 1 + 4 * 59 // 60 = 4.
+        with _at(181):
+            with self.assertRaises(GatewayApiError) as ctx:
+                self._check(engine)
+        self.assertEqual(ctx.exception.details["current"], 4)
+        # Three quarters in: 2 + 4 * 15 // 60 = 3.
+        with _at(225):
+            self._check(engine)
+        # A skipped window drops the old counts entirely.
+        with _at(360):
+            for _ in range(3):
+                self._check(engine)
+
+    def test_amount_limit_and_monitor_mode(self) -> None:
+        engine = RiskEngine(_config())
+        with _at(60):
+            self._check(engine, amount=60)
+            self._check(engine, amount=-500)
+            with self.assertRaises(GatewayApiError) as ctx:
+                self._check(engine, amount=50)
+        self.assertEqual((ctx.exception.details["dimension"], ctx.exception.details["current"]), ("amount", 110))
+        monitor = RiskEngine(_config(mode="monitor"))
+        with self.assertLogs("nyx-risk", level="WARNING") as logs:
+            for _ in range(4):
+                self._check(monitor)
+        self.assertEqual(logs.records[0].getMessage(), "risk limit exceeded: account count 4/3")
+        self.assertEqual(logs.records[0].scope, "account")
+
+    def test_token_bucket_refills_and_skips_denied_requests(self) -> None:
+        bucket = RiskLimit(max_count=2, max_amount=100, algorithm="token_bucket")
+        engine = RiskEngine(_config(action_limits={"wallet_faucet": bucket}))
+
+        def faucet(amount: int) -> None:
+            engine.check("wallet_faucet", account_id=None, client_ip=None, amount=amount)
+
+        with _at(0):
+            faucet(10)
+            faucet(70)
+            with self.assertRaises(GatewayApiError) as ctx:
+                faucet(10)
+        self.assertEqual(ctx.exception.details["scope"], "action:wallet_faucet")
+        self.assertEqual((ctx.exception.details["limit"], ctx.exception.details["current"]), (2, 3))
+        with _at(30):
+            with self.assertRaises(GatewayApiError) as ctx:
+                faucet(80)
+            self.assertEqual(ctx.exception.details["dimension"], "amount")
+            faucet(70)
+            with self.assertRaises(GatewayApiError):
+                faucet(0)
+        burst = RiskEngine(
+            _config(action_limits={"chat_message": RiskLimit(max_count=60, algorithm="token_bucket", burst=2)})
+        )
+        with _at(5):
+            for _ in range(2):
+                burst.check("chat_message", account_id=None, client_ip=None)
+            with self.assertRaises(GatewayApiError) as ctx:
+                burst.check("chat_message", account_id=None, client_ip=None)
+        self.assertEqual(ctx.exception.details["limit"], 2)
+        with _at(6):
+            burst.check("chat_message", account_id=None, client_ip=None)
+
+    def test_idle_keys_are_swept(self) -> None:
+        limits = {"wallet_faucet": RiskLimit(max_count=2, algorithm="token_bucket", burst=6)}
+        with _at(0):
+            engine = RiskEngine(_config(action_limits=limits))
+        self.assertEqual(engine._idle_horizon, 180)
+        with _at(10):
+            self._check(engine, account_id="acct-old")
+            engine.check("wallet_faucet", account_id=None, client_ip=None)
+        with _at(150):
+            self._check(engine, account_id="acct-new")
+        with _at(200):
+            self._check(engine, account_id="acct-new")
+        self.assertNotIn(("account", "acct-old", "wallet_transfer"), engine._counters)
+        self.assertIn(("account", "acct-new", "wallet_transfer"), engine._counters)
+        self.assertNotIn(("action", "wallet_faucet"), engine._buckets)
+        self.assertEqual(engine._swept_at, 200)
+
+    def test_concurrent_checks_count_every_request(self) -> None:
+        wide = RiskLimit(max_count=100_000)
+        engine = RiskEngine(
+            _config(global_limit=wide, account_limit=wide, ip_limit=wide, action_limits={"wallet_transfer": wide})
+        )
+
+        def worker(idx: int) -> None:
+            for _ in range(2000):
+                self._check(engine, account_id=f"acct-{idx % 2}")
+
+        with _at(30):
+            threads = [threading.Thread(target=worker, args=(idx,)) for idx in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(engine._counters[("global", "wallet_transfer")][2], 16000)
+        self.assertEqual(engine._counters[("account", "acct-0", "wallet_transfer")][2], 8000)
+
+    def test_breaker_opens_after_failures(self) -> None:
+        engine = RiskEngine(_config())
+        with _at(60):
+            engine.record_failure("wallet_transfer")
+            self._check(engine)
+            with self.assertLogs("nyx-risk", level="WARNING"):
+                engine.record_failure("wallet_transfer")
+            with self.assertRaises(GatewayApiError) as ctx:
+                self._check(engine)
+            engine.check("chat_message", account_id="acct-2", client_ip=None)
+        self.assertEqual(ctx.exception.details["scope"], "circuit_breaker")
+        with _at(120):
+            self._check(engine)
+
+    def test_breaker_half_open_probes(self) -> None:
+        engine = RiskEngine(_config(breaker_half_open_successes=2))
+
+        def probe(idx: int) -> None:
+            self._check(engine, account_id=f"probe-{idx}")
+
+        with _at(0), self.assertLogs("nyx-risk", level="WARNING"):
+            engine.record_failure("wallet_transfer")
+            engine.record_failure("wallet_transfer")
+        with _at(59), self.assertRaises(GatewayApiError):
+            probe(0)
+        # Half-open: a bounded round of probes, and one failure reopens for a full timeout.
+        with _at(60):
+            probe(1)
+            probe(2)
+            with self.assertRaises(GatewayApiError):
+                probe(3)
+            engine.record_success("wallet_transfer")
+            with self.assertLogs("nyx-risk", level="WARNING") as logs:
+                engine.record_failure("wallet_transfer")
+        self.assertEqual(logs.records[0].getMessage(), "circuit breaker reopened")
+        with _at(100), self.assertRaises(GatewayApiError):
+            probe(4)
+        # A round whose probes never report back is replaced once the timeout passes again.
+        with _at(120):
+            probe(5)
+            probe(6)
+        with _at(180):
+            probe(7)
+            probe(8)
+            engine.record_success("wallet_transfer")
+            engine.record_success("wallet_transfer")
+            for idx in range(9, 15):
+                probe(idx)
+        self.assertEqual((engine._breakers, engine._error_counters), ({}, {}))
+        engine.record_success("wallet_transfer")
+
+    def test_check_many_returns_denials_in_place(self) -> None:
+        engine = RiskEngine(_config())
+        checks = [("wallet_transfer", "acct-1", "10.0.0.1", 10) for _ in range(4)]
+        checks.append(("wallet_transfer", "acct-2", None, 5))
+        with _at(30) as clock:
+            results = engine.check_many(checks)
+        self.assertEqual(clock.call_count, 1)
+        self.assertEqual([result is None for result in results], [True, True, True, False, True])
+        self.assertEqual(results[3].details["scope"], "account")
+        self.assertEqual(engine._counters[("global", "wallet_transfer")][2], 5)
+        paused = RiskEngine(_config(global_paused=True)).check_many(checks[:2])
+        self.assertEqual([result.details["scope"] for result in paused], ["global_pause", "global_pause"])
+        self.assertEqual(RiskEngine(_config(mode="off")).check_many(checks), [None] * 5)
+
+    def test_uncapped_limits_keep_no_state(self) -> None:
+        engine = RiskEngine(
+            _config(
+                global_limit=RiskLimit(),
+                ip_limit=RiskLimit(max_amount=None),
+                action_limits={"wallet_transfer": RiskLimit(), "chat_message": RiskLimit(max_count=5)},
+            )
+        )
+        self._check(engine, amount=10)
+        self.assertEqual(list(engine._counters), [("account", "acct-1", "wallet_transfer")])
+        self.assertIsNone(engine._plans["wallet_transfer"].action_limit)
+        self.assertEqual(engine._plans["chat_message"].action_limit, RiskLimit(max_count=5))
+        engine.check("exchange_cancel", account_id=None, client_ip=None)
+        self.assertEqual(engine._plans["exchange_cancel"].global_key, ("global", "exchange_cancel"))
+
+    def test_config_dataclasses_are_slotted(self) -> None:
+        config = _config()
+        for value in (config, config.account_limit, RiskEngine(config)._plans["wallet_transfer"]):
+            self.assertFalse(hasattr(value, "__dict__"))
+
+    def test_off_mode_and_pause(self) -> None:
+        off = RiskEngine(_config(mode="off", global_paused=True))
+        for _ in range(10):
+            self._check(off)
+        off.record_failure("wallet_transfer")
+        self.assertEqual((off._counters, off._error_counters), ({}, {}))
+        no_breaker = RiskEngine(_config(breaker_errors_per_min=0))
+        for _ in range(3):
+            no_breaker.record_failure("wallet_transfer")
+            self._check(no_breaker)
+        self.assertEqual(no_breaker._error_counters, {})
+        paused = RiskEngine(_config(global_paused=True))
+        with self.assertRaises(GatewayApiError) as ctx:
+            self._check(paused)
+        self.assertEqual(ctx.exception.details["scope"], "global_pause")
+        self.assertEqual(paused._counters, {})
+        paused_monitor = RiskEngine(_config(mode="monitor", global_paused=True))
+        with self.assertLogs("nyx-risk", level="WARNING") as logs:
+            self._check(paused_monitor)
+        self.assertEqual(logs.records[0].scope, "global_pause")
+        self.assertIn(("account", "acct-1", "wallet_transfer"), paused_monitor._counters)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,7 +5,9 @@ import os
 import tempfile
 import threading
 import unittest
+import zipfile
 from http.client import HTTPConnection
+from io import BytesIO
 from pathlib import Path
 
 import _bootstrap  # noqa: F401
@@ -99,6 +101,22 @@ class ServerChatSmokeTests(unittest.TestCase):
         self.assertEqual(response.status, 200)
         parsed = json.loads(data.decode("utf-8"))
         self.assertIn("messages", parsed)
+
+        # The proof package is streamed chunked and the connection stays usable afterwards.
+        conn.request("GET", "/proof.zip?prefix=run-chat", headers={"Authorization": f"Bearer {token}"})
+        response = conn.getresponse()
+        data = response.read()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Transfer-Encoding"), "chunked")
+        self.assertEqual(response.getheader("Access-Control-Allow-Origin"), "*")
+        with zipfile.ZipFile(BytesIO(data)) as archive:
+            self.assertIn("runs/run-chat-1.zip", archive.namelist())
+            manifest = json.loads(archive.read("manifest.json"))
+        self.assertEqual([run["run_id"] for run in manifest["runs"]], ["run-chat-1"])
+        conn.request("GET", "/proof.zip?prefix=run-none", headers={"Authorization": f"Bearer {token}"})
+        response = conn.getresponse()
+        self.assertEqual(response.status, 400)
+        self.assertEqual(json.loads(response.read())["error"]["code"], "BAD_REQUEST")
         conn.close()
 
 
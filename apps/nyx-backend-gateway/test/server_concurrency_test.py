@@ -22,6 +22,7 @@ class ServerConcurrencyTests(unittest.TestCase):
         os.environ["NYX_FAUCET_MAX_AMOUNT_PER_24H"] = "0"
         os.environ["NYX_FAUCET_MAX_CLAIMS_PER_24H"] = "0"
         os.environ["NYX_FAUCET_IP_MAX_CLAIMS_PER_24H"] = "0"
+        gateway._refresh_faucet_env()
         self.tmp = tempfile.TemporaryDirectory()
         self.db_path = Path(self.tmp.name) / "gateway.db"
         self.run_root = Path(self.tmp.name) / "runs"
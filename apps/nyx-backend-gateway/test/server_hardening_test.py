@@ -2,6 +2,7 @@ import base64
 import hmac
 import json
 import os
+import socket
 import tempfile
 import threading
 import unittest
@@ -139,6 +140,102 @@ class ServerHardeningTests(unittest.TestCase):
         self.assertEqual(response.status, 400)
         conn.close()
 
+    def test_malformed_body_rejected(self) -> None:
+        cases = (
+            (b"{not json", "invalid json"),
+            (b'{"handle": "\xff"}', "invalid json"),
+            (b"[1, 2]", "payload must be object"),
+        )
+        for body, message in cases:
+            conn = HTTPConnection("127.0.0.1", self.port, timeout=10)
+            conn.request("POST", "/portal/v1/accounts", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            payload = json.loads(response.read().decode("utf-8"))
+            conn.close()
+            self.assertEqual(response.status, 400)
+            self.assertEqual(payload["error"]["message"], message)
+
+    def test_bad_content_length_and_short_body(self) -> None:
+        cases = (
+            (b"Content-Length: abc\r\n\r\n", b"invalid content length"),
+            (b"Content-Length: 20\r\n\r\n{}", b"incomplete body"),
+        )
+        for headers, message in cases:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=10) as sock:
+                sock.sendall(b"POST /portal/v1/accounts HTTP/1.1\r\nHost: x\r\n" + headers)
+                sock.shutdown(socket.SHUT_WR)
+                raw = b""
+                while chunk := sock.recv(4096):
+                    raw += chunk
+            self.assertTrue(raw.startswith(b"HTTP/1.1 400 "), raw[:40])
+            self.assertIn(message, raw)
+
+    def test_bad_request_line_is_answered(self) -> None:
+        # The version cannot be parsed, so the stdlib answers HTTP/0.9-style with a bare body. On the kept-alive
+        # socket the first request's Content-Length must not be reused.
+        requests = (
+            b"GET /healthz HTTP/1.x\r\n\r\n",
+            b"GET /healthz HTTP/1.1\r\nContent-Length: 5\r\n\r\nabcdeGET /healthz HTTP/1.x\r\n\r\n",
+        )
+        for request in requests:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=10) as sock:
+                sock.sendall(request)
+                raw = b""
+                while chunk := sock.recv(4096):
+                    raw += chunk
+            self.assertIn(b"Error code: 400", raw)
+            self.assertIn(b"Bad request version", raw)
+
+    def test_malformed_request_heads_rejected(self) -> None:
+        cases = (
+            (b"GET /healthz HTTP/2.0\r\n\r\n", b"Error code: 505"),
+            (b"GET /healthz extra HTTP/1.1\r\n\r\n", b"HTTP/1.1 400 "),
+            (b"GET /healthz HTTP/1.1\r\n" + b"X-Filler: 1\r\n" * 101 + b"\r\n", b"HTTP/1.1 431 "),
+            (b"GET /healthz HTTP/1.1\r\nX-Long: " + b"a" * 65536 + b"\r\n\r\n", b"HTTP/1.1 431 "),
+            (b"GET //healthz HTTP/1.1\r\nHost: x\r\n X-Folded: yes\r\nConnection: close\r\n\r\n", b"HTTP/1.1 200 "),
+        )
+        for request, expected in cases:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=10) as sock:
+                sock.sendall(request)
+                raw = b""
+                while chunk := sock.recv(4096):
+                    raw += chunk
+            self.assertIn(expected, raw[:1024], request[:40])
+
+    def test_ambiguous_body_framing_is_refused(self) -> None:
+        # The smuggled GET sits where a Content-Length-only reader would expect the next request.
+        smuggled = b"0\r\n\r\nGET /healthz HTTP/1.1\r\nHost: x\r\n\r\n"
+        cases = (
+            (
+                b"POST /portal/v1/accounts HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n"
+                b"Transfer-Encoding: chunked\r\n\r\n" + smuggled,
+                b"HTTP/1.1 501 ",
+            ),
+            (b"GET /healthz HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n\r\n" + smuggled, b"HTTP/1.1 501 "),
+            (
+                b"POST /portal/v1/accounts HTTP/1.1\r\nHost: x\r\nContent-Length: 2\r\nContent-Length: 41\r\n\r\n{}"
+                + smuggled[5:],
+                b"HTTP/1.1 400 ",
+            ),
+        )
+        for request, status_line in cases:
+            with socket.create_connection(("127.0.0.1", self.port), timeout=10) as sock:
+                sock.sendall(request)
+                raw = b""
+                while chunk := sock.recv(4096):
+                    raw += chunk
+            self.assertTrue(raw.startswith(status_line), raw[:40])
+            self.assertEqual(raw.count(b"HTTP/1.1 "), 1, raw)
+        # Repeating one Content-Length value is not ambiguous.
+        with socket.create_connection(("127.0.0.1", self.port), timeout=10) as sock:
+            sock.sendall(
+                b"GET /healthz HTTP/1.1\r\nContent-Length: 2\r\nContent-Length: 2\r\nConnection: close\r\n\r\n{}"
+            )
+            raw = b""
+            while chunk := sock.recv(4096):
+                raw += chunk
+        self.assertTrue(raw.startswith(b"HTTP/1.1 200 "), raw[:40])
+
 
 if __name__ == "__main__":
     unittest.main()
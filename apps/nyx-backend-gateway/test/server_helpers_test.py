@@ -0,0 +1,134 @@
+import http.client
+import io
+import json
+import threading
+import unittest
+import zipfile
+from unittest import mock
+
+import _bootstrap  # noqa: F401
+import nyx_backend_gateway.server as server
+
+
+class ServerHelperTests(unittest.TestCase):
+    def test_json_bytes_sorts_keys(self) -> None:
+        self.assertEqual(server._json_bytes({"b": 1, "a": [True, None]}), b'{"a":[true,null],"b":1}')
+        big = {"amount": 2**70, "nested": {1: "x"}}
+        self.assertEqual(json.loads(server._json_bytes(big)), {"amount": 2**70, "nested": {"1": "x"}})
+        self.assertEqual(server._json_bytes({"b": "\u00e9", "a": 1}), b'{"a":1,"b":"\\u00e9"}')
+
+    def test_post_routes_keep_first_match_order(self) -> None:
+        routes = server.GatewayHandler._POST_ROUTES
+        self.assertIs(routes["/wallet/v1/transfer"], server.GatewayHandler._post_wallet_v1_transfer)
+        self.assertIs(routes["/wallet/transfer"], server.GatewayHandler._post_wallet_transfer)
+        self.assertNotIn("/chat/v1/rooms/r1/messages", routes)
+        self.assertEqual(server._ROOM_MESSAGES_PATH.match("/chat/v1/rooms/r1/messages").group(1), "r1")
+        for path in ("/chat/v1/rooms//messages", "/chat/v1/rooms/a/b/messages", "/chat/v1/rooms/r1/messages/"):
+            self.assertIsNone(server._ROOM_MESSAGES_PATH.match(path), path)
+
+    def test_request_limiter_rolls_and_sweeps(self) -> None:
+        def at(seconds: float):
+            return mock.patch.object(server.time, "monotonic", return_value=seconds)
+
+        with at(100):
+            limiter = server.RequestLimiter(2, 60)
+            self.assertTrue(limiter.allow("a"))
+        with at(130):
+            self.assertTrue(limiter.allow("a"))
+            self.assertFalse(limiter.allow("a"))
+            self.assertTrue(limiter.allow("b"))
+        # The first hit has left the window, the second has not.
+        with at(160):
+            self.assertTrue(limiter.allow("a"))
+            self.assertFalse(limiter.allow("a"))
+        self.assertEqual(list(limiter._state["a"]), [130, 160])
+        with at(225):
+            self.assertTrue(limiter.allow("c"))
+        self.assertEqual(list(limiter._state), ["c"])
+
+    def test_request_limiter_admits_exactly_limit_across_threads(self) -> None:
+        limiter = server.RequestLimiter(1000, 60)
+        admitted = []
+
+        def worker() -> None:
+            admitted.append(sum(limiter.allow("shared") for _ in range(500)))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(admitted), 1000)
+
+    def test_extract_sub_payload(self) -> None:
+        extract = server.GatewayHandler._extract_sub_payload
+        nested = {"amount": 5}
+        self.assertIs(extract({"seed": 1, "run_id": "r", "payload": nested}), nested)
+        self.assertEqual(
+            extract({"seed": 1, "run_id": "r", "amount": 5, "asset_id": "NYXT"}), {"amount": 5, "asset_id": "NYXT"}
+        )
+        with self.assertRaises(server.GatewayError):
+            extract({"seed": 1, "payload": [1]})
+
+    def test_capabilities_body_is_encoded_once(self) -> None:
+        body = server._capabilities_json()
+        self.assertIs(server._capabilities_json(), body)
+        payload = json.loads(body)
+        self.assertEqual(payload["modules"], sorted(payload["module_features"]))
+        self.assertIn("integrations", payload["modules"])
+        self.assertEqual(payload["endpoints"], list(server._CAPABILITY_ENDPOINTS))
+
+    def test_parse_headers_matches_http_client(self) -> None:
+        blocks = (
+            b"Host: x\r\nAccept: */*\r\n\r\n",
+            b"Host:x\nX-Dup: 1\nx-dup: 2\nX-Empty:\n\n",
+            b"X-Trailing: value \t\r\nAuthorization: Bearer a:b\r\n\r\n",
+            b"X-Folded: one\r\n two\r\nHost: x\r\n\r\n",
+            b"Host: x\r\nnot a header\r\nAccept: */*\r\n\r\n",
+            b"X-Cr: a\rb\r\nHost: x\r\n\r\n",
+            b": no name\r\nHost: x\r\n\r\n",
+            b"X-Latin: caf\xe9\r\n\r\n",
+            b"Host: x\r\n",
+            b"\r\n",
+        )
+        for block in blocks:
+            rfile, reference = io.BytesIO(block + b"body"), io.BytesIO(block + b"body")
+            parsed = server._parse_headers(rfile)
+            self.assertEqual(parsed.items(), http.client.parse_headers(reference).items(), block)
+            self.assertIsInstance(parsed, http.client.HTTPMessage)
+            self.assertEqual(rfile.tell(), reference.tell())
+        with self.assertRaises(http.client.HTTPException):
+            server._parse_headers(io.BytesIO(b"X: 1\r\n" * 101 + b"\r\n"))
+
+    def test_stream_writer_frames_zip_as_chunks(self) -> None:
+        sink = io.BytesIO()
+        writer = server._StreamWriter(sink, chunked=True)
+        large = bytes(range(256)) * 512
+        with zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_STORED) as zip_file:
+            zip_file.writestr("small.json", b"{}")
+            zip_file.writestr("runs/large.zip", large)
+        writer.close()
+        raw, body, sizes = sink.getvalue(), bytearray(), []
+        while True:
+            line_end = raw.index(b"\r\n")
+            size = int(raw[:line_end], 16)
+            sizes.append(size)
+            body += raw[line_end + 2 : line_end + 2 + size]
+            self.assertEqual(raw[line_end + 2 + size : line_end + 4 + size], b"\r\n")
+            raw = raw[line_end + 4 + size :]
+            if size == 0:
+                break
+        self.assertEqual(raw, b"")
+        self.assertIn(len(large), sizes)
+        with zipfile.ZipFile(io.BytesIO(bytes(body))) as archive:
+            self.assertEqual(archive.read("small.json"), b"{}")
+            self.assertEqual(archive.read("runs/large.zip"), large)
+        plain = io.BytesIO()
+        writer = server._StreamWriter(plain, chunked=False)
+        writer.write(b"abc")
+        writer.close()
+        self.assertEqual(plain.getvalue(), b"abc")
+
+
+if __name__ == "__main__":
+    unittest.main()
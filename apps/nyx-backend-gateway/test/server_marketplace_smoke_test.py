@@ -113,6 +113,18 @@ class ServerMarketplaceSmokeTests(unittest.TestCase):
         listing_id = listings[0]["listing_id"]
         conn.close()
 
+        conn = HTTPConnection("127.0.0.1", self.port, timeout=10)
+        conn.request(
+            "GET", "/marketplace/listings/search?q=Item", headers={"Accept": "application/vnd.nyx.columnar+json"}
+        )
+        response = conn.getresponse()
+        data = response.read()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), "application/vnd.nyx.columnar+json")
+        columnar = json.loads(data.decode("utf-8"))["listings"]
+        self.assertEqual(columnar["rows"][0][columnar["columns"].index("listing_id")], listing_id)
+        conn.close()
+
         status, parsed = self._post(
             "/marketplace/purchase",
             {"seed": 123, "run_id": "run-purchase-1", "payload": {"listing_id": listing_id, "qty": 1}},
@@ -46,6 +46,40 @@ class ServerMetaEndpointsTests(unittest.TestCase):
         payload = self._get_json("/healthz")
         self.assertTrue(payload.get("ok"))
 
+    def test_static_headers(self) -> None:
+        for method in ("GET", "OPTIONS"):
+            conn = HTTPConnection("127.0.0.1", self.port, timeout=10)
+            conn.request(method, "/healthz")
+            response = conn.getresponse()
+            body = response.read()
+            conn.close()
+            self.assertEqual(response.getheader("Access-Control-Allow-Methods"), "GET, POST, OPTIONS")
+            self.assertEqual(response.getheader("Cache-Control"), "no-store")
+            self.assertEqual(len(response.headers.get_all("X-Frame-Options")), 1)
+        self.assertEqual(response.status, 204)
+        self.assertEqual(body, b"")
+
+    def test_keep_alive_reuses_connection(self) -> None:
+        conn = HTTPConnection("127.0.0.1", self.port, timeout=10)
+        # The unauthenticated POST is rejected before its body is read; the next request must still parse.
+        requests = [
+            ("GET", "/healthz", None, 200),
+            ("POST", "/wallet/v1/transfer", json.dumps({"seed": 1, "run_id": "r"}), 401),
+            ("GET", "/version", None, 200),
+            ("POST", "/portal/v1/accounts", "x" * 5000, 400),
+        ]
+        sockets = []
+        for method, path, body, status in requests:
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            sockets.append(conn.sock)
+            response = conn.getresponse()
+            response.read()
+            self.assertEqual(response.status, status, path)
+        self.assertEqual(len(set(map(id, sockets))), 1)
+        self.assertEqual(response.getheader("Connection"), "close")
+        self.assertIsNone(conn.sock)
+        conn.close()
+
     def test_version(self) -> None:
         payload = self._get_json("/version")
         self.assertIn("commit", payload)
@@ -106,6 +106,38 @@ class ServerPortalAuthTests(unittest.TestCase):
         self.assertEqual(status, 400)
         self.assertIn("error", reuse)
 
+    def _login(self, handle: str, key: bytes) -> tuple[str, str]:
+        pubkey = base64.b64encode(key).decode("utf-8")
+        _, created = self._post("/portal/v1/accounts", {"handle": handle, "pubkey": pubkey})
+        account_id = created["account_id"]
+        _, challenge = self._post("/portal/v1/auth/challenge", {"account_id": account_id})
+        nonce = challenge["nonce"]
+        signature = base64.b64encode(hmac.new(key, nonce.encode("utf-8"), "sha256").digest()).decode("utf-8")
+        _, verified = self._post(
+            "/portal/v1/auth/verify",
+            {"account_id": account_id, "nonce": nonce, "signature": signature},
+        )
+        return account_id, verified["access_token"]
+
+    def test_e2ee_identity_accepts_object_or_string(self) -> None:
+        account_id, token = self._login("bob", b"portal-key-0002-0002-0002-0002")
+        jwk = {"y": "yy", "x": "xx", "kty": "EC", "crv": "P-256"}
+        status, stored = self._post_auth("/portal/v1/e2ee/identity", {"public_jwk": jwk}, token)
+        self.assertEqual(status, 200)
+        self.assertEqual(stored["public_jwk"], jwk)
+        status, stored = self._post_auth("/portal/v1/e2ee/identity", {"public_jwk": json.dumps(jwk)}, token)
+        self.assertEqual(status, 200)
+        self.assertEqual(stored["public_jwk"], jwk)
+        status, fetched = self._get_auth(f"/portal/v1/accounts/by_id?account_id={account_id}", token)
+        self.assertEqual(status, 200)
+        self.assertEqual(fetched["account"]["public_jwk"], jwk)
+        missing_y = json.dumps({"kty": "EC", "crv": "P-256", "x": "xx"})
+        numeric_crv = {**jwk, "crv": 256}
+        for bad in ("{not json", missing_y, json.dumps(["EC"]), numeric_crv):
+            status, error = self._post_auth("/portal/v1/e2ee/identity", {"public_jwk": bad}, token)
+            self.assertEqual(status, 400)
+            self.assertEqual(error["error"]["message"], "public_jwk invalid")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -20,6 +20,7 @@ class ServerWalletV1AirdropTests(unittest.TestCase):
         os.environ["NYX_FAUCET_COOLDOWN_SECONDS"] = "0"
         os.environ["NYX_FAUCET_MAX_CLAIMS_PER_24H"] = "10"
         os.environ["NYX_FAUCET_MAX_AMOUNT_PER_24H"] = "100000"
+        gateway._refresh_faucet_env()
         self.tmp = tempfile.TemporaryDirectory()
         self.db_path = Path(self.tmp.name) / "gateway.db"
         self.run_root = Path(self.tmp.name) / "runs"
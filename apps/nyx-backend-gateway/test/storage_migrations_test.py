@@ -2,9 +2,12 @@ import sqlite3
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 import _bootstrap  # noqa: F401
-from nyx_backend_gateway.migrations import apply_migrations
+import nyx_backend_gateway.migrations as migrations
+from nyx_backend_gateway.migrations import SCHEMA_VERSION, apply_migrations
+from nyx_backend_gateway.storage import create_connection, get_wallet_balance, set_wallet_balance
 
 
 class StorageMigrationTests(unittest.TestCase):
@@ -31,6 +34,126 @@ class StorageMigrationTests(unittest.TestCase):
             self.assertTrue(expected.issubset(tables))
             conn.close()
 
+    def test_activity_indexes_created(self) -> None:
+        conn = sqlite3.connect(":memory:")
+        apply_migrations(conn)
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'").fetchall()}
+        expected = {
+            "idx_receipts_run_id",
+            "idx_fee_ledger_run_id",
+            "idx_wallet_transfers_from_address",
+            "idx_wallet_transfers_to_address",
+            "idx_orders_owner_address",
+            "idx_messages_sender_account_id",
+            "idx_listings_publisher_id",
+            "idx_purchases_buyer_id",
+            "idx_chat_messages_room_seq",
+        }
+        self.assertTrue(expected.issubset(indexes))
+        conn.close()
+
+    def test_migrated_database_skips_ddl(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "gateway.db"
+            conn = sqlite3.connect(str(db_path))
+            apply_migrations(conn)
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+            conn.close()
+
+            conn = sqlite3.connect(str(db_path))
+            statements: list[str] = []
+            # Nested programs behind table-valued pragmas are traced with a leading "--".
+            conn.set_trace_callback(lambda sql: sql.startswith("--") or statements.append(sql))
+            apply_migrations(conn)
+            conn.set_trace_callback(None)
+            self.assertEqual(
+                statements,
+                [
+                    "PRAGMA foreign_keys = ON",
+                    "PRAGMA synchronous = NORMAL",
+                    "PRAGMA temp_store = MEMORY",
+                    "PRAGMA mmap_size = 268435456",
+                    "PRAGMA cache_size = -20000",
+                    migrations._SCHEMA_PROBE,
+                ],
+            )
+            self.assertEqual(conn.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+            self.assertEqual(conn.execute("PRAGMA cache_size").fetchone()[0], -20000)
+            self.assertTrue(apply_migrations(conn))
+            conn.close()
+
+    def test_legacy_database_is_upgraded(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "gateway.db"
+            conn = sqlite3.connect(str(db_path))
+            conn.execute(
+                "CREATE TABLE listings (listing_id TEXT PRIMARY KEY, sku TEXT NOT NULL, title TEXT NOT NULL, "
+                "price INTEGER NOT NULL, run_id TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE chat_messages (message_id TEXT PRIMARY KEY, room_id TEXT NOT NULL, "
+                "sender_account_id TEXT NOT NULL, body TEXT NOT NULL, seq INTEGER NOT NULL, prev_digest TEXT NOT NULL, "
+                "msg_digest TEXT NOT NULL, chain_head TEXT NOT NULL, created_at INTEGER NOT NULL)"
+            )
+            conn.executemany(
+                "INSERT INTO chat_messages VALUES (?, ?, 'acct', '{}', ?, 'p', 'm', ?, 1)",
+                [
+                    ("m1", "room-a", 1, "h1"),
+                    ("m3", "room-a", 3, "h3"),
+                    ("m2", "room-a", 2, "h2"),
+                    ("m4", "room-b", 1, "hb"),
+                ],
+            )
+            conn.execute(
+                "CREATE TABLE portal_accounts (account_id TEXT PRIMARY KEY, handle TEXT UNIQUE NOT NULL, "
+                "public_key TEXT NOT NULL, created_at INTEGER NOT NULL, status TEXT NOT NULL)"
+            )
+            conn.execute("CREATE TABLE orders (order_id TEXT PRIMARY KEY, side TEXT NOT NULL, run_id TEXT NOT NULL)")
+            conn.execute("CREATE TABLE wallet_accounts (address TEXT PRIMARY KEY, balance INTEGER NOT NULL)")
+            conn.execute("INSERT INTO wallet_accounts (address, balance) VALUES ('w1', 5)")
+            conn.commit()
+            apply_migrations(conn)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(listings)").fetchall()}
+            self.assertTrue({"publisher_id", "status"}.issubset(columns))
+            for table, added in migrations._ADDED_COLUMNS.items():
+                present = {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+                self.assertTrue({column for column, _ in added}.issubset(present), table)
+            wallets = conn.execute("SELECT address, asset_id, balance FROM wallet_accounts").fetchall()
+            self.assertEqual(wallets, [("w1", "NYXT", 5)])
+            heads = conn.execute("SELECT room_id, last_seq, last_chain_head FROM chat_room_state ORDER BY room_id")
+            self.assertEqual(heads.fetchall(), [("room-a", 3, "h3"), ("room-b", 1, "hb")])
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+            conn.close()
+
+    def test_failed_migration_rolls_back(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "gateway.db"
+            conn = sqlite3.connect(str(db_path))
+            with mock.patch.object(migrations, "_ensure_listings_fts", side_effect=sqlite3.OperationalError("boom")):
+                with self.assertRaises(sqlite3.OperationalError):
+                    apply_migrations(conn)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0], 0)
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], 0)
+            apply_migrations(conn)
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+            conn.close()
+
+    def test_legacy_wallet_accounts_hold_multiple_assets(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "gateway.db"
+            conn = sqlite3.connect(str(db_path))
+            conn.execute("CREATE TABLE wallet_accounts (address TEXT PRIMARY KEY, balance INTEGER NOT NULL)")
+            conn.execute("INSERT INTO wallet_accounts (address, balance) VALUES ('w1', 5)")
+            conn.commit()
+            conn.close()
+            conn = create_connection(db_path)
+            set_wallet_balance(conn, "w1", 7, asset_id="USDX")
+            conn.commit()
+            self.assertEqual(get_wallet_balance(conn, "w1"), 5)
+            self.assertEqual(get_wallet_balance(conn, "w1", asset_id="USDX"), 7)
+            conn.close()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,57 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import _bootstrap  # noqa: F401
+from nyx_backend_gateway.storage import ConnectionPool
+
+
+class ConnectionPoolTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "gateway.db"
+        self.pool = ConnectionPool(max_idle=1)
+
+    def tearDown(self) -> None:
+        self.pool.close()
+        self.tmp.cleanup()
+
+    def test_connections_are_reused_across_threads(self) -> None:
+        with self.pool.connection(self.db_path) as conn:
+            first = conn
+        seen = []
+
+        def worker() -> None:
+            with self.pool.connection(self.db_path) as conn:
+                seen.append(conn)
+                conn.execute("SELECT 1").fetchone()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        self.assertIs(seen[0], first)
+
+    def test_open_transaction_is_rolled_back_on_release(self) -> None:
+        with self.assertRaises(RuntimeError):
+            with self.pool.connection(self.db_path) as conn:
+                conn.execute("INSERT INTO meta (key, value) VALUES ('pool-test', '1')")
+                raise RuntimeError("boom")
+        with self.pool.connection(self.db_path) as conn:
+            self.assertFalse(conn.in_transaction)
+            self.assertIsNone(conn.execute("SELECT value FROM meta WHERE key = 'pool-test'").fetchone())
+
+    def test_idle_limit_and_path_change(self) -> None:
+        with self.pool.connection(self.db_path) as outer:
+            with self.pool.connection(self.db_path) as inner:
+                self.assertIsNot(inner, outer)
+        with self.pool.connection(self.db_path) as conn:
+            self.assertIs(conn, inner)
+        other = Path(self.tmp.name) / "other.db"
+        with self.pool.connection(other) as conn:
+            self.assertEqual(conn.db_path, other)
+            self.assertIsNot(conn, inner)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,6 +24,7 @@ from nyx_backend_gateway.storage import (
     insert_trade,
     insert_web2_guard_request,
     load_by_id,
+    transaction,
 )
 
 
@@ -151,6 +152,29 @@ class StorageRoundtripTests(unittest.TestCase):
         insert_web2_guard_request(self.conn, web2)
         self.assertIsNotNone(load_by_id(self.conn, "web2_guard_requests", "request_id", "web2-1"))
 
+    def test_transaction_commits_once_and_rolls_back_on_error(self) -> None:
+        listing = Listing(
+            listing_id="list-tx-1",
+            publisher_id="seller-1",
+            sku="sku-1",
+            title="Item",
+            price=3,
+            status="active",
+            run_id="run-tx-1",
+        )
+        with self.assertRaises(RuntimeError):
+            with transaction(self.conn):
+                insert_listing(self.conn, listing)
+                self.assertTrue(self.conn.in_transaction)
+                raise RuntimeError("abort")
+        self.assertIsNone(load_by_id(self.conn, "listings", "listing_id", "list-tx-1"))
+
+        with transaction(self.conn):
+            insert_listing(self.conn, listing)
+            self.assertTrue(self.conn.in_transaction)
+        self.assertFalse(self.conn.in_transaction)
+        self.assertIsNotNone(load_by_id(self.conn, "listings", "listing_id", "list-tx-1"))
+
 
 if __name__ == "__main__":
     unittest.main()